@@ -0,0 +1,243 @@
+# asgi.py
+# ASGI serving mode. Run from project root:
+#   uvicorn asgi:app --host 0.0.0.0 --port 8000
+#
+# Same routes as the Flask blueprints. Uploads are read on the event loop; the
+# prediction itself (decode, model, Grad-CAM, PDF, DB) runs on a bounded thread
+# pool inside a Flask app/request context, so the services and models are shared
+# with the WSGI app unchanged. When ASGI_MAX_INFLIGHT predictions are already
+# running or waiting, new ones get 429 before their body is parsed.
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.concurrency import iterate_in_threadpool
+from flask import Flask
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import MultipartDecoder, Field, File, Data, Epilogue, NEED_DATA
+
+from config import Config
+from models import db, migrate, upgrade_schema
+from routes.health import health_bp
+from routes.predict import predict_bp, run_prediction
+from routes.records import records_bp
+from services import job_service
+from services.storage_service import allowed_file, image_header, UploadRejected
+
+
+def create_flask_app():
+    """The Flask side: config, database and blueprints (also the WSGI app)."""
+    flask_app = Flask(__name__)
+    flask_app.config.from_object(Config)
+    db.init_app(flask_app)
+    migrate.init_app(flask_app)   # "flask db ..." commands, FLASK_APP=asgi:flask_app
+    flask_app.register_blueprint(health_bp)
+    flask_app.register_blueprint(predict_bp)
+    flask_app.register_blueprint(records_bp)
+    if flask_app.config.get("DB_AUTO_UPGRADE", True):
+        with flask_app.app_context():
+            upgrade_schema()
+    job_service.start_workers(flask_app)   # picks up jobs queued before a restart
+    return flask_app
+
+
+flask_app = create_flask_app()
+_EXECUTOR = ThreadPoolExecutor(max_workers=flask_app.config.get("ASGI_EXECUTOR_WORKERS", 8),
+                               thread_name_prefix="asgi-predict")
+_INFLIGHT = 0   # only touched on the event loop thread
+
+
+def _busy():
+    """True when a new prediction should be turned away."""
+    if _INFLIGHT >= flask_app.config.get("ASGI_MAX_INFLIGHT", 32):
+        return True
+    if flask_app.config.get("INFERENCE_BATCHING", False):
+        from services.model_service import batching_stats
+
+        depth = batching_stats().get("queue_depth", 0)
+        return depth >= flask_app.config.get("BATCH_MAX_QUEUE", 256)
+    return False
+
+
+def _too_many():
+    return JSONResponse({"error": "Server busy, try again shortly", "code": "QUEUE_FULL"},
+                        status_code=429, headers={"Retry-After": "1"})
+
+
+async def _iterate_in_one_thread(iterable, prefetch=4):
+    """
+    Drain a generator body on a dedicated thread. Generators from stream_with_context
+    hold a pushed request context and an open DB cursor, which have to stay on the
+    thread that opened them (the thread pool may hand each step to another thread).
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=prefetch)
+    done = object()
+    stop = threading.Event()
+
+    def pump():
+        item = done
+        try:
+            for chunk in iterable:
+                if stop.is_set():
+                    break
+                asyncio.run_coroutine_threadsafe(queue.put(chunk), loop).result()
+        except Exception as e:
+            item = e
+        finally:
+            if hasattr(iterable, "close"):
+                iterable.close()
+            asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+
+    threading.Thread(target=pump, name="asgi-stream", daemon=True).start()
+    try:
+        while True:
+            chunk = await queue.get()
+            if chunk is done:
+                return
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+    finally:
+        # client went away: let the pump finish its current put and stop
+        stop.set()
+        while not queue.empty():
+            queue.get_nowait()
+
+
+def _to_asgi(rv):
+    """Flask response -> Starlette response; file and generator bodies are streamed."""
+    if rv.direct_passthrough:
+        body = iterate_in_threadpool(iter(rv.response))
+        return StreamingResponse(body, status_code=rv.status_code, headers=dict(rv.headers))
+    if rv.is_streamed:
+        return StreamingResponse(_iterate_in_one_thread(rv.response), status_code=rv.status_code,
+                                 headers=dict(rv.headers))
+    headers = {k: v for k, v in rv.headers.items() if k.lower() != "content-length"}
+    return Response(rv.get_data(), status_code=rv.status_code, headers=headers)
+
+
+async def _read_multipart(request, max_bytes):
+    """
+    Parse a multipart body as it streams in (werkzeug's sans-io decoder, so no extra
+    dependency). returns: (fields {name: str}, files {name: (filename, bytes)}), or
+    None when the body is not multipart. Raises RequestEntityTooLarge past max_bytes.
+    """
+    mimetype, options = parse_options_header(request.headers.get("content-type", ""))
+    if mimetype != "multipart/form-data" or "boundary" not in options:
+        return None
+    decoder = MultipartDecoder(options["boundary"].encode())
+    fields, files = {}, {}
+    current, parts, received = None, [], 0
+
+    def drain():
+        nonlocal current, parts
+        while True:
+            event = decoder.next_event()
+            if event is NEED_DATA or isinstance(event, Epilogue):
+                return
+            if isinstance(event, (Field, File)):
+                current, parts = event, []
+            elif isinstance(event, Data):
+                parts.append(event.data)
+                if not event.more_data:
+                    value = b"".join(parts)
+                    if isinstance(current, File):
+                        files[current.name] = (current.filename, value)
+                    else:
+                        fields[current.name] = value.decode("utf-8", "replace")
+
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > max_bytes:
+            raise RequestEntityTooLarge()
+        decoder.receive_data(chunk)
+        drain()
+    decoder.receive_data(None)
+    drain()
+    return fields, files
+
+
+def _call_flask(method, path, query_string, headers, body, base_url):
+    """Run one request through the Flask app (health, files, jobs, batch)."""
+    environ_overrides = {"wsgi.url_scheme": base_url.split(":", 1)[0]}
+    with flask_app.test_request_context(path, method=method, query_string=query_string, headers=headers,
+                                        data=body, base_url=base_url, environ_overrides=environ_overrides):
+        return flask_app.full_dispatch_request()
+
+
+def _predict(data, form, args, headers, base_url):
+    with flask_app.test_request_context("/predict/", method="POST", base_url=base_url,
+                                        query_string=args, headers=headers):
+        # before/after-request hooks (metrics, profiling, traces) as for a dispatched request
+        flask_app.preprocess_request()
+        rv = flask_app.make_response(run_prediction(data, form, args))
+        # the inference queue filled up between the early check and the model call
+        if rv.status_code == 503 and (rv.get_json(silent=True) or {}).get("code") == "QUEUE_FULL":
+            rv.status_code = 429
+            rv.headers["Retry-After"] = "1"
+        return flask_app.process_response(rv)
+
+
+@asynccontextmanager
+async def lifespan(_app):
+    yield
+    _EXECUTOR.shutdown(wait=False, cancel_futures=True)
+
+
+app = FastAPI(title="alzheimers-api", lifespan=lifespan, docs_url=None, redoc_url=None, openapi_url=None)
+
+
+@app.post("/predict/")
+@app.post("/predict", include_in_schema=False)
+async def predict(request: Request):
+    global _INFLIGHT
+    if _busy():
+        return _too_many()
+    max_bytes = flask_app.config.get("MAX_CONTENT_LENGTH", 5 * 1024 * 1024)
+    if int(request.headers.get("content-length") or 0) > max_bytes:
+        return JSONResponse({"error": "File too large"}, status_code=413)
+
+    _INFLIGHT += 1
+    try:
+        try:
+            parsed = await _read_multipart(request, max_bytes)
+        except RequestEntityTooLarge:
+            return JSONResponse({"error": "File too large"}, status_code=413)
+        if parsed is None or "image" not in parsed[1]:
+            return JSONResponse({"error": "No image provided"}, status_code=400)
+        fields, files = parsed
+        filename, data = files["image"]
+        if not filename or not allowed_file(filename):
+            return JSONResponse({"error": "Invalid image"}, status_code=400)
+        try:
+            # header-only check on the event loop: junk and decompression bombs never take an executor slot
+            image_header(data, flask_app.config.get("MAX_IMAGE_PIXELS", 25_000_000))
+        except UploadRejected as e:
+            return JSONResponse({"error": str(e), "code": e.code}, status_code=e.status)
+
+        loop = asyncio.get_running_loop()
+        # the body is already parsed; pass the rest of the headers (e.g. X-Profile-Token)
+        headers = [(k, v) for k, v in request.headers.items()
+                   if k.lower() not in ("content-length", "content-type", "host")]
+        rv = await loop.run_in_executor(_EXECUTOR, _predict, data, fields, dict(request.query_params),
+                                        headers, str(request.base_url))
+        return _to_asgi(rv)
+    finally:
+        _INFLIGHT -= 1
+
+
+@app.api_route("/{path:path}", methods=["GET", "HEAD", "POST"])
+async def flask_routes(path: str, request: Request):
+    """Health, readiness, file downloads, job status, history, exports and /predict/batch via the Flask views."""
+    body = await request.body()
+    loop = asyncio.get_running_loop()
+    headers = [(k, v) for k, v in request.headers.items() if k.lower() != "host"]
+    headers.append(("Host", request.headers.get("host", "localhost")))
+    rv = await loop.run_in_executor(_EXECUTOR, _call_flask, request.method, "/" + path,
+                                    request.url.query, headers, body, str(request.base_url))
+    return _to_asgi(rv)
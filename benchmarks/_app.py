@@ -0,0 +1,57 @@
+# benchmarks/_app.py
+# Shared helpers: a throwaway app (temp SQLite + upload dir) and synthetic MRI-like images.
+import io
+import os
+import tempfile
+
+import numpy as np
+from PIL import Image
+from flask import Flask
+
+from config import Config
+
+
+def make_app(**overrides):
+    """
+    Flask app with all blueprints registered against a temp SQLite DB and upload dir.
+    The process chdirs into the temp dir so relative output paths stay inside it.
+    """
+    from models import db
+    from routes.health import health_bp
+    from routes.predict import predict_bp
+    from routes.records import records_bp
+    from services import job_service
+
+    workdir = tempfile.mkdtemp(prefix="alz-bench-")
+    os.makedirs(os.path.join(workdir, "uploads"), exist_ok=True)
+    os.chdir(workdir)
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        UPLOAD_DIR=os.path.join(workdir, "uploads"),
+    )
+    app.config.update(overrides)
+
+    db.init_app(app)
+    app.register_blueprint(health_bp)
+    app.register_blueprint(predict_bp)
+    app.register_blueprint(records_bp)
+    with app.app_context():
+        db.create_all()
+    job_service.start_workers(app)
+    return app
+
+
+def synthetic_mri(seed=0, size=256):
+    """JPEG bytes of a grayscale, roughly brain-shaped blob with noise."""
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[:size, :size]
+    c = size / 2
+    r = np.sqrt(((xx - c) / (0.42 * size)) ** 2 + ((yy - c) / (0.36 * size)) ** 2)
+    img = np.clip(1.0 - r, 0, 1) * 180 + rng.normal(0, 12, (size, size))
+    img = np.clip(img, 0, 255).astype(np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(img).convert("RGB").save(buf, "JPEG", quality=90)
+    return buf.getvalue()
@@ -0,0 +1,121 @@
+# benchmarks/bench_asgi.py
+# Run from project root:  python -m benchmarks.bench_asgi --concurrency 16 --seconds 30
+#
+# Starts the same app twice in subprocesses against a temp DB / upload dir:
+#   wsgi: Flask's threaded server (flask --app asgi:flask_app run --with-threads)
+#   asgi: uvicorn asgi:app
+# then drives POST /predict/ at fixed concurrency and reports sustained RPS,
+# p50/p99 latency of successful requests and how many requests were shed with 429.
+import os
+import sys
+import time
+import uuid
+import socket
+import tempfile
+import argparse
+import subprocess
+import http.client
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks._app import synthetic_mri
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _multipart(image, fields):
+    boundary = uuid.uuid4().hex
+    parts = [f'--{boundary}\r\nContent-Disposition: form-data; name="{k}"\r\n\r\n{v}\r\n'.encode()
+             for k, v in fields.items()]
+    parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="image"; filename="scan.jpg"\r\n'
+                 f'Content-Type: image/jpeg\r\n\r\n'.encode() + image + b"\r\n")
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def _start(mode, port, workdir, env_overrides):
+    env = dict(os.environ, PYTHONPATH=ROOT, EAGER_MODEL_LOAD="true",
+               DATABASE_URL=f"sqlite:///{os.path.join(workdir, mode + '.db')}",
+               UPLOAD_DIR=os.path.join(workdir, "uploads"), **env_overrides)
+    if mode == "asgi":
+        cmd = [sys.executable, "-m", "uvicorn", "asgi:app", "--port", str(port), "--log-level", "warning"]
+    else:
+        cmd = [sys.executable, "-m", "flask", "--app", "asgi:flask_app", "run", "--port", str(port), "--with-threads"]
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.time() + 180
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/ready")
+            if conn.getresponse().status == 200:
+                return proc
+        except OSError:
+            pass
+        time.sleep(0.5)
+    proc.kill()
+    raise RuntimeError(f"{mode} server did not become ready")
+
+
+def _load(port, bodies, concurrency, seconds):
+    stop = time.time() + seconds
+
+    def client(i):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+        latencies, codes, n = [], {}, i
+        while time.time() < stop:
+            body, ctype = bodies[n % len(bodies)]
+            n += concurrency
+            t0 = time.perf_counter()
+            conn.request("POST", "/predict/", body=body, headers={"Content-Type": ctype})
+            resp = conn.getresponse()
+            resp.read()
+            if resp.status == 200:
+                latencies.append((time.perf_counter() - t0) * 1000.0)
+            codes[resp.status] = codes.get(resp.status, 0) + 1
+        return latencies, codes
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        results = list(ex.map(client, range(concurrency)))
+    elapsed = time.perf_counter() - t0
+
+    ok = sorted(l for lat, _ in results for l in lat)
+    codes = {}
+    for _, c in results:
+        for k, v in c.items():
+            codes[k] = codes.get(k, 0) + v
+    q = statistics.quantiles(ok, n=100) if len(ok) >= 2 else [float("nan")] * 99
+    return {"rps": codes.get(200, 0) / elapsed, "p50_ms": q[49], "p99_ms": q[98], "codes": codes}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sustained RPS / p99 of the Flask (WSGI) vs ASGI entry points")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument("--images", type=int, default=64, help="distinct images (defeats the prediction cache)")
+    parser.add_argument("--explain", default="false", help="explain flag sent with every request")
+    parser.add_argument("--modes", default="wsgi,asgi")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="alz-asgi-")
+    # no reports and no result cache, so the numbers reflect serving + inference
+    overrides = {"PREDICTION_CACHE": "false", "LAZY_REPORTS": "true"}
+    bodies = [_multipart(synthetic_mri(i), {"explain": args.explain}) for i in range(args.images)]
+
+    print(f"concurrency {args.concurrency}, {args.seconds:.0f}s per mode, explain={args.explain}")
+    for mode in args.modes.split(","):
+        port = _free_port()
+        proc = _start(mode, port, workdir, overrides)
+        try:
+            r = _load(port, bodies, args.concurrency, args.seconds)
+        finally:
+            proc.terminate()
+            proc.wait(10)
+        print(f"{mode:<5} {r['rps']:7.1f} req/s | p50 {r['p50_ms']:8.1f} ms | p99 {r['p99_ms']:8.1f} ms | status {r['codes']}")
@@ -0,0 +1,45 @@
+# benchmarks/bench_batch_endpoint.py
+# Run from project root:  python -m benchmarks.bench_batch_endpoint --images 32
+import io
+import time
+import argparse
+
+from benchmarks._app import make_app, synthetic_mri
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="images/sec: /predict/batch vs one /predict/ call per image")
+    parser.add_argument("--images", type=int, default=32)
+    parser.add_argument("--report", action="store_true", help="also build the combined study PDF")
+    args = parser.parse_args()
+
+    app = make_app()
+    client = app.test_client()
+    images = [synthetic_mri(i) for i in range(args.images)]
+
+    # warm-up (model load)
+    client.post("/predict/", data={"image": (io.BytesIO(images[0]), "w.jpg"), "explain": "false"},
+                content_type="multipart/form-data")
+
+    # ================================
+    # SINGLE-IMAGE ROUTE (explain=false, the cheapest single path)
+    # ================================
+    t0 = time.perf_counter()
+    for i, img in enumerate(images):
+        r = client.post("/predict/", data={"image": (io.BytesIO(img), f"{i}.jpg"), "explain": "false"},
+                        content_type="multipart/form-data")
+        assert r.status_code == 200, r.json
+    single = time.perf_counter() - t0
+    print(f"/predict/      {args.images} images in {single:.2f}s -> {args.images / single:.1f} images/s")
+
+    # ================================
+    # BATCH ROUTE
+    # ================================
+    data = {"images": [(io.BytesIO(img), f"{i}.jpg") for i, img in enumerate(images)],
+            "report": "true" if args.report else "false"}
+    t0 = time.perf_counter()
+    r = client.post("/predict/batch", data=data, content_type="multipart/form-data")
+    batch = time.perf_counter() - t0
+    assert r.status_code == 200, r.json
+    print(f"/predict/batch {args.images} images in {batch:.2f}s -> {args.images / batch:.1f} images/s "
+          f"({single / batch:.1f}x)")
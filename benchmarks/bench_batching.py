@@ -0,0 +1,68 @@
+# benchmarks/bench_batching.py
+# Run from project root:  python -m benchmarks.bench_batching
+import time
+import statistics
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+from flask import Flask
+
+from config import Config
+import services.model_service as model_service
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    k = min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))
+    return values[k]
+
+
+def _run(app, requests, concurrency):
+    x = torch.randn(1, 3, 224, 224)
+
+    def one(_):
+        with app.app_context():
+            t0 = time.perf_counter()
+            model_service.predict(x)
+            return (time.perf_counter() - t0) * 1000.0
+
+    with app.app_context():
+        model_service.predict(x)  # warm-up / load model
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        lat = list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - t0
+    return {
+        "rps": requests / wall,
+        "p50_ms": statistics.median(lat),
+        "p99_ms": _percentile(lat, 99),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare per-request vs micro-batched inference")
+    parser.add_argument("--requests", type=int, default=256)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--max-batch", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=10)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+
+    # ================================
+    # BASELINE: one forward per request
+    # ================================
+    app.config["INFERENCE_BATCHING"] = False
+    base = _run(app, args.requests, args.concurrency)
+    print(f"unbatched  -> {base['rps']:.1f} req/s | p50 {base['p50_ms']:.1f} ms | p99 {base['p99_ms']:.1f} ms")
+
+    # ================================
+    # MICRO-BATCHED
+    # ================================
+    app.config.update(INFERENCE_BATCHING=True, BATCH_MAX_SIZE=args.max_batch, BATCH_MAX_WAIT_MS=args.max_wait_ms)
+    batched = _run(app, args.requests, args.concurrency)
+    print(f"batched    -> {batched['rps']:.1f} req/s | p50 {batched['p50_ms']:.1f} ms | p99 {batched['p99_ms']:.1f} ms")
+    print("batcher stats:", model_service.batching_stats())
@@ -0,0 +1,102 @@
+# benchmarks/bench_cam.py
+# Run from project root:  python -m benchmarks.bench_cam --images ../dataset_holdout --samples 200
+#
+# explain=cam vs explain=gradcam on the serving model: time per image (Grad-CAM is one
+# forward + backward per image; CAM is one inference_mode forward per batch, maps for
+# every class) and how closely the two heatmaps agree for the predicted class:
+# Pearson r of the upsampled maps, IoU of their hottest 20% and the same peak cell.
+# Without --images, synthetic scans are used (timings hold, agreement is less telling).
+import glob
+import os
+import time
+import argparse
+import statistics
+
+import numpy as np
+import cv2
+import torch
+from flask import Flask
+
+from config import Config
+from benchmarks._app import synthetic_mri
+from services.model_service import load_model
+from services.explain_service import get_gradcam, get_cam
+from utils.preprocess import DecodedImage, INPUT_SIZE
+
+
+def _samples(args):
+    if not args.images:
+        return [DecodedImage.from_bytes(synthetic_mri(i)) for i in range(args.samples)]
+    paths = sorted(p for ext in ("jpg", "jpeg", "png")
+                   for p in glob.glob(os.path.join(args.images, "**", f"*.{ext}"), recursive=True))
+    step = max(1, len(paths) // args.samples)
+    return [DecodedImage.from_path(p) for p in paths[::step][:args.samples]]
+
+
+def _normalized(cam):
+    cam = cv2.resize(np.maximum(cam, 0).astype(np.float32), (INPUT_SIZE, INPUT_SIZE))
+    return cam / (cam.max() + 1e-8)
+
+
+def agreement(a, b, top=0.2):
+    """(pearson r, IoU of the top fraction of pixels, same argmax cell) for two conv-resolution maps"""
+    ua, ub = _normalized(a), _normalized(b)
+    r = float(np.corrcoef(ua.ravel(), ub.ravel())[0, 1]) if ua.std() and ub.std() else 0.0
+    ha, hb = ua >= np.quantile(ua, 1 - top), ub >= np.quantile(ub, 1 - top)
+    iou = float((ha & hb).sum() / max(1, (ha | hb).sum()))
+    return r, iou, bool(np.argmax(a) == np.argmax(b))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="fc-weight CAM vs Grad-CAM: speed and agreement")
+    parser.add_argument("--model-path", default=Config.MODEL_PATH)
+    parser.add_argument("--images", default=None, help="directory of sample scans (searched recursively)")
+    parser.add_argument("--samples", type=int, default=64)
+    parser.add_argument("--batch-sizes", default="1,8,32")
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config["MODEL_PATH"] = args.model_path
+    with app.app_context():
+        model = load_model()   # untrained ResNet18 when there is no weights file, as in the app
+    gradcam, cam = get_gradcam(model), get_cam(model)
+    images = _samples(args)
+    x = torch.cat([img.tensor for img in images])
+    gradcam(x[:1]), cam(x[:1])   # warm-up
+
+    t0 = time.perf_counter()
+    grad_maps, logits_g = [], []
+    for i in range(len(x)):
+        out, m, _ = gradcam(x[i:i + 1])
+        grad_maps.append(m)
+        logits_g.append(out[0])
+    gradcam_ms = (time.perf_counter() - t0) * 1000.0 / len(x)
+    print(f"{len(x)} images, {torch.get_num_threads()} thread(s)")
+    print(f"  gradcam            {gradcam_ms:8.2f} ms/image (predicted class only)")
+
+    for bs in (int(b) for b in args.batch_sizes.split(",")):
+        t0 = time.perf_counter()
+        outs, maps = [], []
+        for chunk in torch.split(x, bs):
+            out, m = cam(chunk)
+            outs.append(out)
+            maps.append(m)
+        cam_ms = (time.perf_counter() - t0) * 1000.0 / len(x)
+        print(f"  cam  batch {bs:>4}    {cam_ms:8.2f} ms/image (all classes)  {gradcam_ms / cam_ms:5.1f}x")
+    logits_c, cam_maps = torch.cat(outs), torch.cat(maps)
+
+    same_label = sum(int(lg.argmax() == lc.argmax()) for lg, lc in zip(logits_g, logits_c))
+    rs, ious, peaks = [], [], []
+    for lg, g, c in zip(logits_g, grad_maps, cam_maps):
+        r, iou, peak = agreement(g, c[int(lg.argmax())].numpy())
+        rs.append(r)
+        ious.append(iou)
+        peaks.append(peak)
+    print(f"agreement with Grad-CAM on the predicted class ({same_label}/{len(x)} same label):")
+    print(f"  pearson r   mean {statistics.fmean(rs):.3f}  median {statistics.median(rs):.3f}  min {min(rs):.3f}")
+    print(f"  top-20% IoU mean {statistics.fmean(ious):.3f}  median {statistics.median(ious):.3f}  min {min(ious):.3f}")
+    print(f"  same peak cell {sum(peaks)}/{len(peaks)}")
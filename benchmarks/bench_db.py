@@ -0,0 +1,78 @@
+# benchmarks/bench_db.py
+# Run from project root:  python -m benchmarks.bench_db --rows 5000 --threads 32
+#
+# Sustained patient+result inserts/sec through the same save path /predict/ uses,
+# from several threads at once, for:
+#   rollback journal, synchronous=FULL  (SQLite defaults, what the app ran with before)
+#   WAL, synchronous=NORMAL             (per-request commit)
+#   WAL, synchronous=NORMAL + write-behind buffer (group commit)
+import time
+import argparse
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+from models import db
+from models.result import Result
+from benchmarks._app import make_app
+from services.write_buffer_service import WriteBehindBuffer, save_prediction
+
+MODES = {
+    "delete/full": ("DELETE", "FULL", False),
+    "wal/normal": ("WAL", "NORMAL", False),
+    "wal/normal+write-behind": ("WAL", "NORMAL", True),
+}
+
+
+def _row(i):
+    patient = {"full_name": f"Patient {i}", "age": 60 + i % 30, "gender": "F",
+               "email": f"p{i}@example.com", "city": "Pune", "doctor_name": f"Dr {i % 40}"}
+    result = {"prediction_label": "Normal", "confidence": 0.91,
+              "probabilities": {"Normal": 0.91, "MildDemented": 0.05, "ModerateDemented": 0.01, "VeryMildDemented": 0.03},
+              "mri_image_path": f"{i:064x}.jpg", "predicted_at": datetime.utcnow(), "model_version": "bench"}
+    return patient, result
+
+
+def _run(mode, rows, threads, batch, flush_ms):
+    journal, synchronous, write_behind = MODES[mode]
+    Config.SQLITE_JOURNAL_MODE, Config.SQLITE_SYNCHRONOUS = journal, synchronous
+    app = make_app()
+    writer = WriteBehindBuffer(app, batch_size=batch, flush_ms=flush_ms, max_pending=rows) if write_behind else None
+
+    def client(t):
+        with app.app_context():
+            for i in range(t, rows, threads):
+                patient, result = _row(i)
+                if writer is not None:
+                    writer.submit(patient, result).result()
+                else:
+                    save_prediction(patient, result)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as ex:
+        list(ex.map(client, range(threads)))
+    elapsed = time.perf_counter() - t0
+
+    stats = writer.stats() if writer is not None else None
+    if writer is not None:
+        writer.close()
+    with app.app_context():
+        saved = db.session.query(Result).count()
+        db.engine.dispose()
+    return rows / elapsed, saved, stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prediction row inserts/sec by SQLite journal mode and write path")
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--batch", type=int, default=200, help="write-behind batch size")
+    parser.add_argument("--flush-ms", type=float, default=2)
+    parser.add_argument("--modes", default=",".join(MODES))
+    args = parser.parse_args()
+
+    print(f"{args.rows} patient+result pairs from {args.threads} threads")
+    for mode in args.modes.split(","):
+        rate, saved, stats = _run(mode, args.rows, args.threads, args.batch, args.flush_ms)
+        extra = f" | avg batch {stats['avg_batch_size']:.1f}" if stats else ""
+        print(f"{mode:<24} {rate:8.1f} inserts/s ({saved} results saved){extra}")
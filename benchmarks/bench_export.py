@@ -0,0 +1,68 @@
+# benchmarks/bench_export.py
+# Run from project root:  python -m benchmarks.bench_export --rows 200000,2000000
+#
+# Streams the results + patients export (services/export_service.py CLI, one fresh
+# process per run) from synthetic histories of different sizes, as CSV and Parquet,
+# and reports rows/s and the process's peak RSS - which should not grow with the
+# table. Next to it, the obvious pandas version (read_sql of the whole join, then
+# to_csv) for comparison.
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+from models import db
+from benchmarks._app import make_app
+from benchmarks.bench_queries import _fill
+
+_PANDAS = """
+import sys, pandas as pd, sqlite3
+conn = sqlite3.connect(sys.argv[1])
+pd.read_sql("SELECT * FROM results r JOIN patients p ON p.id = r.patient_id ORDER BY r.id", conn).to_csv(sys.argv[2], index=False)
+"""
+
+
+def _run(cmd, env):
+    """(seconds, peak RSS MiB) of a child process"""
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL)
+    _, status, usage = os.wait4(proc.pid, 0)
+    if status:
+        raise SystemExit(f"{' '.join(cmd)} failed ({status})")
+    return time.perf_counter() - t0, usage.ru_maxrss / 1024
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Streaming export: throughput and flat memory")
+    parser.add_argument("--rows", default="200000,2000000", help="comma-separated table sizes")
+    parser.add_argument("--formats", default="csv,parquet")
+    parser.add_argument("--chunk-rows", type=int, default=10_000)
+    parser.add_argument("--no-pandas", action="store_true", help="skip the read_sql + to_csv baseline")
+    args = parser.parse_args()
+
+    root = os.getcwd()
+    app = make_app(EAGER_MODEL_LOAD=False)   # creates the schema in a temp dir (and chdirs there)
+    with app.app_context():
+        template = db.engine.url.database
+        db.engine.dispose()
+    workdir = tempfile.mkdtemp(prefix="alz-export-")
+
+    print(f"{'rows':>10} {'export':<8} {'seconds':>8} {'rows/s':>10} {'MB out':>8} {'peak RSS':>9}")
+    for rows in (int(r) for r in args.rows.split(",")):
+        path = os.path.join(workdir, f"{rows}.db")
+        with open(template, "rb") as src, open(path, "wb") as dst:
+            dst.write(src.read())   # empty schema
+        _fill(path, rows)
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{path}", PYTHONPATH=root)
+
+        runs = [(fmt, [sys.executable, "-m", "services.export_service", "--out",
+                       os.path.join(workdir, f"out.{fmt}"), "--chunk-rows", str(args.chunk_rows)])
+                for fmt in args.formats.split(",")]
+        if not args.no_pandas:
+            runs.append(("pandas", [sys.executable, "-c", _PANDAS, path, os.path.join(workdir, "out.pandas")]))
+        for name, cmd in runs:
+            seconds, rss = _run(cmd, env)
+            size = os.path.getsize(os.path.join(workdir, f"out.{name}")) / 1e6
+            print(f"{rows:>10,} {name:<8} {seconds:8.1f} {rows / seconds:10,.0f} {size:8.1f} {rss:7.0f} MiB")
@@ -0,0 +1,45 @@
+# benchmarks/bench_gradcam.py
+# Run from project root:  python -m benchmarks.bench_gradcam --calls 10000
+import time
+import statistics
+import argparse
+
+import torch
+from flask import Flask
+
+from config import Config
+from services.model_service import load_model
+from services.explain_service import get_gradcam
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Grad-CAM latency over many calls (should stay flat)")
+    parser.add_argument("--calls", type=int, default=10000)
+    parser.add_argument("--window", type=int, default=500)
+    parser.add_argument("--size", type=int, default=224)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+
+    with app.app_context():
+        model = load_model()
+        engine = get_gradcam(model)
+        layer = engine.target_layer
+        x = torch.randn(1, 3, args.size, args.size)
+        engine(x)  # warm-up
+
+        window = []
+        first_median = None
+        for i in range(1, args.calls + 1):
+            t0 = time.perf_counter()
+            get_gradcam(model)(x)
+            window.append((time.perf_counter() - t0) * 1000.0)
+
+            if i % args.window == 0:
+                med = statistics.median(window)
+                first_median = first_median or med
+                print(f"calls {i - args.window + 1:>6}-{i:<6} median {med:7.2f} ms "
+                      f"({med / first_median:5.2f}x first window) | "
+                      f"hooks fwd={len(layer._forward_hooks)} bwd={len(layer._backward_hooks)}")
+                window = []
@@ -0,0 +1,70 @@
+# benchmarks/bench_heatmap.py
+# Run from project root:  python -m benchmarks.bench_heatmap --image-size 1024
+#
+# Per prediction: writing a full-resolution JET overlay JPEG (what /predict/ did
+# before) vs packing the float16 CAM for the Result row. Per view: rendering the
+# overlay from the stored CAM at a few sizes, cold and from the LRU. Also checks
+# that a render from the float16 CAM matches one from the float32 CAM.
+import os
+import time
+import tempfile
+import argparse
+import statistics
+
+import numpy as np
+import cv2
+
+from benchmarks._app import synthetic_mri
+from services import heatmap_service
+
+
+def _ms(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000.0)
+    return statistics.median(times)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Eager heatmap JPEGs vs stored CAM + on-demand render")
+    parser.add_argument("--image-size", type=int, default=1024, help="side of the synthetic upload")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--sizes", default="256,512,0", help="render sizes (0 = upload size)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="alz-heat-")
+    mri_path = os.path.join(workdir, "scan.jpg")
+    with open(mri_path, "wb") as f:
+        f.write(synthetic_mri(0, args.image_size))
+    bgr = cv2.imread(mri_path)
+    rng = np.random.default_rng(0)
+    cam = rng.normal(0.2, 1.0, (7, 7)).astype(np.float32)
+
+    def eager():
+        path = os.path.join(workdir, "x_heat.jpg")
+        cv2.imwrite(path, heatmap_service.render_overlay(heatmap_service.unpack_cam(heatmap_service.pack_cam(cam)), bgr))
+        return path
+
+    eager_ms = _ms(eager, args.repeat)
+    eager_bytes = os.path.getsize(eager())
+    blob = heatmap_service.pack_cam(cam)
+    pack_us = _ms(lambda: heatmap_service.pack_cam(cam), args.repeat * 100) * 1000
+    print(f"per prediction, {args.image_size}px upload:")
+    print(f"  eager overlay JPEG: {eager_ms:7.2f} ms, {eager_bytes / 1024:7.1f} KiB written")
+    print(f"  packed CAM:         {pack_us / 1000:7.4f} ms, {len(blob):7d} bytes on the Result row")
+
+    print("per view (render from stored CAM + upload):")
+    cache = heatmap_service.OverlayCache(64 * 1024 * 1024)
+    for size in (int(s) for s in args.sizes.split(",")):
+        opts = {"size": size or None}
+        cold = _ms(lambda: heatmap_service.encode_jpeg(heatmap_service.render_file(blob, mri_path, **opts)), args.repeat)
+        cache.put(size, heatmap_service.encode_jpeg(heatmap_service.render_file(blob, mri_path, **opts)))
+        hot = _ms(lambda: cache.get(size), args.repeat * 100)
+        print(f"  size {size or args.image_size:>5}px: cold {cold:7.2f} ms, LRU hit {hot * 1000:6.2f} us")
+
+    exact = heatmap_service.render_overlay(cam.clip(0), bgr)
+    stored = heatmap_service.render_overlay(heatmap_service.unpack_cam(blob), bgr)
+    diff = np.abs(exact.astype(int) - stored.astype(int))
+    print(f"float16 vs float32 CAM render: max |diff| {diff.max()} / 255, mean {diff.mean():.4f}")
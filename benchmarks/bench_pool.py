@@ -0,0 +1,98 @@
+# benchmarks/bench_pool.py
+# Run from project root:  python -m benchmarks.bench_pool --workers 1,2,4 --seconds 10
+#
+# Throughput of the inference process pool at several pool sizes, plus the memory
+# each worker adds (private vs shared pages from /proc/<pid>/smaps_rollup, Linux).
+import os
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+import torch.multiprocessing as mp
+
+from services.model_service import _build_default_model
+from services.inference_pool_service import InferencePool
+
+
+def _memory_kib(pid):
+    """{'Rss', 'Pss', 'Private', 'Shared'} in KiB, or {} where smaps_rollup is unavailable."""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            rows = dict(line.split(":", 1) for line in f if ":" in line)
+    except OSError:
+        return {}
+    kib = {k: int(v.split()[0]) for k, v in rows.items() if v.strip().endswith("kB")}
+    return {
+        "Rss": kib.get("Rss", 0),
+        "Pss": kib.get("Pss", 0),
+        "Private": kib.get("Private_Clean", 0) + kib.get("Private_Dirty", 0),
+        "Shared": kib.get("Shared_Clean", 0) + kib.get("Shared_Dirty", 0),
+    }
+
+
+def _idle(ready):
+    from services.backend_service import load_backend  # noqa: F401  (same imports as a worker)
+    ready.put(os.getpid())
+    time.sleep(60)
+
+
+def _baseline_private_kib():
+    """Private memory of a spawned interpreter with a worker's imports but no model."""
+    ctx = mp.get_context("spawn")
+    ready = ctx.Queue()
+    proc = ctx.Process(target=_idle, args=(ready,), daemon=True)
+    proc.start()
+    ready.get()
+    try:
+        return _memory_kib(proc.pid).get("Private", 0)
+    finally:
+        proc.terminate()
+
+
+def _throughput(pool, batch, clients, seconds):
+    x = torch.randn(batch, 3, 224, 224)
+    pool(x)  # warm-up
+    stop = time.time() + seconds
+
+    def client(_):
+        n = 0
+        while time.time() < stop:
+            pool(x)
+            n += batch
+        return n
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as ex:
+        images = sum(ex.map(client, range(clients)))
+    return images / (time.perf_counter() - t0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inference process pool scaling and per-worker memory")
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--threads", type=int, default=1, help="torch threads per worker")
+    parser.add_argument("--batch", type=int, default=1)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    model = _build_default_model().eval()
+    weights_mib = sum(p.numel() * p.element_size() for p in model.parameters()) / 2**20
+    print(f"cpus {os.cpu_count()}, weights {weights_mib:.1f} MiB, batch {args.batch}, {args.threads} thread(s)/worker")
+
+    baseline = _baseline_private_kib() / 1024
+    print(f"idle spawned interpreter: {baseline:.1f} MiB private")
+
+    base = None
+    for n in (int(w) for w in args.workers.split(",")):
+        pool = InferencePool(model, n, threads_per_worker=args.threads)
+        try:
+            ips = _throughput(pool, args.batch, clients=2 * n, seconds=args.seconds)
+            mem = [_memory_kib(p.pid) for p, _, _, _ in pool._workers]
+        finally:
+            pool.close()
+        base = base or ips
+        private = sum(m.get("Private", 0) for m in mem) / len(mem) / 1024
+        shared = sum(m.get("Shared", 0) for m in mem) / len(mem) / 1024
+        print(f"{n} worker(s): {ips:7.1f} img/s ({ips / base:4.2f}x) | per worker "
+              f"private +{private - baseline:5.1f} MiB over idle, shared {shared:6.1f} MiB")
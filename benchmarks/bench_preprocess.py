@@ -0,0 +1,54 @@
+# benchmarks/bench_preprocess.py
+# Run from project root:  python -m benchmarks.bench_preprocess
+import io
+import time
+import argparse
+
+import torch
+from PIL import Image
+
+from benchmarks._app import synthetic_mri
+from utils.preprocess import (fast_transform, reference_preprocess, max_abs_diff,
+                              BatchPreprocessor)
+
+TOLERANCE = 1e-5
+
+
+def _time(fn, repeat):
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat * 1000.0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fast preprocessing vs torchvision transform chain")
+    parser.add_argument("--size", type=int, default=512, help="source image side in pixels")
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    images = [Image.open(io.BytesIO(synthetic_mri(i, args.size))).convert("RGB") for i in range(args.batch)]
+
+    # ================================
+    # NUMERICAL CHECK
+    # ================================
+    worst = max(max_abs_diff(img) for img in images)
+    print(f"max |fast - reference| over {len(images)} images: {worst:.2e} (tolerance {TOLERANCE:.0e})")
+    assert worst <= TOLERANCE, "fast preprocessing drifted from the reference transform"
+
+    # ================================
+    # PER IMAGE
+    # ================================
+    ref = _time(lambda: reference_preprocess(images[0]), args.repeat)
+    fast = _time(lambda: fast_transform(images[0]), args.repeat)
+    print(f"per image : reference {ref:.3f} ms | fast {fast:.3f} ms ({ref / fast:.2f}x)")
+
+    # ================================
+    # PER BATCH
+    # ================================
+    bp = BatchPreprocessor(args.batch)
+    ref = _time(lambda: torch.stack([reference_preprocess(img) for img in images]), max(1, args.repeat // 5))
+    fast = _time(lambda: bp.fill(images), max(1, args.repeat // 5))
+    print(f"batch {args.batch:<3}: reference {ref:.2f} ms | fast {fast:.2f} ms ({ref / fast:.2f}x)")
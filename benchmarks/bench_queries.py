@@ -0,0 +1,122 @@
+# benchmarks/bench_queries.py
+# Run from project root:  python -m benchmarks.bench_queries --rows 10000000
+#
+# Fills a temp SQLite DB with synthetic history (rows results over rows/5 patients,
+# two years, 50 doctors), then times the history API through the Flask test client
+# (query + serialization + JSON) and prints the SQLite plan of each query.
+import json
+import time
+import random
+import sqlite3
+import argparse
+import statistics
+from datetime import datetime, timedelta
+
+from models import db
+from benchmarks._app import make_app
+
+LABELS = (["Normal"] * 10 + ["VeryMildDemented"] * 6 + ["MildDemented"] * 3 + ["ModerateDemented"])
+DOCTORS = [f"Dr {i}" for i in range(50)]
+START = datetime(2024, 1, 1)
+SPAN_SECONDS = 2 * 365 * 86400
+
+
+def _ts(dt):
+    return dt.strftime("%Y-%m-%d %H:%M:%S.%f")   # SQLAlchemy's SQLite DateTime format
+
+
+def _fill(path, rows, chunk=100_000):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    rng = random.Random(0)
+    patients = max(1, rows // 5)
+    conn.executemany(
+        "INSERT INTO patients (id, full_name, age, gender, email, city, doctor_name, created_at) VALUES (?,?,?,?,?,?,?,?)",
+        ((i, f"Patient {i}", 50 + i % 40, "F" if i % 2 else "M", f"p{i}@example.com", "Pune",
+          DOCTORS[i % len(DOCTORS)], _ts(START)) for i in range(1, patients + 1)))
+    probs = json.dumps({"Normal": 0.7, "MildDemented": 0.1, "ModerateDemented": 0.1, "VeryMildDemented": 0.1})
+    step = SPAN_SECONDS / rows
+    for lo in range(0, rows, chunk):
+        conn.executemany(
+            "INSERT INTO results (id, patient_id, prediction_label, confidence, probabilities, mri_image_path,"
+            " predicted_at, model_version) VALUES (?,?,?,?,?,?,?,?)",
+            ((i + 1, rng.randint(1, patients), rng.choice(LABELS), round(rng.uniform(0.4, 1.0), 4), probs,
+              f"{i:064x}.jpg", _ts(START + timedelta(seconds=i * step)), "bench")
+             for i in range(lo, min(rows, lo + chunk))))
+        conn.commit()
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+    return patients
+
+
+def _time(client, url, repeats):
+    times, body = [], None
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        resp = client.get(url)
+        times.append((time.perf_counter() - t0) * 1000.0)
+        body = resp.get_json()
+        assert resp.status_code == 200, (url, resp.status_code, body)
+    return statistics.median(times), max(times), body
+
+
+def _deep_url(client, url, pages):
+    """URL of page `pages` of url, reached by following next_cursor."""
+    target = url
+    for _ in range(pages):
+        cursor = client.get(target).get_json()["next_cursor"]
+        if cursor is None:
+            break
+        target = f"{url}{'&' if '?' in url else '?'}cursor={cursor}"
+    return target
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency of /patients and /results on a large synthetic history")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--plan", action="store_true", help="print the SQLite query plan of each query")
+    args = parser.parse_args()
+
+    app = make_app(EAGER_MODEL_LOAD=False)
+    with app.app_context():
+        path = db.engine.url.database
+        db.engine.dispose()
+    t0 = time.perf_counter()
+    patients = _fill(path, args.rows)
+    print(f"{args.rows:,} results / {patients:,} patients written in {time.perf_counter() - t0:.0f}s")
+
+    week_ago = (START + timedelta(seconds=SPAN_SECONDS) - timedelta(days=7)).date().isoformat()
+    queries = {
+        "latest results": "/results",
+        "Moderate this week": f"/results?label=ModerateDemented&from={week_ago}",
+        "one patient": f"/patients/{patients // 2}/results",
+        "one doctor": "/results?doctor=Dr%207&fields=id,patient_id,prediction_label,confidence,predicted_at",
+        "confidence 0.90-0.95": "/results?min_confidence=0.9&max_confidence=0.95&fields=id,confidence",
+        "two labels, 2024 H2": "/results?label=MildDemented,ModerateDemented&from=2024-07-01&to=2025-01-01",
+        "patients of a doctor": "/patients?doctor=Dr%2013&fields=id,full_name,email",
+    }
+    client = app.test_client()
+    queries["latest, page 200"] = _deep_url(client, "/results?limit=50", 200)
+
+    statements = []
+    if args.plan:
+        from sqlalchemy import event
+
+        with app.app_context():
+            event.listen(db.engine, "before_cursor_execute",
+                         lambda conn, cur, stmt, params, ctx, many: statements.append((stmt, params)))
+
+    print(f"{'query':<24} {'median':>9} {'max':>9}  rows")
+    for name, url in queries.items():
+        statements.clear()
+        median, worst, body = _time(client, url, args.repeats)
+        print(f"{name:<24} {median:7.2f}ms {worst:7.2f}ms  {len(body['items'])}")
+        if args.plan and statements:
+            stmt, params = statements[-1]
+            with app.app_context():
+                plan = db.session.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + stmt, params).all()
+            for row in plan:
+                print(f"{'':<26}{row[-1]}")
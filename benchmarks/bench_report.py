@@ -0,0 +1,67 @@
+# benchmarks/bench_report.py
+# Run from project root:  python -m benchmarks.bench_report --reports 40 --processes 4
+import io
+import os
+import time
+import tempfile
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from benchmarks._app import make_app, synthetic_mri
+from services import report_service
+from services.report_service import render_report, generate_report
+
+PROBS = {"Normal": 0.12, "MildDemented": 0.71, "ModerateDemented": 0.05, "VeryMildDemented": 0.12}
+PATIENT = {"full_name": "Bench Patient", "age": 71, "gender": "Female", "doctor_name": "Dr. Bench"}
+
+
+def _uncached(img_path):
+    """Pre-change behaviour: styles rebuilt per report, full-resolution images embedded."""
+    report_service._styles.cache_clear()
+    report_service._static_flowables.cache_clear()
+    report_service._table_styles.cache_clear()
+    with open(img_path, "rb") as f:
+        raw = f.read()
+    return render_report("MildDemented", PROBS, PATIENT, img_data=raw, heat_data=raw)
+
+
+def _cached(img_path):
+    return render_report("MildDemented", PROBS, PATIENT, img_path=img_path, heat_path=img_path)
+
+
+def _run(label, fn, n, threads):
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as ex:
+        sizes = list(ex.map(lambda _: fn(), range(n)))
+    elapsed = time.perf_counter() - t0
+    print(f"{label:<34} {n / elapsed:7.1f} reports/s | {sum(sizes) / len(sizes) / 1024:8.1f} KiB per report")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PDF report rendering throughput and size")
+    parser.add_argument("--reports", type=int, default=40)
+    parser.add_argument("--threads", type=int, default=4, help="concurrent request threads")
+    parser.add_argument("--processes", type=int, default=4, help="REPORT_PROCESSES for the pooled run")
+    parser.add_argument("--size", type=int, default=2048, help="side of the source scan in pixels")
+    args = parser.parse_args()
+
+    img_path = os.path.join(tempfile.mkdtemp(prefix="alz-report-"), "scan.png")
+    Image.open(io.BytesIO(synthetic_mri(0, args.size))).save(img_path)
+    print(f"source image {args.size}x{args.size} PNG, {os.path.getsize(img_path) / 1024:.0f} KiB")
+
+    _run("uncached, full-size images", lambda: len(_uncached(img_path)), args.reports, args.threads)
+    _run("cached styles, downscaled images", lambda: len(_cached(img_path)), args.reports, args.threads)
+
+    app = make_app(REPORT_PROCESSES=args.processes, EAGER_MODEL_LOAD=False)
+    with app.app_context():
+        generate_report("warm", img_path, img_path, "MildDemented", PROBS, PATIENT)  # spawn the pool
+
+    def pooled(i=[0]):
+        i[0] += 1
+        with app.app_context():
+            path = generate_report(f"b{i[0]}", img_path, img_path, "MildDemented", PROBS, PATIENT)
+        return os.path.getsize(path)
+
+    _run(f"process pool ({args.processes} workers)", pooled, args.reports, args.threads)
@@ -0,0 +1,107 @@
+# benchmarks/bench_training.py
+# Run from project root:  python -m benchmarks.bench_training --images 512 --epochs 2
+#
+# Trains on a synthetic ImageFolder dataset with the original per-epoch JPEG decoding
+# loop and with the shard pipeline (services.dataset_shard) in a few configurations,
+# each in its own process, and reports the last epoch's wall-clock time, throughput
+# and peak RSS as printed by services.train_model. The input pipeline alone (no
+# model) is timed too, since on few cores the training step hides most of it.
+# Worker RSS is for forked workers and includes pages still shared with the parent.
+import os
+import re
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+from benchmarks._app import synthetic_mri
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLASSES = ["MildDemented", "ModerateDemented", "NonDemented", "VeryMildDemented"]
+EPOCH_LINE = re.compile(r"Epoch (\d+) → .*\| ([\d.]+)s \(([\d.]+) img/s\) \| peak RSS (\d+) MiB \(worker (\d+) MiB\)")
+
+
+def _dataset(root, images):
+    for c, name in enumerate(CLASSES):
+        os.makedirs(os.path.join(root, name), exist_ok=True)
+        for i in range(images // len(CLASSES)):
+            # 176x208 like the OASIS-derived Alzheimer MRI sets
+            with open(os.path.join(root, name, f"{i}.jpg"), "wb") as f:
+                f.write(synthetic_mri(c * 100000 + i, size=208))
+
+
+def _loader_only(data, shard, batch_size):
+    """Seconds to iterate one epoch of input batches (model input, float32) without training."""
+    from torch.utils.data import DataLoader
+    from torchvision import datasets, transforms
+    from services.dataset_shard import ShardDataset, shard_loader
+    from utils.preprocess import normalize_batch
+
+    transform = transforms.Compose([transforms.Resize((224, 224)), transforms.ToTensor(),
+                                    transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])])
+    timings = {}
+    t0 = time.perf_counter()
+    for x, _ in DataLoader(datasets.ImageFolder(data, transform=transform), batch_size=batch_size, shuffle=True):
+        pass
+    timings["ImageFolder"] = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for x, _ in shard_loader(ShardDataset(shard), batch_size, shuffle=True):
+        x = normalize_batch(x)
+    timings["shard"] = time.perf_counter() - t0
+    return timings
+
+
+def _train(data, extra, epochs, batch_size):
+    cmd = [sys.executable, "-m", "services.train_model", "--data", data, "--no-pretrained",
+           "--epochs", str(epochs), "--batch-size", str(batch_size),
+           "--out", os.path.join(os.path.dirname(data), "model.pth")] + extra
+    out = subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True)
+    epochs_seen = EPOCH_LINE.findall(out.stdout)
+    if out.returncode != 0 or not epochs_seen:
+        raise RuntimeError(f"{' '.join(extra) or 'baseline'} failed:\n{out.stdout[-2000:]}\n{out.stderr[-2000:]}")
+    _, seconds, ips, rss, worker = epochs_seen[-1]
+    return float(seconds), float(ips), int(rss), int(worker)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Epoch time / peak RSS: ImageFolder loop vs uint8 shard pipeline")
+    parser.add_argument("--images", type=int, default=512)
+    parser.add_argument("--epochs", type=int, default=2, help="the last epoch is reported")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--compile", action="store_true", help="also time --compile (slow to warm up)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="alz-train-")
+    data = os.path.join(workdir, "dataset")
+    _dataset(data, args.images)
+    shard = os.path.join(workdir, "shard")
+
+    w = str(args.workers)
+    runs = {
+        "ImageFolder (original)": [],
+        f"ImageFolder, {w} workers": ["--workers", w],
+        "shard": ["--shard", shard],
+        f"shard, {w} workers": ["--shard", shard, "--workers", w],
+        f"shard, {w} workers, bf16": ["--shard", shard, "--workers", w, "--amp", "bf16"],
+    }
+    if args.compile:
+        runs[f"shard, {w} workers, compile"] = ["--shard", shard, "--workers", w, "--compile"]
+
+    t0 = time.perf_counter()
+    from services.dataset_shard import build_shard
+    build_shard(data, shard, workers=args.workers)
+    print(f"{args.images} images, {os.cpu_count()} cpus; shard built once in {time.perf_counter() - t0:.1f}s "
+          f"({os.path.getsize(shard + '.u8') / 2**20:.0f} MiB)")
+
+    loading = _loader_only(data, shard, args.batch_size)
+    print(f"input pipeline only, one epoch: ImageFolder {loading['ImageFolder']:.2f}s, "
+          f"shard {loading['shard']:.2f}s ({loading['ImageFolder'] / loading['shard']:.0f}x)")
+
+    base = None
+    for name, extra in runs.items():
+        seconds, ips, rss, worker = _train(data, extra, args.epochs, args.batch_size)
+        base = base or seconds
+        print(f"{name:<30} epoch {seconds:7.1f}s ({base / seconds:4.2f}x) {ips:7.1f} img/s | "
+              f"peak RSS {rss:5d} MiB, worker {worker:4d} MiB")
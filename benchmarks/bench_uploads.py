@@ -0,0 +1,65 @@
+# benchmarks/bench_uploads.py
+# Run from project root:  python -m benchmarks.bench_uploads
+#
+# Cost of turning away bad uploads: the header check alone, and POST /predict/ end
+# to end for junk, a decompression bomb (tiny PNG declaring a 60000x60000 canvas) and
+# a truncated JPEG, next to a full PIL decode of a valid scan. Also confirms rejected
+# uploads leave nothing in UPLOAD_DIR.
+import io
+import os
+import time
+import zlib
+import struct
+import argparse
+import statistics
+
+from PIL import Image
+
+from benchmarks._app import make_app, synthetic_mri
+from services.storage_service import image_header, UploadRejected
+
+
+def _png_bomb(side):
+    def chunk(kind, body):
+        return struct.pack(">I", len(body)) + kind + body + struct.pack(">I", zlib.crc32(kind + body))
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", side, side, 8, 0, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(b"\0" * 4096)) + chunk(b"IEND", b""))
+
+
+def _us(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1e6)
+    return statistics.median(times)
+
+
+def _check(data):
+    try:
+        image_header(data, 25_000_000)
+    except UploadRejected:
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Early upload rejection: header check vs full decode")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    good = synthetic_mri(0, 512)
+    cases = {"junk": b"%PDF-1.4 not an image" * 10, "bomb": _png_bomb(60000), "truncated": good[:64]}
+
+    print(f"header check:  good {_us(lambda: _check(good), args.repeat * 10):6.1f} us"
+          + "".join(f", {n} {_us(lambda d=d: _check(d), args.repeat * 10):.1f} us" for n, d in cases.items()))
+    print(f"PIL decode:    good {_us(lambda: Image.open(io.BytesIO(good)).convert('RGB'), args.repeat):6.1f} us")
+
+    app = make_app(EAGER_MODEL_LOAD=False)
+    client = app.test_client()
+    for name, data in cases.items():
+        def post(d=data):
+            return client.post("/predict/", data={"image": (io.BytesIO(d), "scan.jpg")},
+                               content_type="multipart/form-data")
+        status = post().status_code
+        print(f"POST {name:<10} -> {status}: {_us(post, args.repeat):7.1f} us per request")
+    print(f"files in UPLOAD_DIR after rejections: {len(os.listdir(app.config['UPLOAD_DIR']))}")
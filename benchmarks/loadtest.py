@@ -0,0 +1,397 @@
+# benchmarks/loadtest.py
+# End-to-end load test and regression check. Run from project root:
+#
+#   python -m benchmarks.loadtest run --out baseline.json                 (synthetic load)
+#   python -m benchmarks.loadtest run --out current.json --record trace.jsonl
+#   python -m benchmarks.loadtest compare baseline.json current.json --threshold 0.10
+#   python -m benchmarks.loadtest replay trace.jsonl --uploads trace.jsonl.uploads --out replay.json
+#
+# "run" starts the app in a subprocess (Flask threaded server, or uvicorn with --mode asgi)
+# against a temp SQLite DB and upload dir, then drives each stage - GET /health,
+# POST /predict/ with and without Grad-CAM, and the file routes - at every concurrency
+# level. Per stage it records throughput, p50/p95/p99, status codes, the server's peak
+# RSS (process tree, sampled) and the server-side span breakdown from /metrics.
+#
+# --record starts the server with REQUEST_TRACE_FILE, so the trace is written by the
+# app itself (same format as production traces) and the uploads it names are copied
+# next to it. "replay" sends such a trace - from this tool or from a live server -
+# to a fresh app, at the recorded pace (--speed) or closed-loop (--concurrency).
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import statistics
+import http.client
+from urllib.parse import urlencode, urlsplit
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks._app import synthetic_mri
+from benchmarks.bench_asgi import _free_port, _multipart, _start
+
+LATENCY_KEYS = ("p50_ms", "p95_ms", "p99_ms")
+NOT_REPLAYED = ("/ready", "/metrics")   # readiness probes and scrapes, not user traffic
+
+
+# ───────────────────────────────────────
+# SERVER SIDE MEASUREMENTS
+# ───────────────────────────────────────
+def _tree_rss_kib(pid):
+    """VmRSS of pid and all its descendants (inference pool / report workers), Linux only."""
+    total, stack = 0, [pid]
+    while stack:
+        p = stack.pop()
+        try:
+            with open(f"/proc/{p}/status") as f:
+                total += next((int(l.split()[1]) for l in f if l.startswith("VmRSS:")), 0)
+            with open(f"/proc/{p}/task/{p}/children") as f:
+                stack += [int(c) for c in f.read().split()]
+        except (OSError, ValueError):
+            continue
+    return total
+
+
+class RssSampler:
+    """Peak process-tree RSS while the block runs (polled, so short spikes can be missed)."""
+
+    def __init__(self, pid, interval=0.02):
+        self.pid, self.interval, self.peak = pid, interval, 0
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, _tree_rss_kib(self.pid))
+            self._stop.wait(self.interval)
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def _stage_totals(port):
+    """{stage: (sum_seconds, count)} from the server's alz_stage_duration_seconds."""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    conn.request("GET", "/metrics")
+    totals = {}
+    for line in conn.getresponse().read().decode().splitlines():
+        for suffix, slot in (("_sum", 0), ("_count", 1)):
+            prefix = f"alz_stage_duration_seconds{suffix}{{stage=\""
+            if line.startswith(prefix):
+                stage, value = line[len(prefix):].split('"}', 1)
+                entry = totals.setdefault(stage, [0.0, 0.0])
+                entry[slot] = float(value)
+    return totals
+
+
+def _stage_breakdown(before, after):
+    """Mean ms per server span over the requests between two /metrics scrapes."""
+    out = {}
+    for stage, (total, count) in after.items():
+        t0, c0 = before.get(stage, (0.0, 0.0))
+        if count > c0:
+            out[stage] = round((total - t0) / (count - c0) * 1000.0, 3)
+    return out
+
+
+# ───────────────────────────────────────
+# CLIENT
+# ───────────────────────────────────────
+def _summary(latencies, codes, elapsed):
+    ok = sorted(latencies)
+    q = statistics.quantiles(ok, n=100) if len(ok) >= 2 else [ok[0] if ok else float("nan")] * 99
+    total = sum(codes.values())
+    return {
+        "requests": total,
+        "rps": sum(v for k, v in codes.items() if k < 400) / elapsed if elapsed else 0.0,
+        "p50_ms": q[49], "p95_ms": q[94], "p99_ms": q[98],
+        "errors": sum(v for k, v in codes.items() if k >= 400),
+        "codes": {str(k): v for k, v in sorted(codes.items())},
+    }
+
+
+def _drive(port, make_request, concurrency, seconds=None, total=None, on_response=None):
+    """
+    Closed loop: concurrency clients each send make_request(i) back to back until
+    `seconds` pass or `total` requests were sent. Latency is kept for status < 400.
+    """
+    stop = time.time() + seconds if seconds else None
+    counter = iter(range(total if total is not None else 1 << 62))
+    lock = threading.Lock()
+
+    def client(_):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=300)
+        latencies, codes = [], {}
+        while stop is None or time.time() < stop:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                break
+            method, path, body, headers = make_request(i)
+            t0 = time.perf_counter()
+            conn.request(method, path, body=body, headers=headers)
+            resp = conn.getresponse()
+            data = resp.read()
+            if resp.status < 400:
+                latencies.append((time.perf_counter() - t0) * 1000.0)
+            codes[resp.status] = codes.get(resp.status, 0) + 1
+            if on_response is not None:
+                on_response(path, resp.status, data)
+        return latencies, codes
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        results = list(ex.map(client, range(concurrency)))
+    elapsed = time.perf_counter() - t0
+    codes = {}
+    for _, c in results:
+        for k, v in c.items():
+            codes[k] = codes.get(k, 0) + v
+    return _summary([l for lat, _ in results for l in lat], codes, elapsed)
+
+
+def _measure(proc, port, fn):
+    before = _stage_totals(port)
+    with RssSampler(proc.pid) as rss:
+        result = fn()
+    result["peak_rss_mib"] = round(rss.peak / 1024, 1)
+    result["server_stages_ms"] = _stage_breakdown(before, _stage_totals(port))
+    return result
+
+
+# ───────────────────────────────────────
+# MODES
+# ───────────────────────────────────────
+def _meta(args, extra=None):
+    import platform
+    import subprocess
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip()
+    except OSError:
+        commit = None
+    return {"created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "commit": commit,
+            "python": platform.python_version(), "cpus": os.cpu_count(), "mode": args.mode,
+            "env": args.env, **(extra or {})}
+
+
+def _env(pairs, **defaults):
+    env = dict(defaults)
+    env.update(dict(p.split("=", 1) for p in pairs))
+    return env
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix="alz-load-")
+    env = _env(args.env, PREDICTION_CACHE="false")
+    if args.record:
+        env["REQUEST_TRACE_FILE"] = os.path.abspath(args.record)
+    bodies = {explain: [_multipart(synthetic_mri(i), {"explain": explain}) for i in range(args.images)]
+              for explain in ("false", "true")}
+    file_paths = []
+
+    def keep_urls(path, status, data):
+        if status == 200 and path.startswith("/predict"):
+            urls = json.loads(data).get("urls") or {}
+            file_paths.extend(urlsplit(u).path for u in urls.values() if u)
+
+    def predict(explain):
+        def make(i):
+            body, ctype = bodies[explain][i % len(bodies[explain])]
+            return "POST", "/predict/", body, {"Content-Type": ctype}
+        return make
+
+    stages = {
+        "health": lambda i: ("GET", "/health", None, {}),
+        "predict": predict("false"),
+        "predict_explain": predict("true"),
+        "files": lambda i: ("GET", file_paths[i % len(file_paths)], None, {}),
+    }
+    selected = args.stages.split(",")
+
+    port = _free_port()
+    proc = _start(args.mode, port, workdir, env)
+    report = {"meta": _meta(args, {"images": args.images, "seconds": args.seconds}), "stages": {}}
+    try:
+        for name in selected:
+            for c in (int(x) for x in args.concurrency.split(",")):
+                if name == "files" and not file_paths:
+                    print("files: no file URLs collected (run a predict stage first), skipped")
+                    break
+                result = _measure(proc, port, lambda: _drive(
+                    port, stages[name], c, seconds=args.seconds,
+                    on_response=keep_urls if name.startswith("predict") else None))
+                key = f"{name}@c{c}"
+                report["stages"][key] = {"stage": name, "concurrency": c, **result}
+                _print_row(key, result)
+    finally:
+        proc.terminate()
+        proc.wait(10)
+
+    if args.record:
+        uploads = args.record + ".uploads"
+        shutil.copytree(os.path.join(workdir, "uploads"), uploads, dirs_exist_ok=True)
+        print(f"Trace: {args.record} (uploads copied to {uploads})")
+    _write(report, args.out)
+
+
+def replay(args):
+    with open(args.trace) as f:
+        trace = [json.loads(line) for line in f if line.strip()]
+    trace = [t for t in trace if t["path"] not in NOT_REPLAYED]
+    if not trace:
+        raise SystemExit(f"{args.trace} has no requests")
+    missing = 0
+
+    def make(i):
+        nonlocal missing
+        t = trace[i]
+        path = t["path"] + ("?" + urlencode(t["query"]) if t.get("query") else "")
+        if t["method"] != "POST" or not t.get("upload"):
+            return t["method"], path, None, {}
+        upload = os.path.join(args.uploads, t["upload"]) if args.uploads else None
+        if upload and os.path.isfile(upload):
+            with open(upload, "rb") as f:
+                data = f.read()
+        else:
+            missing += 1
+            data = synthetic_mri(i)
+        body, ctype = _multipart(data, t.get("form") or {})
+        return "POST", path, body, {"Content-Type": ctype}
+
+    workdir = tempfile.mkdtemp(prefix="alz-replay-")
+    port = _free_port()
+    proc = _start(args.mode, port, workdir, _env(args.env, PREDICTION_CACHE="false"))
+    try:
+        if args.speed:
+            result = _measure(proc, port, lambda: _paced(port, trace, make, args.speed, args.concurrency))
+        else:
+            result = _measure(proc, port, lambda: _drive(port, make, args.concurrency, total=len(trace)))
+    finally:
+        proc.terminate()
+        proc.wait(10)
+
+    key = f"replay@{'x%g' % args.speed if args.speed else 'c%d' % args.concurrency}"
+    _print_row(key, result)
+    if missing:
+        print(f"{missing} upload(s) not found under --uploads; synthetic images were sent instead")
+    report = {"meta": _meta(args, {"trace": os.path.abspath(args.trace), "requests": len(trace),
+                                   "missing_uploads": missing}),
+              "stages": {key: {"stage": "replay", "concurrency": args.concurrency, **result}}}
+    _write(report, args.out)
+
+
+def _paced(port, trace, make, speed, max_inflight):
+    """Open loop: request i is sent at its recorded offset / speed (late if max_inflight are busy)."""
+    start = trace[0]["t"]
+    latencies, codes, lag = [], {}, []
+    lock = threading.Lock()
+    local = threading.local()
+
+    def send(i, due):
+        conn = getattr(local, "conn", None) or http.client.HTTPConnection("127.0.0.1", port, timeout=300)
+        local.conn = conn
+        method, path, body, headers = make(i)
+        t0 = time.perf_counter()
+        lag.append(max(0.0, t0 - due))
+        conn.request(method, path, body=body, headers=headers)
+        resp = conn.getresponse()
+        resp.read()
+        with lock:
+            if resp.status < 400:
+                latencies.append((time.perf_counter() - t0) * 1000.0)
+            codes[resp.status] = codes.get(resp.status, 0) + 1
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_inflight) as ex:
+        for i, t in enumerate(trace):
+            due = t0 + (t["t"] - start) / speed
+            time.sleep(max(0.0, due - time.perf_counter()))
+            ex.submit(send, i, due)
+    result = _summary(latencies, codes, time.perf_counter() - t0)
+    result["mean_send_lag_ms"] = statistics.fmean(lag) * 1000.0 if lag else 0.0
+    return result
+
+
+def compare(args):
+    """Print every metric's change; exit 1 when any moved the wrong way by more than threshold."""
+    with open(args.baseline) as f:
+        base = json.load(f)["stages"]
+    with open(args.current) as f:
+        cur = json.load(f)["stages"]
+
+    regressions = 0
+    print(f"{'stage':<22} {'metric':<13} {'baseline':>10} {'current':>10} {'change':>8}")
+    for key in sorted(set(base) & set(cur)):
+        b, c = base[key], cur[key]
+        checks = [("rps", True)] + [(k, False) for k in LATENCY_KEYS] + [("peak_rss_mib", False)]
+        for metric, higher_is_better in checks:
+            old, new = b.get(metric), c.get(metric)
+            if not old or new is None or old != old or new != new:   # missing / zero / NaN
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            # tiny absolute latency moves are noise, whatever their ratio
+            noise = metric in LATENCY_KEYS and abs(new - old) < args.min_ms
+            flag = "REGRESSION" if worse > args.threshold and not noise else ""
+            regressions += bool(flag)
+            print(f"{key:<22} {metric:<13} {old:10.2f} {new:10.2f} {change:+8.1%} {flag}")
+    for key in sorted(set(base) ^ set(cur)):
+        print(f"{key:<22} only in {'baseline' if key in base else 'current'}")
+    print(f"\n{regressions} regression(s) beyond {args.threshold:.0%}")
+    sys.exit(1 if regressions else 0)
+
+
+def _print_row(key, r):
+    print(f"{key:<22} {r['rps']:8.1f} req/s | p50 {r['p50_ms']:8.1f} p95 {r['p95_ms']:8.1f} "
+          f"p99 {r['p99_ms']:8.1f} ms | peak RSS {r['peak_rss_mib']:7.1f} MiB | {r['codes']}")
+
+
+def _write(report, path):
+    if path:
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end load test / regression check for the API")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    def server_options(p):
+        p.add_argument("--mode", default="wsgi", choices=("wsgi", "asgi"))
+        p.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                       help="extra server config, e.g. --env INFERENCE_BATCHING=true (repeatable)")
+        p.add_argument("--out", default=None, help="write the JSON report here")
+
+    p = sub.add_parser("run", help="synthetic load at fixed concurrency levels")
+    server_options(p)
+    p.add_argument("--stages", default="health,predict,predict_explain,files")
+    p.add_argument("--concurrency", default="1,4,16")
+    p.add_argument("--seconds", type=float, default=20, help="per stage and concurrency level")
+    p.add_argument("--images", type=int, default=64, help="distinct synthetic images")
+    p.add_argument("--record", default=None, help="also write the server's request trace to this JSONL file")
+
+    p = sub.add_parser("replay", help="send a recorded JSONL trace to a fresh server")
+    server_options(p)
+    p.add_argument("trace")
+    p.add_argument("--uploads", default=None, help="directory holding the traced uploads (a copy of UPLOAD_DIR)")
+    p.add_argument("--speed", type=float, default=0, help="replay at the recorded pace x speed (0 = closed loop)")
+    p.add_argument("--concurrency", type=int, default=8, help="clients (closed loop) / max in flight (paced)")
+
+    p = sub.add_parser("compare", help="flag regressions between two reports")
+    p.add_argument("baseline")
+    p.add_argument("current")
+    p.add_argument("--threshold", type=float, default=0.10, help="relative change counted as a regression")
+    p.add_argument("--min-ms", type=float, default=2.0, help="ignore latency changes smaller than this")
+
+    args = parser.parse_args()
+    {"run": run, "replay": replay, "compare": compare}[args.cmd](args)
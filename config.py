@@ -4,6 +4,24 @@ from dotenv import load_dotenv
 # Load .env with proper variable interpolation support (so you CAN use ${VAR} syntax if you want later)
 load_dotenv(override=True)
 
+
+def _engine_options(uri):
+    """SQLAlchemy engine/pool settings; in-memory SQLite uses a single-connection pool and takes none."""
+    if uri in ("sqlite://", "sqlite:///:memory:"):
+        return {}
+    options = {
+        "pool_pre_ping": True,                                        # drop connections the server closed
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),    # seconds; below MySQL wait_timeout
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", "30")),
+    }
+    if uri.startswith("sqlite"):
+        # writers wait for the lock instead of failing with "database is locked"
+        options["connect_args"] = {"timeout": 15}
+    return options
+
+
 class Config:
     """Central configuration class"""
 
@@ -16,6 +34,13 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL", "sqlite:///alzheimers.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_ECHO = False  # Set to True only if you want to debug SQL queries
+    SQLALCHEMY_ENGINE_OPTIONS = _engine_options(SQLALCHEMY_DATABASE_URI)
+    # SQLite only: WAL lets readers run alongside the writer; NORMAL syncs at checkpoints, not every commit
+    SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    # Apply pending migrations (migrations/versions) when the app starts. Set False when
+    # several processes start at once and run "flask db upgrade" from the deploy instead.
+    DB_AUTO_UPGRADE = os.getenv("DB_AUTO_UPGRADE", "True").lower() in ("true", "1", "yes")
 
     # ───────────────────────────────────────
     # APP SETTINGS
@@ -28,8 +53,152 @@ class Config:
     LOG_DIR = os.getenv("LOG_DIR", "logs")
     MODEL_PATH = os.getenv("MODEL_PATH", "model/alzheimer_model.pth")
 
+    # ───────────────────────────────────────
+    # INFERENCE BACKEND
+    # ───────────────────────────────────────
+    # eager | torchscript | int8_dynamic | int8_static | onnx
+    # Build artifacts offline:  python -m services.export_model --backend <name>
+    # OPTIMIZED_MODEL_PATH defaults to MODEL_PATH with a .<backend>.pt/.onnx suffix.
+    # An artifact is only used when its .source sidecar matches the serving weights;
+    # otherwise torchscript / int8_dynamic are rebuilt in memory and the others refused.
+    INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "eager")
+    OPTIMIZED_MODEL_PATH = os.getenv("OPTIMIZED_MODEL_PATH") or None
+    CHANNELS_LAST = os.getenv("CHANNELS_LAST", "False").lower() in ("true", "1", "yes")
+
+    # ───────────────────────────────────────
+    # MODEL REGISTRY / HOT RELOAD
+    # ───────────────────────────────────────
+    # When registry.json in MODEL_REGISTRY_DIR names an active model it replaces
+    # MODEL_PATH. Manage it with:  python -m services.registry_service --help
+    MODEL_REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", "model/registry")
+    MODEL_RELOAD_INTERVAL = float(os.getenv("MODEL_RELOAD_INTERVAL", "10"))   # seconds, 0 = never re-check
+
+    # ───────────────────────────────────────
+    # INFERENCE PROCESS POOL
+    # ───────────────────────────────────────
+    # >0: plain predictions run in this many spawned processes that share the
+    # weights through shared memory (Grad-CAM stays in the web process).
+    INFERENCE_PROCESSES = int(os.getenv("INFERENCE_PROCESSES", "0"))
+    INFERENCE_PROCESS_THREADS = int(os.getenv("INFERENCE_PROCESS_THREADS", "0"))    # 0 = cpu_count // processes
+    INFERENCE_PROCESS_MAX_BATCH = int(os.getenv("INFERENCE_PROCESS_MAX_BATCH", "32"))
+
+    # ───────────────────────────────────────
+    # STARTUP / READINESS
+    # ───────────────────────────────────────
+    # The model is loaded and warmed up in the background when the app starts;
+    # GET /ready returns 503 until that finishes. Disable for file-serving-only workers.
+    EAGER_MODEL_LOAD = os.getenv("EAGER_MODEL_LOAD", "True").lower() in ("true", "1", "yes")
+    WARMUP_ITERATIONS = int(os.getenv("WARMUP_ITERATIONS", "3"))
+    TORCH_NUM_THREADS = int(os.getenv("TORCH_NUM_THREADS", "0"))          # 0 = torch default
+    TORCH_INTEROP_THREADS = int(os.getenv("TORCH_INTEROP_THREADS", "0"))
+
+    # ───────────────────────────────────────
+    # PREDICTION CACHE
+    # ───────────────────────────────────────
+    # Keyed by (sha256 of upload bytes, model version). Memory LRU in front of a
+    # SQLite file; both tiers are bounded and expire entries after CACHE_TTL_SECONDS.
+    PREDICTION_CACHE = os.getenv("PREDICTION_CACHE", "True").lower() in ("true", "1", "yes")
+    CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", "instance/prediction_cache.db")
+    CACHE_MEMORY_ENTRIES = int(os.getenv("CACHE_MEMORY_ENTRIES", "1024"))
+    CACHE_DISK_ENTRIES = int(os.getenv("CACHE_DISK_ENTRIES", "100000"))
+    CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", str(30 * 86400)))
+
+    # ───────────────────────────────────────
+    # INFERENCE MICRO-BATCHING
+    # ───────────────────────────────────────
+    # Concurrent /predict requests are queued and run through the model together.
+    # A batch is flushed at BATCH_MAX_SIZE images or after BATCH_MAX_WAIT_MS.
+    INFERENCE_BATCHING = os.getenv("INFERENCE_BATCHING", "False").lower() in ("true", "1", "yes")
+    BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "8"))
+    BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "10"))
+    BATCH_MAX_QUEUE = int(os.getenv("BATCH_MAX_QUEUE", "256"))
+
+    # ───────────────────────────────────────
+    # BACKGROUND JOBS (heatmap + PDF report)
+    # ───────────────────────────────────────
+    # With ASYNC_ARTIFACTS (or ?async=true) /predict/ answers after classification
+    # and a job in the "jobs" table renders the artifacts. Poll /predict/jobs/<id>.
+    ASYNC_ARTIFACTS = os.getenv("ASYNC_ARTIFACTS", "False").lower() in ("true", "1", "yes")
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))   # per process; 0 = this process only enqueues
+    JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "100"))  # beyond this, requests run synchronously
+    JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "2.0"))
+    # a running job whose process stopped renewing its lease for this long is run again elsewhere
+    JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+
+    # ───────────────────────────────────────
+    # BATCH ENDPOINT (/predict/batch)
+    # ───────────────────────────────────────
+    BATCH_MAX_IMAGES = int(os.getenv("BATCH_MAX_IMAGES", "64"))
+    BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "32"))        # images per model forward
+    BATCH_MAX_CONTENT_LENGTH = 100 * 1024 * 1024                      # whole multipart/zip body
+
+    # ───────────────────────────────────────
+    # PDF REPORTS
+    # ───────────────────────────────────────
+    REPORT_PROCESSES = int(os.getenv("REPORT_PROCESSES", "0"))         # render pool size, 0 = in the request thread
+    LAZY_REPORTS = os.getenv("LAZY_REPORTS", "False").lower() in ("true", "1", "yes")  # render on first download
+
+    # ───────────────────────────────────────
+    # HEATMAPS
+    # ───────────────────────────────────────
+    # The heatmap is stored as a ~100 byte CAM per result; /predict/heat/<file> renders the
+    # overlay on request (?size=&colormap=&alpha=) and keeps renders in a bounded LRU.
+    # EXPLAIN_MODE: gradcam (forward + backward), cam (fc-weight CAM, forward only) or none;
+    # a request's explain=<mode> / true / false overrides it.
+    EXPLAIN_MODE = os.getenv("EXPLAIN_MODE", "gradcam").lower()
+    HEATMAP_CACHE_MB = float(os.getenv("HEATMAP_CACHE_MB", "64"))
+    HEATMAP_MAX_SIZE = int(os.getenv("HEATMAP_MAX_SIZE", "2048"))     # largest ?size= (longest side, px)
+
+    # ───────────────────────────────────────
+    # FILE DOWNLOADS
+    # ───────────────────────────────────────
+    FILE_SENDFILE = os.getenv("FILE_SENDFILE", "")                    # "", "x-sendfile" (Apache) or "x-accel" (nginx)
+    FILE_ACCEL_PREFIX = os.getenv("FILE_ACCEL_PREFIX", "/protected-uploads/")  # nginx internal location aliased to UPLOAD_DIR
+
+    # ───────────────────────────────────────
+    # RESULT WRITE-BEHIND
+    # ───────────────────────────────────────
+    # Group predictions' Patient/Result inserts into one bulk transaction per batch.
+    # Requests still wait for their batch to commit (they return the new ids).
+    RESULT_WRITE_BEHIND = os.getenv("RESULT_WRITE_BEHIND", "False").lower() in ("true", "1", "yes")
+    WRITE_BEHIND_BATCH = int(os.getenv("WRITE_BEHIND_BATCH", "200"))
+    WRITE_BEHIND_FLUSH_MS = float(os.getenv("WRITE_BEHIND_FLUSH_MS", "2"))
+    WRITE_BEHIND_MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING", "5000"))
+
+    # ───────────────────────────────────────
+    # HISTORY API (/patients, /results)
+    # ───────────────────────────────────────
+    QUERY_PAGE_SIZE = int(os.getenv("QUERY_PAGE_SIZE", "50"))
+    QUERY_MAX_PAGE_SIZE = int(os.getenv("QUERY_MAX_PAGE_SIZE", "500"))
+    # GET /export/results and services/export_service.py: rows per server-side cursor
+    # fetch (one CSV block / Parquet row group each); memory is bounded by this, not the table
+    EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "10000"))
+
+    # ───────────────────────────────────────
+    # METRICS / PROFILING / REQUEST TRACES
+    # ───────────────────────────────────────
+    # GET /metrics always serves per-stage and per-endpoint latency histograms.
+    # A request is profiled (cProfile, .prof file in PROFILE_DIR, name returned in the
+    # X-Profile-File header) when it carries ?profile=1 and X-Profile-Token: PROFILE_TOKEN,
+    # or by random sampling at PROFILE_SAMPLE_RATE. Empty token / rate 0 = off.
+    PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+    PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+    PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+    # Append every request to this JSONL file for replay with benchmarks/loadtest.py
+    # (routes, options, upload file names; no patient fields). Empty = off.
+    REQUEST_TRACE_FILE = os.getenv("REQUEST_TRACE_FILE", "")
+
+    # ───────────────────────────────────────
+    # ASGI SERVING (asgi.py)
+    # ───────────────────────────────────────
+    ASGI_EXECUTOR_WORKERS = int(os.getenv("ASGI_EXECUTOR_WORKERS", "8"))  # threads running predictions
+    ASGI_MAX_INFLIGHT = int(os.getenv("ASGI_MAX_INFLIGHT", "32"))        # running + waiting; beyond this -> 429
+
     # ───────────────────────────────────────
     # OPTIONAL: Max upload size (5MB default)
     # ───────────────────────────────────────
     MAX_CONTENT_LENGTH = 5 * 1024 * 1024  # 5 MB limit for MRI images
+    # width x height read from the JPEG/PNG header before decoding; larger canvases
+    # (decompression bombs) get 413 without being decoded or written to disk
+    MAX_IMAGE_PIXELS = int(os.getenv("MAX_IMAGE_PIXELS", str(25_000_000)))
 
@@ -0,0 +1,50 @@
+"""baseline: patients and results
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 10:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'patients',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('full_name', sa.String(length=120), nullable=False),
+        sa.Column('age', sa.Integer(), nullable=True),
+        sa.Column('gender', sa.String(length=20), nullable=True),
+        sa.Column('email', sa.String(length=120), nullable=False),
+        sa.Column('city', sa.String(length=100), nullable=True),
+        sa.Column('doctor_name', sa.String(length=100), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_table(
+        'results',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('patient_id', sa.Integer(), nullable=False),
+        sa.Column('prediction_label', sa.String(length=50), nullable=False),
+        sa.Column('confidence', sa.Float(), nullable=False),
+        sa.Column('probabilities', sa.JSON(), nullable=False),
+        sa.Column('mri_image_path', sa.String(length=255), nullable=True),
+        sa.Column('heatmap_path', sa.String(length=255), nullable=True),
+        sa.Column('report_path', sa.String(length=255), nullable=True),
+        sa.Column('predicted_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['patient_id'], ['patients.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+
+def downgrade():
+    op.drop_table('results')
+    op.drop_table('patients')
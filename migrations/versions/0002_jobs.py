@@ -0,0 +1,41 @@
+"""jobs table for background heatmaps and reports
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 10:28:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # a database from db.create_all() may already have it
+    if sa.inspect(op.get_bind()).has_table('jobs'):
+        return
+    op.create_table(
+        'jobs',
+        sa.Column('id', sa.String(length=32), nullable=False),
+        sa.Column('result_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=False),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['result_id'], ['results.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_jobs_status', 'jobs', ['status'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_jobs_status', table_name='jobs')
+    op.drop_table('jobs')
@@ -0,0 +1,28 @@
+"""index results.report_path (lazy report lookups)
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 11:40:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # a database from db.create_all() may already have some of these
+    existing = sa.inspect(op.get_bind())
+    results_indexes = {i['name'] for i in existing.get_indexes('results')}
+    if 'ix_results_report_path' not in results_indexes:
+        op.create_index('ix_results_report_path', 'results', ['report_path'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_results_report_path', table_name='results')
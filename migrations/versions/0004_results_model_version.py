@@ -0,0 +1,34 @@
+"""results.model_version
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 12:30:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # a database from db.create_all() may already have some of these
+    existing = sa.inspect(op.get_bind())
+    results_columns = {c['name'] for c in existing.get_columns('results')}
+    results_indexes = {i['name'] for i in existing.get_indexes('results')}
+    if 'model_version' not in results_columns:
+        with op.batch_alter_table('results') as batch_op:
+            batch_op.add_column(sa.Column('model_version', sa.String(length=64), nullable=True))
+    if 'ix_results_model_version' not in results_indexes:
+        op.create_index('ix_results_model_version', 'results', ['model_version'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_results_model_version', table_name='results')
+    with op.batch_alter_table('results') as batch_op:
+        batch_op.drop_column('model_version')
@@ -0,0 +1,32 @@
+"""indexes for patient lookups by email and per-patient history
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 13:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # a database from db.create_all() may already have some of these
+    existing = sa.inspect(op.get_bind())
+    patients_indexes = {i['name'] for i in existing.get_indexes('patients')}
+    results_indexes = {i['name'] for i in existing.get_indexes('results')}
+    if 'ix_patients_email' not in patients_indexes:
+        op.create_index('ix_patients_email', 'patients', ['email'], unique=False)
+    if 'ix_results_patient_predicted' not in results_indexes:
+        op.create_index('ix_results_patient_predicted', 'results', ['patient_id', 'predicted_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_results_patient_predicted', table_name='results')
+    op.drop_index('ix_patients_email', table_name='patients')
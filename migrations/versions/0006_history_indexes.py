@@ -0,0 +1,35 @@
+"""indexes for the paginated history API
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 13:30:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # a database from db.create_all() may already have some of these
+    existing = sa.inspect(op.get_bind())
+    patients_indexes = {i['name'] for i in existing.get_indexes('patients')}
+    results_indexes = {i['name'] for i in existing.get_indexes('results')}
+    if 'ix_patients_doctor_name' not in patients_indexes:
+        op.create_index('ix_patients_doctor_name', 'patients', ['doctor_name'], unique=False)
+    if 'ix_results_predicted' not in results_indexes:
+        op.create_index('ix_results_predicted', 'results', ['predicted_at', 'id'], unique=False)
+    if 'ix_results_label_predicted' not in results_indexes:
+        op.create_index('ix_results_label_predicted', 'results', ['prediction_label', 'predicted_at', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_results_label_predicted', table_name='results')
+    op.drop_index('ix_results_predicted', table_name='results')
+    op.drop_index('ix_patients_doctor_name', table_name='patients')
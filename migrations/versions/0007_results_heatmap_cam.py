@@ -0,0 +1,34 @@
+"""results.heatmap_cam and index on results.heatmap_path
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 15:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # a database from db.create_all() may already have some of these
+    existing = sa.inspect(op.get_bind())
+    results_columns = {c['name'] for c in existing.get_columns('results')}
+    results_indexes = {i['name'] for i in existing.get_indexes('results')}
+    if 'heatmap_cam' not in results_columns:
+        with op.batch_alter_table('results') as batch_op:
+            batch_op.add_column(sa.Column('heatmap_cam', sa.LargeBinary(), nullable=True))
+    if 'ix_results_heatmap_path' not in results_indexes:
+        op.create_index('ix_results_heatmap_path', 'results', ['heatmap_path'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_results_heatmap_path', table_name='results')
+    with op.batch_alter_table('results') as batch_op:
+        batch_op.drop_column('heatmap_cam')
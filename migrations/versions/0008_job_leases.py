@@ -0,0 +1,33 @@
+"""jobs.claimed_by and jobs.heartbeat_at (leases on running jobs)
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 17:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # a database from db.create_all() may already have some of these
+    existing = sa.inspect(op.get_bind())
+    jobs_columns = {c['name'] for c in existing.get_columns('jobs')}
+    with op.batch_alter_table('jobs') as batch_op:
+        if 'claimed_by' not in jobs_columns:
+            batch_op.add_column(sa.Column('claimed_by', sa.String(length=128), nullable=True))
+        if 'heartbeat_at' not in jobs_columns:
+            batch_op.add_column(sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('jobs') as batch_op:
+        batch_op.drop_column('heartbeat_at')
+        batch_op.drop_column('claimed_by')
@@ -1,7 +1,45 @@
 # models/__init__.py
+import os
+import sqlite3
+
+import flask_migrate
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, inspect
+from sqlalchemy.engine import Engine
+
+from config import Config
 
 db = SQLAlchemy()
+# schema changes are Alembic revisions in migrations/versions (see migrations/README)
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+BASELINE_REVISION = "0001"
+migrate = flask_migrate.Migrate(db=db, directory=MIGRATIONS_DIR)
+
+
+@event.listens_for(Engine, "connect")
+def _sqlite_pragmas(dbapi_connection, _record):
+    """Per-connection SQLite tuning (WAL journal, relaxed fsync); other databases are untouched."""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={Config.SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={Config.SQLITE_SYNCHRONOUS}")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+def upgrade_schema():
+    """
+    Bring the database to the latest migration (needs an app context and migrate.init_app).
+    Databases made by db.create_all() before there were migrations are stamped at the
+    baseline first; the revisions skip whatever such a database already has.
+    """
+    existing = inspect(db.engine)
+    if existing.has_table("patients") and not existing.has_table("alembic_version"):
+        flask_migrate.stamp(MIGRATIONS_DIR, BASELINE_REVISION)
+    flask_migrate.upgrade(MIGRATIONS_DIR)
+
 
 from .patient import Patient
-from .result import Result
\ No newline at end of file
+from .result import Result
+from .job import Job
@@ -0,0 +1,30 @@
+# models/job.py
+from . import db
+from datetime import datetime
+
+class Job(db.Model):
+    """Background work (Grad-CAM heatmap + PDF report) queued for a Result."""
+    __tablename__ = "jobs"
+
+    id = db.Column(db.String(32), primary_key=True)
+    result_id = db.Column(db.Integer, db.ForeignKey("results.id"), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default="queued", index=True)  # queued | running | done | failed
+    payload = db.Column(db.JSON, nullable=False)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    # lease of a running job: "<host>:<pid>" of the claiming process, renewed while it is alive
+    claimed_by = db.Column(db.String(128))
+    heartbeat_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "result_id": self.result_id,
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at.isoformat() + "Z" if self.created_at else None,
+            "started_at": self.started_at.isoformat() + "Z" if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() + "Z" if self.finished_at else None
+        }
@@ -9,9 +9,9 @@ class Patient(db.Model):
     full_name = db.Column(db.String(120), nullable=False)
     age = db.Column(db.Integer)
     gender = db.Column(db.String(20))
-    email = db.Column(db.String(120), unique=False, nullable=False)
+    email = db.Column(db.String(120), unique=False, nullable=False, index=True)
     city = db.Column(db.String(100))
-    doctor_name = db.Column(db.String(100))
+    doctor_name = db.Column(db.String(100), index=True)   # GET /results?doctor=
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     def to_dict(self):
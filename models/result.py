@@ -4,6 +4,13 @@ from datetime import datetime
 
 class Result(db.Model):
     __tablename__ = "results"
+    __table_args__ = (
+        # "results for patient X, newest first"
+        db.Index("ix_results_patient_predicted", "patient_id", "predicted_at"),
+        # GET /results keyset pages: newest first overall / for one label
+        db.Index("ix_results_predicted", "predicted_at", "id"),
+        db.Index("ix_results_label_predicted", "prediction_label", "predicted_at", "id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     patient_id = db.Column(db.Integer, db.ForeignKey("patients.id"), nullable=False)
@@ -11,9 +18,11 @@ class Result(db.Model):
     confidence = db.Column(db.Float, nullable=False)
     probabilities = db.Column(db.JSON, nullable=False)
     mri_image_path = db.Column(db.String(255))
-    heatmap_path = db.Column(db.String(255))
-    report_path = db.Column(db.String(255))
+    heatmap_path = db.Column(db.String(255), index=True)   # looked up by heatmap rendering
+    heatmap_cam = db.Column(db.LargeBinary)                 # packed float16 Grad-CAM (heatmap_service)
+    report_path = db.Column(db.String(255), index=True)   # looked up by lazy report rendering
     predicted_at = db.Column(db.DateTime, default=datetime.utcnow)
+    model_version = db.Column(db.String(64), index=True)   # "<weights sha12>/<backend>"
 
     def to_dict(self):
         return {
@@ -25,5 +34,6 @@ class Result(db.Model):
             "mri_image_path": self.mri_image_path,
             "heatmap_path": self.heatmap_path,
             "report_path": self.report_path,
-            "predicted_at": self.predicted_at.isoformat() + "Z" if self.predicted_at else None
+            "predicted_at": self.predicted_at.isoformat() + "Z" if self.predicted_at else None,
+            "model_version": self.model_version
         }
\ No newline at end of file
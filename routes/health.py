@@ -1,9 +1,88 @@
 # routes/health.py
-from flask import Blueprint, jsonify, current_app
+import time
+
+from flask import Blueprint, jsonify, current_app, request, g
+
+from services import warmup_service, metrics_service, trace_service
 
 health_bp = Blueprint("health", __name__)
 
+@health_bp.record_once
+def _start_warmup(state):
+    # eager model load + warm-up as soon as the app registers this blueprint
+    if state.app.config.get("EAGER_MODEL_LOAD", True):
+        warmup_service.start(state.app)
+
+# request latency / count for every endpoint of the app, plus the opt-in profiler and trace
+@health_bp.before_app_request
+def _start_timer():
+    g.request_started = time.perf_counter()
+    if metrics_service.should_profile(current_app.config, request.args, request.headers):
+        g.profiler = metrics_service.start_profile()
+
+@health_bp.after_app_request
+def _record_request(response):
+    started = g.pop("request_started", None)
+    if started is None:
+        return response
+    endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    labels = {"method": request.method, "endpoint": endpoint, "status": str(response.status_code)}
+    elapsed = time.perf_counter() - started
+    metrics_service.REQUEST_SECONDS.observe(elapsed, **labels)
+    metrics_service.REQUESTS.inc(**labels)
+
+    trace_file = current_app.config.get("REQUEST_TRACE_FILE")
+    if trace_file:
+        trace = g.get("trace", {})
+        trace_service.record(trace_file, request, response, elapsed, trace.get("upload"), trace.get("form"))
+
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        name = (request.endpoint or "unmatched").replace(".", "-")
+        filename = metrics_service.finish_profile(profiler, current_app.config.get("PROFILE_DIR", "profiles"), name)
+        response.headers["X-Profile-File"] = filename
+        current_app.logger.info(f"Request profile written: {filename}")
+    return response
+
 @health_bp.route("/health", methods=["GET"])
 def health():
     current_app.logger.info("Health endpoint hit")
-    return jsonify({"status": "ok", "service": "alzheimers-api"}), 200
\ No newline at end of file
+    return jsonify({"status": "ok", "service": "alzheimers-api"}), 200
+
+@health_bp.route("/ready", methods=["GET"])
+def ready():
+    # liveness is /health; this only goes green once the model is loaded and warm (or,
+    # with EAGER_MODEL_LOAD off or a failed warm-up, once a request has loaded it)
+    status = warmup_service.status()
+    return jsonify(status), 200 if status["ready"] else 503
+
+@health_bp.route("/health/cache", methods=["GET"])
+def cache():
+    from services.cache_service import cache_stats
+
+    stats = cache_stats()
+    return jsonify({"enabled": bool(stats), **stats}), 200
+
+@health_bp.route("/health/batching", methods=["GET"])
+def batching():
+    from services.model_service import batching_stats
+
+    stats = batching_stats()
+    return jsonify({"enabled": bool(stats), **stats}), 200
+
+@health_bp.route("/health/models", methods=["GET"])
+def models():
+    from services.model_service import models_status
+
+    return jsonify(models_status()), 200
+
+@health_bp.route("/health/pool", methods=["GET"])
+def pool():
+    from services.model_service import pool_stats
+
+    stats = pool_stats()
+    return jsonify({"enabled": bool(stats), **stats}), 200
+
+@health_bp.route("/metrics", methods=["GET"])
+def metrics():
+    return metrics_service.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
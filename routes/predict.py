@@ -1,24 +1,115 @@
 # routes/predict.py
+import io
 import os
+import json
+import time
+import base64
+import hashlib
 import uuid
+import queue
+import zipfile
 import sqlalchemy
 from datetime import datetime
-from flask import Blueprint, request, jsonify, current_app, send_file, url_for
+from flask import Blueprint, request, jsonify, current_app, url_for, g
 
-from services.storage_service import save_upload, allowed_file
-from services.model_service import predict as model_predict
-from services.explain_service import make_gradcam
-from services.report_service import generate_report
+from services.storage_service import (content_hash, content_path, save_content_async, image_header, UploadRejected,
+                                      allowed_file, resolve, serve_file, serve_bytes)
+from services.cache_service import get_cache
+from services.registry_service import DEFAULT_CLASS_NAMES
+from services.write_buffer_service import get_writer, save_prediction, save_study
+from services import job_service, trace_service, heatmap_service
+from services.metrics_service import span, PREDICTIONS
+
+# torch / cv2 / reportlab are imported inside the routes that need them, so
+# importing this blueprint (health checks, file-serving workers) stays fast.
 
 from models import db
 from models.patient import Patient
 from models.result import Result
+from models.job import Job
 
 predict_bp = Blueprint("predict", __name__, url_prefix="/predict")
 
-# Update this to match your model's class order!
-CLASS_NAMES = ["Normal", "MildDemented", "ModerateDemented", "VeryMildDemented"]
 
+def _flag(name, default, form, args):
+    """Read a boolean option from the form or query string."""
+    value = form.get(name) or args.get(name)
+    if value is None:
+        return default
+    return value.lower() not in ("0", "false", "no")
+
+def _explain_mode(form, args):
+    """
+    explain=gradcam|cam|none picks the heatmap method for this request; true / absent
+    use EXPLAIN_MODE (gradcam when that is none and explain=true), false means none.
+    """
+    default = current_app.config.get("EXPLAIN_MODE", "gradcam")
+    value = (form.get("explain") or args.get("explain") or "").lower()
+    if not value:
+        return default
+    if value in heatmap_service.EXPLAIN_MODES:
+        return value
+    if not _flag("explain", True, form, args):
+        return "none"
+    return default if default != "none" else "gradcam"
+
+_EMAIL_UNIQUE = {}   # database URL -> whether patients.email carries a unique constraint
+
+def _email_unique():
+    """
+    True if this database enforces unique emails. The model does not (returning patients
+    reuse theirs), but deployed databases may still have UNIQUE(email); inspected once.
+    """
+    key = str(db.engine.url)
+    if key not in _EMAIL_UNIQUE:
+        insp = sqlalchemy.inspect(db.engine)
+        uniques = [c["column_names"] for c in insp.get_unique_constraints("patients")]
+        uniques += [i["column_names"] for i in insp.get_indexes("patients") if i.get("unique")]
+        _EMAIL_UNIQUE[key] = ["email"] in uniques
+    return _EMAIL_UNIQUE[key]
+
+def _conflict(error, patient_data):
+    """
+    409 body for an IntegrityError (session already rolled back). EMAIL_EXISTS only where
+    a unique email can be what failed - decided from the schema and a lookup rather than
+    the driver's message text, which differs between SQLite, PostgreSQL and MySQL. The
+    driver message is logged, never sent to the client.
+    """
+    current_app.logger.warning(f"Integrity error: {error.orig}")
+    email = patient_data.get("email")
+    if _email_unique() and Patient.query.filter_by(email=email).with_entities(Patient.id).first():
+        return jsonify({"error": f"Email already exists: {email}", "code": "EMAIL_EXISTS"}), 409
+    return jsonify({"error": "Database conflict (duplicate data)", "code": "DB_CONFLICT"}), 409
+
+def _patient_data(uniq, form):
+    """ONLY use fields that exist in your current Patient model"""
+    return {
+        "full_name": form.get("full_name", "Unknown Patient") or "Unknown Patient",
+        "age": int(form.get("age", 0) or 0),
+        "gender": form.get("gender", "Not Specified"),
+        "email": form.get("email", f"{uniq}@temp.com"),
+        "city": form.get("city") or None,
+        "doctor_name": form.get("doctor_name") or None,
+    }
+
+def _report_fingerprint(patient_data, with_heatmap):
+    """
+    The inputs the PDF shows beyond the prediction; a cached report is only reused when
+    this matches. Not its "Report Generated" time: a reused PDF keeps the time it was rendered.
+    """
+    shown = {k: patient_data.get(k) for k in ("full_name", "age", "gender", "doctor_name")}
+    shown["heatmap"] = bool(with_heatmap)
+    return hashlib.sha256(json.dumps(shown, sort_keys=True).encode()).hexdigest()
+
+def _stored(filename):
+    """True if filename exists in UPLOAD_DIR."""
+    return bool(filename) and os.path.exists(os.path.join(current_app.config["UPLOAD_DIR"], filename))
+
+def _to_probabilities(res):
+    """Map a prediction's probability list onto the class names of the model that made it."""
+    prob_list = res.get("probabilities", [])
+    return {name: float(prob_list[i]) if i < len(prob_list) else 0.0
+            for i, name in enumerate(res.get("classes") or DEFAULT_CLASS_NAMES)}
 
 
 @predict_bp.route("/", methods=["POST"])
@@ -32,98 +123,199 @@ def predict_route():
     if not file.filename or not allowed_file(file.filename):
         return jsonify({"error": "Invalid image"}), 400
 
+    return run_prediction(file.read(), request.form, request.args)
+
+
+def run_prediction(data, form, args):
+    """
+    Everything after the upload is read: predict, explain, report, save, respond.
+    form / args: mappings with the multipart fields and query options. Shared by the
+    Flask route and the ASGI app (asgi.py), which calls it from its executor inside
+    a request context; returns a Flask (response, status) pair.
+    """
+    from services.model_service import predict as model_predict, model_version
+    from services.batching_service import QueueFullError
+    from services.explain_service import predict_with_explanation
+    from services.report_service import generate_report, report_timestamp
+    from utils.preprocess import DecodedImage, to_report_jpeg, REPORT_MAX_SIDE
+
+    # magic bytes and header dimensions only: junk and decompression bombs never reach PIL
+    try:
+        image_header(data, current_app.config.get("MAX_IMAGE_PIXELS", 25_000_000))
+    except UploadRejected as e:
+        current_app.logger.warning(f"Rejected upload: {e}")
+        return jsonify({"error": str(e), "code": e.code}), e.status
+
     uniq = uuid.uuid4().hex
-    img_path = save_upload(file, uniq)
-    img_filename = os.path.basename(img_path)
+    image_hash = content_hash(data)
+
+    # same bytes + same model version -> reuse the earlier prediction and artifacts
+    cache = get_cache()
+    cache_key = f"{image_hash}:{model_version()}" if cache is not None else None
+    with span("cache_lookup"):
+        cached = cache.get(cache_key) if cache is not None else None
+
+    # decode once; tensor, overlay base and report thumbnail all come from here
+    image = None
+    if cached is None:
+        try:
+            with span("decode"):
+                image = DecodedImage.from_bytes(data)
+        except Exception:
+            current_app.logger.warning("Could not decode uploaded image")
+            return jsonify({"error": "Invalid image"}), 400
+
+    # the upload stays in memory; it is written once the prediction succeeded (below)
+    img_filename = os.path.basename(content_path(data, image_hash))
+    g.trace = {"upload": img_filename, "form": trace_service.replayable(form)}
 
     # 2. ONLY use fields that exist in your current Patient model
-    patient_code = request.form.get("patient_code") or f"PT-{uniq[:8].upper()}"
-
-    patient_data = {
-        "full_name": request.form.get("full_name", "Unknown Patient") or "Unknown Patient",
-        "age": int(request.form.get("age", 0) or 0),
-        "gender": request.form.get("gender", "Not Specified"),
-        "email": request.form.get("email", f"{uniq}@temp.com"),
-        "city": request.form.get("city") or None,
-        "doctor_name": request.form.get("doctor_name") or None,
-    }
+    patient_code = form.get("patient_code") or f"PT-{uniq[:8].upper()}"
+
+    patient_data = _patient_data(uniq, form)
+    # the PDF's "Report Generated" line, fixed once for this request (also for the background job)
+    report_patient = dict(patient_data, report_generated=report_timestamp())
+
+    # 3. ML Prediction (+ heatmap in the same pass unless the client opts out)
+    # explain=cam: fc-weight CAM, one forward and no backward; explain=gradcam: Grad-CAM
+    # explain=false skips the heatmap and uses the cheap no_grad path
+    # async=true returns right after classification; heatmap + PDF run as a background job
+    mode = _explain_mode(form, args)
+    explain = mode != "none"
+    run_async = _flag("async", current_app.config.get("ASYNC_ARTIFACTS", False), form, args)
+    if run_async and job_service.pending_count() >= current_app.config.get("JOB_MAX_PENDING", 100):
+        current_app.logger.warning("Job queue saturated, processing request synchronously")
+        run_async = False
+
+    # a cached heatmap is a packed CAM, or a JPEG written before CAMs were stored;
+    # it is only reused for the explanation mode that made it
+    cached_heat = cached.get("heatmap") if cached and (cached.get("cam") or _stored(cached.get("heatmap"))) else None
+    cached_mode = cached.get("explain_mode", "gradcam") if cached else None
+    reusable_heat = cached_heat if cached_mode == mode else None
+    hit = cached is not None and (not explain or reusable_heat is not None)
+    if hit:
+        # nothing left to compute that is worth a background job
+        run_async = False
+    elif image is None:
+        # cached, but without the heatmap this request asks for
+        image = DecodedImage.from_bytes(data)
 
-    # 3. ML Prediction
-    from utils.preprocess import preprocess
+    heatmap_filename = f"{uniq}_heat.jpg" if explain and not run_async else None
+    if hit:
+        heatmap_filename = reusable_heat if explain else None
+
+    # the heatmap is kept as a compact CAM; /predict/heat/<heatmap_filename> renders it
+    cam = None
     try:
-        img_tensor = preprocess(img_path)
-        res = model_predict(img_tensor)
+        if hit:
+            res = dict(cached["res"])
+            if explain and cached.get("cam"):
+                cam = base64.b64decode(cached["cam"])
+            current_app.logger.info(f"Prediction cache hit for {image_hash[:12]}")
+        elif heatmap_filename:
+            with span("preprocess"):
+                image.tensor
+            with span(f"make_{mode}"):
+                res = predict_with_explanation(image, mode)
+            cam = res.pop("cam", None)
+            if cam is None:
+                heatmap_filename = None
+        else:
+            with span("preprocess"):
+                x = image.tensor
+            with span("model_predict"):
+                res = model_predict(x)
         current_app.logger.info(f"Prediction: {res}")
+    except QueueFullError:
+        current_app.logger.warning("Inference queue full, rejecting request")
+        return jsonify({"error": "Server busy, try again shortly", "code": "QUEUE_FULL"}), 503
     except Exception as e:
         current_app.logger.exception("ML failed")
         return jsonify({"error": "Prediction failed"}), 500
 
+    # keep the upload now that it produced a prediction; the write overlaps the report
+    img_path, persisted = save_content_async(data, image_hash)
+
     label = res.get("label", "Unknown")
-    prob_list = res.get("probabilities", [])
-    probabilities = {name: float(prob_list[i]) if i < len(prob_list) else 0.0 
-                    for i, name in enumerate(CLASS_NAMES)}
+    probabilities = _to_probabilities(res)
     confidence = max(probabilities.values())
+    PREDICTIONS.inc(label=label, source="cache" if hit else "model")
 
-    # 4. Grad-CAM
-    heatmap_filename = f"{uniq}_heat.jpg"
-    heatmap_path = os.path.join(current_app.config["UPLOAD_DIR"], heatmap_filename)
-    try:
-        make_gradcam(img_path, res.get("index", 0), heatmap_path)
-    except Exception as e:
-        current_app.logger.warning(f"Grad-CAM failed: {e}")
-        heatmap_path = None
-        heatmap_filename = None
+    # 4. Generate Beautiful PDF Report (deferred to the job in async mode)
+    report_filename = None
+    report_for = _report_fingerprint(report_patient, with_heatmap=explain)
+    if hit and cached.get("report_for") == report_for and _stored(cached.get("report")):
+        # same image, model and patient details: the earlier PDF, stamped when it was rendered
+        report_filename = cached["report"]
+    elif hit:
+        image = DecodedImage.from_bytes(data)
 
-    # 5. Generate Beautiful PDF Report
-    report_filename = f"report_{uniq}.pdf"
-    report_path_full = os.path.join(current_app.config["UPLOAD_DIR"], report_filename)
+    if not run_async and report_filename is None and current_app.config.get("LAZY_REPORTS", False):
+        # most reports are never downloaded; get_report renders this one on first fetch
+        report_filename = f"report_{uniq}.pdf"
+    elif not run_async and report_filename is None:
+        try:
+            heat_data = None
+            if cam is not None:
+                # rendered straight at thumbnail size, in memory
+                with span("heatmap_render"):
+                    heat_data = to_report_jpeg(heatmap_service.render_overlay(
+                        heatmap_service.unpack_cam(cam), image.bgr, size=REPORT_MAX_SIDE))
+            # ←←← THIS IS THE EXACT LINE YOU ASKED FOR ←←←
+            with span("generate_report"):
+                returned_path = generate_report(
+                    uniq=uniq,
+                    img_path=img_path,
+                    # a heatmap JPEG cached from before CAMs were stored
+                    heat_path=resolve(heatmap_filename) if heatmap_filename and cam is None else None,
+                    label=label,
+                    probabilities=probabilities,
+                    patient_data=report_patient,     # ← Sends name, age, doctor, etc.
+                    img_data=image.report_jpeg(),    # downscaled, no second decode/read
+                    heat_data=heat_data
+                )
+            report_filename = os.path.basename(returned_path) if returned_path else None
+            current_app.logger.info(f"PDF Report generated: {report_filename}")
+        except Exception as e:
+            current_app.logger.warning(f"PDF generation failed: {e}")
+            report_filename = None
 
+    # 5. SAVE TO DB — ONLY VALID FIELDS
+    result_data = {
+        "prediction_label": label,
+        "confidence": confidence,
+        "probabilities": probabilities,
+        "mri_image_path": img_filename,
+        "heatmap_path": heatmap_filename,
+        "heatmap_cam": cam,
+        "report_path": report_filename,
+        "predicted_at": datetime.utcnow(),
+        "model_version": res.get("model_version"),
+    }
     try:
-        # ←←← THIS IS THE EXACT LINE YOU ASKED FOR ←←←
-        returned_path = generate_report(
-            uniq=uniq,
-            img_path=img_path,
-            heat_path=heatmap_path,          # Can be None → report will skip image if missing
-            label=label,
-            probabilities=probabilities,
-            patient_data=patient_data        # ← Sends name, age, doctor, etc.
-        )
-        report_filename = os.path.basename(returned_path) if returned_path else None
-        current_app.logger.info(f"PDF Report generated: {report_filename}")
-    except Exception as e:
-        current_app.logger.warning(f"PDF generation failed: {e}")
-        report_filename = None
+        with span("save_upload"):
+            persisted.result(timeout=30)
+    except Exception:
+        current_app.logger.exception("Could not store upload")
+        return jsonify({"error": "Failed to store upload", "code": "SERVER_ERROR"}), 500
 
-    # 6. SAVE TO DB — ONLY VALID FIELDS
     try:
-        patient = Patient(**patient_data)
-        db.session.add(patient)
-        db.session.flush()  # Check for errors early
-
-        result = Result(
-            patient_id=patient.id,
-            prediction_label=label,
-            confidence=confidence,
-            probabilities=probabilities,
-            mri_image_path=img_filename,
-            heatmap_path=heatmap_filename,
-            report_path=report_filename,
-            predicted_at=datetime.utcnow()
-        )
-        db.session.add(result)
-        db.session.commit()
-
-        current_app.logger.info(f"SUCCESS: Patient {patient.id} saved with email {patient.email}")
-        
+        with span("db_commit"):
+            writer = get_writer(current_app._get_current_object())
+            if writer is not None:
+                try:
+                    # grouped with other requests' rows into one commit
+                    patient_id, result_id = writer.submit(patient_data, result_data).result(timeout=30)
+                except queue.Full:
+                    patient_id, result_id = save_prediction(patient_data, result_data)
+            else:
+                patient_id, result_id = save_prediction(patient_data, result_data)
+
+        current_app.logger.info(f"SUCCESS: Patient {patient_id} saved with email {patient_data['email']}")
+
     except sqlalchemy.exc.IntegrityError as e:
         db.session.rollback()
-        error_msg = str(e.orig)
-        if "UNIQUE constraint failed: patients.email" in error_msg:
-            return jsonify({"error": f"Email already exists: {patient_data['email']}", "code": "EMAIL_EXISTS"}), 409
-        elif "UNIQUE constraint failed: patients.patient_code" in error_msg:
-            return jsonify({"error": f"Patient code already exists: {patient_data.get('patient_code')}", "code": "CODE_EXISTS"}), 409
-        else:
-            return jsonify({"error": "Database conflict (duplicate data)", "details": error_msg, "code": "DB_CONFLICT"}), 409
+        return _conflict(e, patient_data)
 
     except ValueError as e:
         db.session.rollback()
@@ -138,21 +330,237 @@ def predict_route():
             "code": "SERVER_ERROR"
         }), 500
 
+    # a canary may have answered; only the active version's results belong under this key
+    if cache is not None and cache_key.endswith(":" + res.get("model_version", cache_key.split(":", 1)[1])):
+        try:
+            fresh = cam is not None and not hit
+            entry = {"res": res, "heatmap": heatmap_filename or cached_heat,
+                     "cam": base64.b64encode(cam).decode() if cam is not None else (cached or {}).get("cam"),
+                     "explain_mode": mode if fresh else cached_mode,
+                     "report": report_filename, "report_for": report_for}
+            cache.put(cache_key, entry)
+        except Exception as e:
+            current_app.logger.warning(f"Prediction cache write failed: {e}")
+
+    # 6. Queue heatmap + report for the background workers
+    job = None
+    if run_async:
+        try:
+            job = job_service.enqueue(result_id, {
+                "uniq": uniq,
+                "img_path": img_path,
+                "index": res.get("index", 0),
+                "label": label,
+                "probabilities": probabilities,
+                "patient_data": report_patient,
+                "explain": explain,
+                "explain_mode": mode,
+                # the version that answered (maybe a canary): the heatmap and cache entry are its
+                "model_version": res.get("model_version"),
+                "cache_key": f"{image_hash}:{res['model_version']}" if cache is not None and res.get("model_version") else None,
+                "res": res,
+                "report_for": report_for,
+            })
+            current_app.logger.info(f"Queued artifact job {job.id} for result {result_id}")
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.exception("Failed to queue artifact job")
+
     # 7. Response
     base = request.host_url.rstrip("/")
+    with span("response"):
+        body = jsonify({
+            "message": "Prediction saved successfully!",
+            "patient_id": patient_id,
+            "result_id": result_id,
+            "patient_code": patient_code,
+            "prediction": {
+                "label": label,
+                "confidence": round(confidence, 4),
+                "probabilities": {k: round(v, 4) for k, v in probabilities.items()}
+            },
+            "urls": {
+                "mri": f"{base}{url_for('predict.get_mri', filename=img_filename)}",
+                "heatmap": f"{base}{url_for('predict.get_heat', filename=heatmap_filename)}" if heatmap_filename else None,
+                "report": f"{base}{url_for('predict.get_report', filename=report_filename)}" if report_filename else None
+            },
+            "job": {
+                "id": job.id,
+                "status": job.status,
+                "url": f"{base}{url_for('predict.get_job', job_id=job.id)}"
+            } if job else None
+        })
+    return body, 202 if job else 200
+
+
+@predict_bp.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = db.session.get(Job, job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    result = db.session.get(Result, job.result_id)
+    base = request.host_url.rstrip("/")
+    data = job.to_dict()
+    data["urls"] = {
+        "heatmap": f"{base}{url_for('predict.get_heat', filename=result.heatmap_path)}" if result and result.heatmap_path else None,
+        "report": f"{base}{url_for('predict.get_report', filename=result.report_path)}" if result and result.report_path else None
+    }
+    return jsonify(data), 200
+
+
+@predict_bp.route("/batch", methods=["POST"])
+def predict_batch_route():
+    """
+    Many slices for one patient in one request: multipart "images" (repeatable)
+    and/or a zip archive in "archive". One Patient row, one Result per slice,
+    all written in a single transaction. report=true adds a combined study PDF.
+    Slices run through the no_grad path in chunks; no per-slice heatmaps.
+    """
+    current_app.logger.info("Batch prediction request received")
+
+    from PIL import Image
+    from services.model_service import predict_batch as model_predict_batch
+    from services.report_service import generate_study_report
+    from utils.preprocess import preprocess_batch
+    # a study is many images: lift the single-image body limit for this request
+    request.max_content_length = current_app.config.get("BATCH_MAX_CONTENT_LENGTH")
+
+    t0 = time.perf_counter()
+    uniq = uuid.uuid4().hex
+    max_images = current_app.config.get("BATCH_MAX_IMAGES", 64)
+    max_member = current_app.config.get("MAX_CONTENT_LENGTH") or 5 * 1024 * 1024
+    max_pixels = current_app.config.get("MAX_IMAGE_PIXELS", 25_000_000)
+
+    # 1. Collect and check images in memory (nothing is written until the batch predicted)
+    blobs, names = [], []
+    files = request.files.getlist("images")
+    if len(files) > max_images:
+        return jsonify({"error": f"Too many images (max {max_images})"}), 413
+    try:
+        for file in files:
+            if not file.filename or not allowed_file(file.filename):
+                return jsonify({"error": f"Invalid image: {file.filename}"}), 400
+            names.append(file.filename)
+            blobs.append(file.read())
+            image_header(blobs[-1], max_pixels)
+
+        archive = request.files.get("archive")
+        if archive is not None:
+            with zipfile.ZipFile(archive.stream) as zf:
+                for info in zf.infolist():
+                    if info.is_dir() or not allowed_file(info.filename):
+                        continue
+                    if info.file_size > max_member:
+                        return jsonify({"error": f"Archive member too large: {info.filename}"}), 413
+                    if len(blobs) >= max_images:
+                        return jsonify({"error": f"Too many images (max {max_images})"}), 413
+                    names.append(os.path.basename(info.filename))
+                    blobs.append(zf.read(info))
+                    image_header(blobs[-1], max_pixels)
+    except zipfile.BadZipFile:
+        return jsonify({"error": "Invalid zip archive"}), 400
+    except UploadRejected as e:
+        return jsonify({"error": f"{names[-1]}: {e}", "code": e.code}), e.status
+
+    if not blobs:
+        return jsonify({"error": "No images provided"}), 400
+
+    patient_data = _patient_data(uniq, request.form)
+
+    def decode(slice_):
+        # a corrupt slice that got past the header check is the client's fault: name it
+        name, blob = slice_
+        try:
+            return Image.open(io.BytesIO(blob)).convert("RGB")
+        except Exception:
+            raise UploadRejected(f"{name}: could not decode image", 400, "INVALID_IMAGE") from None
+
+    # 2. Preprocess together, predict in chunks
+    try:
+        batch = preprocess_batch(list(zip(names, blobs)), decode=decode)
+        t_model = time.perf_counter()
+        outputs = model_predict_batch(batch, chunk_size=current_app.config.get("BATCH_CHUNK_SIZE", 32))
+        model_secs = time.perf_counter() - t_model
+    except UploadRejected as e:
+        current_app.logger.warning(f"Rejected batch: {e}")
+        return jsonify({"error": str(e), "code": e.code}), e.status
+    except Exception:
+        current_app.logger.exception("Batch ML failed")
+        return jsonify({"error": "Prediction failed"}), 500
+
+    # keep the slices now that they produced predictions; the writes overlap the report
+    saved = [save_content_async(b) for b in blobs]
+
+    slices = []
+    for name, (path, _), res in zip(names, saved, outputs):
+        probabilities = _to_probabilities(res)
+        label = max(probabilities, key=probabilities.get)
+        slices.append({"name": name, "filename": os.path.basename(path), "label": label,
+                       "confidence": probabilities[label], "probabilities": probabilities,
+                       "model_version": res.get("model_version")})
+
+    study_probs = {c: sum(sl["probabilities"][c] for sl in slices) / len(slices) for c in slices[0]["probabilities"]}
+    study_label = max(study_probs, key=study_probs.get)
+
+    # 3. Optional combined study report
+    report_filename = None
+    if _flag("report", False, request.form, request.args):
+        try:
+            returned_path = generate_study_report(uniq, slices, study_probs, study_label, patient_data)
+            report_filename = os.path.basename(returned_path)
+        except Exception as e:
+            current_app.logger.warning(f"Study report generation failed: {e}")
+
+    # 4. SAVE TO DB — one transaction for the patient and every slice
+    try:
+        for _, future in saved:
+            future.result(timeout=30)
+    except Exception:
+        current_app.logger.exception("Could not store batch uploads")
+        return jsonify({"error": "Failed to store uploads", "code": "SERVER_ERROR"}), 500
+
+    now = datetime.utcnow()
+    try:
+        patient_id, result_ids = save_study(patient_data, [{
+            "prediction_label": sl["label"],
+            "confidence": sl["confidence"],
+            "probabilities": sl["probabilities"],
+            "mri_image_path": sl["filename"],
+            "report_path": report_filename,
+            "predicted_at": now,
+            "model_version": sl["model_version"],
+        } for sl in slices])
+    except sqlalchemy.exc.IntegrityError as e:
+        return _conflict(e, patient_data)
+    except Exception:
+        current_app.logger.exception("Batch DB write failed")
+        return jsonify({"error": "Failed to save batch", "code": "SERVER_ERROR"}), 500
+
+    # 5. Response
+    elapsed = time.perf_counter() - t0
+    base = request.host_url.rstrip("/")
     return jsonify({
-        "message": "Prediction saved successfully!",
-        "patient_id": patient.id,
-        "patient_code": patient_code,
-        "prediction": {
-            "label": label,
-            "confidence": round(confidence, 4),
-            "probabilities": {k: round(v, 4) for k, v in probabilities.items()}
+        "message": f"{len(slices)} slices predicted",
+        "patient_id": patient_id,
+        "study": {
+            "label": study_label,
+            "confidence": round(study_probs[study_label], 4),
+            "probabilities": {k: round(v, 4) for k, v in study_probs.items()}
         },
-        "urls": {
-            "mri": f"{base}{url_for('predict.get_mri', filename=img_filename)}",
-            "heatmap": f"{base}{url_for('predict.get_heat', filename=heatmap_filename)}" if heatmap_filename else None,
-            "report": f"{base}{url_for('predict.get_report', filename=report_filename)}" if report_filename else None
+        "results": [{
+            "result_id": result_id,
+            "name": sl["name"],
+            "label": sl["label"],
+            "confidence": round(sl["confidence"], 4),
+            "probabilities": {k: round(v, 4) for k, v in sl["probabilities"].items()},
+            "mri": f"{base}{url_for('predict.get_mri', filename=sl['filename'])}"
+        } for result_id, sl in zip(result_ids, slices)],
+        "report": f"{base}{url_for('predict.get_report', filename=report_filename)}" if report_filename else None,
+        "timing": {
+            "total_seconds": round(elapsed, 4),
+            "model_seconds": round(model_secs, 4),
+            "images_per_second": round(len(slices) / elapsed, 2) if elapsed else None
         }
     }), 200
 
@@ -160,18 +568,75 @@ def predict_route():
 # File serving
 @predict_bp.route("/mri/<filename>")
 def get_mri(filename):
-    path = os.path.join(current_app.config["UPLOAD_DIR"], filename)
-    return send_file(path) if os.path.exists(path) else ("Not found", 404)
+    path = resolve(filename)
+    return serve_file(path) if path else ("Not found", 404)
 
 @predict_bp.route("/heat/<filename>")
 def get_heat(filename):
-    path = os.path.join(current_app.config["UPLOAD_DIR"], filename)
-    return send_file(path) if os.path.exists(path) else ("Not found", 404)
+    """
+    Grad-CAM overlay, rendered from the Result's stored CAM on request:
+    ?size=<longest side px>&colormap=jet|turbo|...&alpha=<0..1> (default: the
+    upload's size, jet, 0.4). Renders are kept in an LRU (HEATMAP_CACHE_MB).
+    Heatmaps written as JPEG files before CAMs were stored are served as they are.
+    """
+    path = resolve(filename)
+    if path:
+        return serve_file(path)
+
+    try:
+        options = heatmap_service.render_options(request.args, current_app.config.get("HEATMAP_MAX_SIZE", 2048))
+    except ValueError as e:
+        return jsonify({"error": str(e), "code": "BAD_QUERY"}), 400
+
+    key = (filename, options["size"], options["colormap"], options["alpha"])
+    cache = heatmap_service.get_overlay_cache()
+    data = cache.get(key)
+    if data is None:
+        row = (Result.query.filter(Result.heatmap_path == filename, Result.heatmap_cam.isnot(None))
+               .with_entities(Result.heatmap_cam, Result.mri_image_path).first())
+        mri_path = resolve(row.mri_image_path) if row and row.mri_image_path else None
+        if mri_path is None:
+            return "Not found", 404
+        with span("heatmap_render"):
+            data = heatmap_service.encode_jpeg(heatmap_service.render_file(row.heatmap_cam, mri_path, **options))
+        cache.put(key, data)
+    # a result's CAM never changes, so each (filename, options) URL is immutable
+    etag = hashlib.sha256(repr(key).encode()).hexdigest()[:32]
+    return serve_bytes(data, "image/jpeg", etag, immutable=True)
+
+def _render_lazy_report(filename):
+    """Render a LAZY_REPORTS PDF from its Result row. Returns the path, or None if unknown."""
+    from services.report_service import generate_report
+    from utils.preprocess import to_report_jpeg, REPORT_MAX_SIDE
+
+    result = Result.query.filter_by(report_path=filename).first()
+    if result is None or not filename.startswith("report_"):
+        return None
+    patient = db.session.get(Patient, result.patient_id)
+    mri_path = resolve(result.mri_image_path) if result.mri_image_path else None
+    heat_path = resolve(result.heatmap_path) if result.heatmap_path else None
+    heat_data = None
+    if result.heatmap_cam is not None and mri_path:
+        heat_data = to_report_jpeg(heatmap_service.render_file(result.heatmap_cam, mri_path, size=REPORT_MAX_SIDE))
+    return generate_report(
+        uniq=filename[len("report_"):-len(".pdf")],
+        img_path=mri_path,
+        heat_path=heat_path,
+        label=result.prediction_label,
+        probabilities=result.probabilities,
+        patient_data=patient.to_dict() if patient else None,
+        heat_data=heat_data
+    )
 
 @predict_bp.route("/report/<filename>")
 def get_report(filename):
-    path = os.path.join(current_app.config["UPLOAD_DIR"], filename)
-    return send_file(path, mimetype="application/pdf") if os.path.exists(path) else ("Not found", 404)
+    path = resolve(filename)
+    if path is None and current_app.config.get("LAZY_REPORTS", False):
+        try:
+            path = _render_lazy_report(filename) and resolve(filename)
+        except Exception as e:
+            current_app.logger.warning(f"Lazy PDF generation failed for {filename}: {e}")
+    return serve_file(path, mimetype="application/pdf") if path else ("Not found", 404)
 
 @predict_bp.route("/", methods=["GET"])
 def info():
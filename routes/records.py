@@ -0,0 +1,258 @@
+# routes/records.py
+import json
+import base64
+import binascii
+from datetime import datetime
+
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
+from sqlalchemy import select, and_, or_
+
+from models import db
+from models.patient import Patient
+from models.result import Result
+from services import export_service
+
+# Read-only history API. Pages are keyset (cursor) based: the cursor is the sort key
+# of the last row returned, so page 1000 costs the same index seek as page 1 - no
+# OFFSET scans and no COUNT(*). Rows come back as plain tuples of only the requested
+# columns and are turned into dicts here, never loaded as ORM objects.
+records_bp = Blueprint("records", __name__)
+
+# heatmap_cam is binary; clients get the rendered overlay from /predict/heat/<heatmap_path>
+RESULT_FIELDS = {c.name: c for c in Result.__table__.columns if c.name != "heatmap_cam"}
+PATIENT_FIELDS = {c.name: c for c in Patient.__table__.columns}
+
+
+class QueryError(ValueError):
+    """Bad query-string parameter; reported as 400 BAD_QUERY."""
+
+
+@records_bp.errorhandler(QueryError)
+def _bad_query(e):
+    return jsonify({"error": str(e), "code": "BAD_QUERY"}), 400
+
+
+# ───────────────────────────────────────
+# QUERY-STRING PARSING
+# ───────────────────────────────────────
+def _limit():
+    default = current_app.config.get("QUERY_PAGE_SIZE", 50)
+    maximum = current_app.config.get("QUERY_MAX_PAGE_SIZE", 500)
+    try:
+        limit = int(request.args.get("limit", default))
+    except ValueError:
+        raise QueryError("limit must be an integer")
+    return max(1, min(limit, maximum))
+
+
+def _fields(available, default):
+    """Columns named in ?fields=a,b,c (validated), else default."""
+    raw = request.args.get("fields")
+    if not raw:
+        return list(default)
+    names = [f.strip() for f in raw.split(",") if f.strip()]
+    unknown = [n for n in names if n not in available]
+    if unknown:
+        raise QueryError(f"Unknown field(s): {', '.join(unknown)}. Available: {', '.join(available)}")
+    return names
+
+
+def _float(name):
+    value = request.args.get(name)
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise QueryError(f"{name} must be a number")
+
+
+def _datetime(name):
+    """ISO-8601 date or datetime; one with an offset is converted to UTC, like predicted_at."""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return export_service.parse_utc(value)
+    except ValueError:
+        raise QueryError(f"{name} must be an ISO-8601 date or datetime")
+
+
+def _encode_cursor(*key):
+    raw = json.dumps([k.isoformat() if isinstance(k, datetime) else k for k in key], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(size):
+    value = request.args.get("cursor")
+    if not value:
+        return None
+    try:
+        key = json.loads(base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)))
+        if not isinstance(key, list) or len(key) != size:
+            raise ValueError
+        return key
+    except (ValueError, binascii.Error):
+        raise QueryError("Invalid cursor")
+
+
+# ───────────────────────────────────────
+# SERIALIZATION
+# ───────────────────────────────────────
+def _rows(stmt, names, hidden=()):
+    """Execute stmt and return (dicts without the hidden sort-key columns, raw rows)."""
+    rows = db.session.execute(stmt).all()
+    visible = [i for i, n in enumerate(names) if n not in hidden]
+    items = []
+    for row in rows:
+        item = {}
+        for i in visible:
+            v = row[i]
+            item[names[i]] = v.isoformat() + "Z" if isinstance(v, datetime) else v
+        items.append(item)
+    return items, rows
+
+
+def _page(items, rows, limit, cursor_of):
+    """{"items", "next_cursor"}; one extra row was fetched to know whether there is a next page."""
+    more = len(rows) > limit
+    return {
+        "items": items[:limit],
+        "next_cursor": cursor_of(rows[limit - 1]) if more else None,
+    }
+
+
+# ───────────────────────────────────────
+# RESULTS
+# ───────────────────────────────────────
+def _results_page(patient_id=None):
+    limit = _limit()
+    names = _fields(RESULT_FIELDS, [n for n in RESULT_FIELDS if n != "probabilities"])
+    # sort key always selected (for the cursor), returned only when asked for
+    hidden = [n for n in ("predicted_at", "id") if n not in names]
+    names = names + hidden
+
+    conditions = []
+    if patient_id is not None:
+        conditions.append(Result.patient_id == patient_id)
+    labels = [l for l in request.args.get("label", "").split(",") if l]
+    if labels:
+        conditions.append(Result.prediction_label.in_(labels))
+    min_conf, max_conf = _float("min_confidence"), _float("max_confidence")
+    if min_conf is not None:
+        conditions.append(Result.confidence >= min_conf)
+    if max_conf is not None:
+        conditions.append(Result.confidence <= max_conf)
+    since, until = _datetime("from"), _datetime("to")
+    if since is not None:
+        conditions.append(Result.predicted_at >= since)
+    if until is not None:
+        conditions.append(Result.predicted_at < until)
+    if request.args.get("doctor"):
+        # correlated EXISTS, not patient_id IN (...): the planner keeps walking the
+        # predicted_at index and probes patients by primary key, instead of fetching
+        # every result of every patient of that doctor and sorting them
+        conditions.append(select(Patient.id).where(
+            Patient.id == Result.patient_id, Patient.doctor_name == request.args["doctor"]).exists())
+    if request.args.get("model_version"):
+        conditions.append(Result.model_version == request.args["model_version"])
+
+    cursor = _decode_cursor(2)
+    if cursor is not None:
+        try:
+            ts, last_id = datetime.fromisoformat(cursor[0]), int(cursor[1])
+        except (TypeError, ValueError):
+            raise QueryError("Invalid cursor")
+        # written as <= plus a tie-break (not a row-value compare) so SQLite can range-seek the index
+        conditions.append(and_(Result.predicted_at <= ts,
+                               or_(Result.predicted_at < ts, Result.id < last_id)))
+
+    stmt = (select(*(RESULT_FIELDS[n] for n in names))
+            .where(*conditions)
+            .order_by(Result.predicted_at.desc(), Result.id.desc())
+            .limit(limit + 1))
+    items, rows = _rows(stmt, names, hidden)
+    ts_at, id_at = names.index("predicted_at"), names.index("id")
+    return _page(items, rows, limit, lambda row: _encode_cursor(row[ts_at], row[id_at]))
+
+
+@records_bp.route("/results", methods=["GET"])
+def list_results():
+    """
+    Newest first. Filters: label (comma-separated), min_confidence, max_confidence,
+    from / to (predicted_at, to is exclusive), doctor, model_version.
+    fields=... picks columns (probabilities is opt-in); cursor=... from next_cursor.
+    """
+    return jsonify(_results_page()), 200
+
+
+@records_bp.route("/patients/<int:patient_id>/results", methods=["GET"])
+def patient_results(patient_id):
+    if db.session.get(Patient, patient_id) is None:
+        return jsonify({"error": "Patient not found", "code": "NOT_FOUND"}), 404
+    return jsonify(_results_page(patient_id)), 200
+
+
+# ───────────────────────────────────────
+# PATIENTS
+# ───────────────────────────────────────
+@records_bp.route("/patients", methods=["GET"])
+def list_patients():
+    """Newest first. Filters: doctor, email, city. fields=... and cursor=... as for /results."""
+    limit = _limit()
+    names = _fields(PATIENT_FIELDS, PATIENT_FIELDS)
+    hidden = [] if "id" in names else ["id"]
+    names = names + hidden
+
+    conditions = []
+    for arg, column in (("doctor", Patient.doctor_name), ("email", Patient.email), ("city", Patient.city)):
+        if request.args.get(arg):
+            conditions.append(column == request.args[arg])
+    cursor = _decode_cursor(1)
+    if cursor is not None:
+        try:
+            conditions.append(Patient.id < int(cursor[0]))
+        except (TypeError, ValueError):
+            raise QueryError("Invalid cursor")
+
+    stmt = (select(*(PATIENT_FIELDS[n] for n in names))
+            .where(*conditions)
+            .order_by(Patient.id.desc())
+            .limit(limit + 1))
+    items, rows = _rows(stmt, names, hidden)
+    id_at = names.index("id")
+    return jsonify(_page(items, rows, limit, lambda row: _encode_cursor(row[id_at]))), 200
+
+
+# ───────────────────────────────────────
+# BULK EXPORT
+# ───────────────────────────────────────
+@records_bp.route("/export/results", methods=["GET"])
+def export_results():
+    """
+    Every result joined with its patient, in id order, streamed as CSV (default) or
+    Parquet (format=parquet). Filters: from / to (predicted_at, to is exclusive) and
+    since_id (only larger ids: the last id of the previous export, for incremental pulls).
+    """
+    fmt = request.args.get("format", "csv").lower()
+    if fmt not in export_service.FORMATS:
+        raise QueryError(f"format must be one of {', '.join(export_service.FORMATS)}")
+    if fmt == "parquet" and not export_service.parquet_available():
+        return jsonify({"error": "Parquet export needs pyarrow on the server", "code": "NOT_AVAILABLE"}), 501
+    since_id = request.args.get("since_id")
+    if since_id:
+        try:
+            since_id = int(since_id)
+        except ValueError:
+            raise QueryError("since_id must be an integer")
+    stmt = export_service.export_query(since_id or None, _datetime("from"), _datetime("to"))
+    chunk_rows = current_app.config.get("EXPORT_CHUNK_ROWS", 10_000)
+
+    current_app.logger.info(f"Export started: format={fmt} since_id={since_id} from={request.args.get('from')}"
+                            f" to={request.args.get('to')}")
+    # the request context (and its DB session) stays open until the last chunk is sent
+    body = stream_with_context(export_service.stream(fmt, stmt, chunk_rows))
+    filename = f"results-{datetime.utcnow():%Y%m%dT%H%M%SZ}.{fmt}"
+    return Response(body, mimetype=export_service.FORMATS[fmt],
+                    headers={"Content-Disposition": f'attachment; filename="{filename}"',
+                             "Cache-Control": "no-store"})
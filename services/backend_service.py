@@ -0,0 +1,213 @@
+# services/backend_service.py
+import os
+import time
+import warnings
+
+import torch
+import torch.nn as nn
+
+BACKENDS = ("eager", "torchscript", "int8_dynamic", "int8_static", "onnx")
+INPUT_SHAPE = (3, 224, 224)
+
+
+class ChannelsLast(nn.Module):
+    """Runs the wrapped model on NHWC (channels_last) inputs, which oneDNN convs prefer on CPU."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model.to(memory_format=torch.channels_last)
+
+    def forward(self, x):
+        return self.model(x.contiguous(memory_format=torch.channels_last))
+
+
+class OnnxModel:
+    """Callable with the same contract as the torch model: (N,3,H,W) tensor in, logits tensor out."""
+
+    def __init__(self, path, intra_op_threads=0):
+        import onnxruntime as ort
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            opts.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(path, opts, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, x):
+        out = self.session.run(None, {self.input_name: x.detach().cpu().numpy()})[0]
+        return torch.from_numpy(out)
+
+    def eval(self):
+        return self
+
+
+def default_artifact_path(model_path, backend):
+    """model/alzheimer_model.pth -> model/alzheimer_model.<backend>.pt (model/alzheimer_model.onnx for onnx)"""
+    base, _ = os.path.splitext(model_path)
+    return f"{base}.onnx" if backend == "onnx" else f"{base}.{backend}.pt"
+
+
+def source_path(artifact_path):
+    """Sidecar next to an artifact holding the sha256 of the weights file it was exported from."""
+    return f"{artifact_path}.source"
+
+
+def artifact_source(artifact_path):
+    """Digest recorded by export() for artifact_path, or None when there is no sidecar."""
+    try:
+        with open(source_path(artifact_path)) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _example(batch=1):
+    return torch.randn(batch, *INPUT_SHAPE)
+
+
+def _trace_frozen(model):
+    with torch.no_grad(), warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        traced = torch.jit.trace(model, _example(2))
+        return torch.jit.freeze(traced)
+
+
+def _quantize_static(model, calib_batches):
+    """FX graph-mode post-training int8 quantization, calibrated on calib_batches."""
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+    engine = "x86" if "x86" in torch.backends.quantized.supported_engines else "qnnpack"
+    torch.backends.quantized.engine = engine
+    prepared = prepare_fx(model, get_default_qconfig_mapping(engine), (_example(),))
+    with torch.no_grad():
+        for x in calib_batches:
+            prepared(x)
+    return convert_fx(prepared)
+
+
+def build_backend(model, backend, calib_batches=None, channels_last=False):
+    """
+    In-memory optimized module from the fp32 eager model.
+    calib_batches: iterable of (N,3,224,224) tensors, required for int8_static.
+    """
+    model = model.cpu().eval()
+    if backend == "eager":
+        return ChannelsLast(model) if channels_last else model
+    if backend == "torchscript":
+        return _trace_frozen(ChannelsLast(model) if channels_last else model)
+    if backend == "int8_dynamic":
+        # only nn.Linear has a dynamic int8 kernel; for ResNet18 that is the fc head
+        return torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+    if backend == "int8_static":
+        if calib_batches is None:
+            raise ValueError("int8_static needs calibration batches (--calib-dir)")
+        return _trace_frozen(_quantize_static(model, calib_batches))
+    raise ValueError(f"Cannot build {backend!r} in memory; export it first")
+
+
+def export(model, backend, out_path, calib_batches=None, channels_last=False, source_digest=None):
+    """
+    Write the optimized artifact for backend to out_path and return out_path.
+    source_digest: sha256 of the weights file model came from, recorded in the
+    source_path() sidecar so load_backend() can tell a stale artifact apart.
+    """
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    if backend == "onnx":
+        model = model.cpu().eval()
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            torch.onnx.export(model, (_example(),), out_path,
+                              input_names=["input"], output_names=["logits"],
+                              dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}})
+    else:
+        module = build_backend(model, backend, calib_batches, channels_last)
+        if backend == "int8_dynamic":
+            module = _trace_frozen(module)
+        if backend == "eager":
+            torch.save(model.state_dict(), out_path)
+        else:
+            torch.jit.save(module, out_path)
+
+    if source_digest:
+        with open(source_path(out_path), "w") as f:
+            f.write(source_digest)
+    elif os.path.exists(source_path(out_path)):
+        os.remove(source_path(out_path))   # whatever it named is not what was just written
+    return out_path
+
+
+def load_backend(backend, artifact_path, fp32_model, channels_last=False, source_digest=None):
+    """
+    Runtime loader used by model_service.load_inference_model().
+    Falls back to building in memory when the artifact is missing and that is possible.
+    source_digest: sha256 of the weights fp32_model was loaded from; an artifact
+    exported from other (or unrecorded) weights is then never used - it is rebuilt
+    in memory where possible, refused otherwise. None skips the check.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown INFERENCE_BACKEND {backend!r}; expected one of {BACKENDS}")
+    if backend == "eager":
+        return build_backend(fp32_model, "eager", channels_last=channels_last)
+
+    exists = os.path.exists(artifact_path)
+    if exists and source_digest is not None:
+        found = artifact_source(artifact_path)
+        if found != source_digest:
+            if backend not in ("torchscript", "int8_dynamic"):
+                raise ValueError(f"{backend} artifact {artifact_path} was exported from other weights "
+                                 f"({found[:12] if found else 'unrecorded'}, serving {source_digest[:12]}); "
+                                 f"re-run services/export_model.py")
+            exists = False
+
+    if exists:
+        if backend == "onnx":
+            return OnnxModel(artifact_path, intra_op_threads=torch.get_num_threads())
+        module = torch.jit.load(artifact_path, map_location="cpu")
+        return module.eval()
+
+    if backend in ("torchscript", "int8_dynamic"):
+        return build_backend(fp32_model, backend, channels_last=channels_last)
+    raise FileNotFoundError(f"No {backend} artifact at {artifact_path}; run services/export_model.py")
+
+
+# ───────────────────────────────────────
+# ACCURACY / SPEED REPORTS
+# ───────────────────────────────────────
+def evaluate(module, loader, reference=None):
+    """
+    Accuracy over a labelled loader, and agreement with the reference model's
+    predictions when one is given.
+    returns: dict { images, accuracy, agreement }
+    """
+    correct = agree = total = 0
+    with torch.no_grad():
+        for x, y in loader:
+            pred = module(x).argmax(dim=1)
+            correct += int((pred == y).sum())
+            if reference is not None:
+                agree += int((pred == reference(x).argmax(dim=1)).sum())
+            total += len(y)
+    return {
+        "images": total,
+        "accuracy": correct / total if total else None,
+        "agreement": agree / total if total and reference is not None else None,
+    }
+
+
+def benchmark(module, batch_sizes=(1, 8, 32), repeat=10):
+    """Median latency (ms per batch) and throughput (images/sec) per batch size."""
+    stats = {}
+    with torch.no_grad():
+        for bs in batch_sizes:
+            x = _example(bs)
+            module(x)  # warm-up
+            times = []
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                module(x)
+                times.append(time.perf_counter() - t0)
+            med = sorted(times)[len(times) // 2]
+            stats[bs] = {"latency_ms": med * 1000.0, "images_per_sec": bs / med}
+    return stats
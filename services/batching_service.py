@@ -0,0 +1,156 @@
+# services/batching_service.py
+import threading
+import time
+import queue
+from collections import Counter
+from concurrent.futures import Future
+
+import torch
+
+
+class QueueFullError(RuntimeError):
+    """Raised when the batching queue is at capacity and cannot take more work."""
+
+
+class _Item:
+    __slots__ = ("tensor", "future", "enqueued_at")
+
+    def __init__(self, tensor):
+        self.tensor = tensor
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class MicroBatcher:
+    """
+    Collects single-image requests from many threads and runs them through the
+    model as one batch. A batch is flushed when it reaches max_batch_size or when
+    the oldest queued request has waited max_wait_ms, whichever comes first.
+
+    postprocess(logits_row) turns one row of model output into the caller's result.
+    """
+
+    def __init__(self, model, device, postprocess, max_batch_size=8, max_wait_ms=10, max_queue=256):
+        self.model = model
+        self.device = device
+        self.postprocess = postprocess
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._batches = 0
+        self._items = 0
+        self._wait_ms_total = 0.0
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    # ───────────────────────────────────────
+    # PUBLIC API
+    # ───────────────────────────────────────
+    def submit(self, image_tensor):
+        """
+        image_tensor: torch.Tensor shaped (3,H,W) or (1,3,H,W)
+        returns: concurrent.futures.Future resolving to postprocess(logits_row)
+        """
+        if image_tensor.dim() == 4:
+            image_tensor = image_tensor[0]
+        if self._stopped.is_set():
+            raise RuntimeError("batcher closed")
+        item = _Item(image_tensor)
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            raise QueueFullError("Inference queue is full")
+        if self._stopped.is_set():
+            self._fail_queued()   # closed while this was being queued: nobody will run it
+        return item.future
+
+    def predict(self, image_tensor, timeout=30.0):
+        """Blocking helper: submit and wait for the result (concurrent.futures.TimeoutError after timeout)."""
+        return self.submit(image_tensor).result(timeout=timeout)
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "batches": self._batches,
+                "items": self._items,
+                "avg_batch_size": (self._items / self._batches) if self._batches else 0.0,
+                "avg_queue_wait_ms": (self._wait_ms_total / self._items) if self._items else 0.0,
+                "batch_size_histogram": {str(k): v for k, v in sorted(self._batch_sizes.items())},
+            }
+
+    def close(self, timeout=1.0):
+        """Stop the worker; requests still queued fail instead of waiting forever."""
+        self._stopped.set()
+        self._thread.join(timeout)
+        self._fail_queued()
+
+    def _fail_queued(self):
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            item.future.set_exception(RuntimeError("batcher closed"))
+
+    # ───────────────────────────────────────
+    # WORKER LOOP
+    # ───────────────────────────────────────
+    def _collect(self):
+        """Block for the first item, then gather more until size or time limit."""
+        try:
+            first = self._queue.get(timeout=0.1)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                # drain whatever is already waiting without blocking
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except queue.Empty:
+                    break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stopped.is_set():
+            batch = self._collect()
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            try:
+                x = torch.stack([item.tensor for item in batch]).to(self.device)
+                with torch.no_grad():
+                    out = self.model(x).cpu()
+            except Exception as e:
+                for item in batch:
+                    item.future.set_exception(e)
+                continue
+
+            for i, item in enumerate(batch):
+                try:
+                    item.future.set_result(self.postprocess(out[i]))
+                except Exception as e:
+                    item.future.set_exception(e)
+
+            with self._stats_lock:
+                self._batches += 1
+                self._items += len(batch)
+                self._batch_sizes[len(batch)] += 1
+                self._wait_ms_total += sum((started - item.enqueued_at) * 1000.0 for item in batch)
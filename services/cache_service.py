@@ -0,0 +1,131 @@
+# services/cache_service.py
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+
+class PredictionCache:
+    """
+    Two-tier cache keyed by "<image sha256>:<model version>".
+    Memory: LRU OrderedDict capped at memory_entries. Disk: a small SQLite file
+    capped at disk_entries (least recently used rows are trimmed every 100 writes). Both tiers
+    drop entries older than ttl_seconds. Values are JSON-serializable dicts.
+    """
+
+    def __init__(self, db_path, memory_entries=1024, disk_entries=100000, ttl_seconds=30 * 86400):
+        self.db_path = db_path
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.ttl = ttl_seconds
+        self._mem = OrderedDict()          # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "puts": 0, "evictions": 0}
+        self._writes = 0
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS entries ("
+                         "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                         "stored_at REAL NOT NULL, accessed_at REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_entries_accessed ON entries (accessed_at)")
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    # ───────────────────────────────────────
+    # PUBLIC API
+    # ───────────────────────────────────────
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            hit = self._mem.get(key)
+            if hit is not None and now - hit[0] <= self.ttl:
+                self._mem.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return hit[1]
+            if hit is not None:
+                del self._mem[key]
+
+        with self._connect() as conn:
+            row = conn.execute("SELECT value, stored_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] <= self.ttl:
+                conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            elif row is not None:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                row = None
+
+        with self._lock:
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["disk_hits"] += 1
+            value = json.loads(row[0])
+            self._remember(key, row[1], value)
+            return value
+
+    def put(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            self._stats["puts"] += 1
+            self._writes += 1
+            trim = self._writes % 100 == 0
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO entries (key, value, stored_at, accessed_at) VALUES (?, ?, ?, ?)",
+                         (key, json.dumps(value), now, now))
+            if trim:
+                self._trim(conn, now)
+
+    def stats(self):
+        with self._lock:
+            s = dict(self._stats)
+            s["memory_entries"] = len(self._mem)
+        lookups = s["memory_hits"] + s["disk_hits"] + s["misses"]
+        s["hit_rate"] = (s["memory_hits"] + s["disk_hits"]) / lookups if lookups else 0.0
+        return s
+
+    # ───────────────────────────────────────
+    # INTERNALS
+    # ───────────────────────────────────────
+    def _remember(self, key, stored_at, value):
+        self._mem[key] = (stored_at, value)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.memory_entries:
+            self._mem.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _trim(self, conn, now):
+        """Drop expired rows, then the least recently used ones above disk_entries."""
+        conn.execute("DELETE FROM entries WHERE stored_at < ?", (now - self.ttl,))
+        conn.execute("DELETE FROM entries WHERE key IN ("
+                     "SELECT key FROM entries ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                     (self.disk_entries,))
+
+
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+
+def get_cache():
+    """Shared PredictionCache, or None when PREDICTION_CACHE is disabled."""
+    global _CACHE
+    cfg = current_app.config
+    if not cfg.get("PREDICTION_CACHE", True):
+        return None
+    if _CACHE is None:
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                _CACHE = PredictionCache(
+                    cfg.get("CACHE_DB_PATH", "instance/prediction_cache.db"),
+                    memory_entries=cfg.get("CACHE_MEMORY_ENTRIES", 1024),
+                    disk_entries=cfg.get("CACHE_DISK_ENTRIES", 100000),
+                    ttl_seconds=cfg.get("CACHE_TTL_SECONDS", 30 * 86400),
+                )
+    return _CACHE
+
+def cache_stats():
+    return _CACHE.stats() if _CACHE is not None else {}
@@ -0,0 +1,151 @@
+# services/dataset_shard.py
+# Decode an ImageFolder dataset once into a memory-mapped uint8 shard that training
+# and evaluation stream from, instead of decoding and resizing every JPEG each epoch.
+#
+# Run from project root:
+#   python -m services.dataset_shard ../dataset_alzheimers ../ml/train_shard --workers 4
+#
+# A shard is two files:
+#   <name>.u8    raw (N,3,224,224) uint8 CHW pixels, already resized like utils.preprocess
+#   <name>.json  {"shape", "class_names", "labels", "files", "source"}
+import os
+import json
+import uuid
+import argparse
+
+import numpy as np
+import torch
+from PIL import Image
+from torch.utils.data import Dataset, DataLoader, BatchSampler, RandomSampler, SequentialSampler
+from torchvision import datasets
+
+from utils.preprocess import INPUT_SIZE
+
+
+def _load_u8(path):
+    """ImageFolder loader: RGB, resized as in utils.preprocess, (3,H,W) uint8."""
+    with Image.open(path) as img:
+        img = img.convert("RGB")
+        if img.size != (INPUT_SIZE, INPUT_SIZE):
+            img = img.resize((INPUT_SIZE, INPUT_SIZE), Image.BILINEAR)
+        return torch.from_numpy(np.asarray(img).copy()).permute(2, 0, 1)
+
+
+def build_shard(dataset_path, out_prefix, workers=0, batch_size=64):
+    """
+    Decode every image under dataset_path (ImageFolder layout) into out_prefix.u8/.json.
+    returns: the metadata dict written to out_prefix.json
+    """
+    folder = datasets.ImageFolder(dataset_path, loader=_load_u8)
+    n = len(folder)
+    if n == 0:
+        raise ValueError(f"No images found under {dataset_path}")
+    shape = (n, 3, INPUT_SIZE, INPUT_SIZE)
+
+    out_dir = os.path.dirname(os.path.abspath(out_prefix))
+    os.makedirs(out_dir, exist_ok=True)
+    tmp = os.path.join(out_dir, f".{uuid.uuid4().hex}.u8.tmp")
+    pixels = np.memmap(tmp, dtype=np.uint8, mode="w+", shape=shape)
+
+    loader = DataLoader(folder, batch_size=batch_size, shuffle=False, num_workers=workers)
+    i = 0
+    for x, _ in loader:
+        pixels[i:i + len(x)] = x.numpy()
+        i += len(x)
+    pixels.flush()
+    del pixels
+    os.replace(tmp, out_prefix + ".u8")
+
+    meta = {
+        "shape": list(shape),
+        "class_names": folder.classes,
+        "labels": [label for _, label in folder.samples],
+        "files": [os.path.relpath(p, dataset_path) for p, _ in folder.samples],
+        "source": os.path.abspath(dataset_path),
+    }
+    with open(out_prefix + ".json.tmp", "w") as f:
+        json.dump(meta, f)
+    os.replace(out_prefix + ".json.tmp", out_prefix + ".json")   # .json last: its presence means complete
+    return meta
+
+
+def shard_exists(prefix):
+    return os.path.isfile(prefix + ".json") and os.path.isfile(prefix + ".u8")
+
+
+def stale_reason(prefix, dataset_path):
+    """
+    Why the shard at prefix does not hold dataset_path as it is now, or None if it does:
+    another source directory, other classes, files added / removed / renamed, or files
+    modified after the shard was built. Lists and stats the files; decodes nothing.
+    """
+    with open(prefix + ".json") as f:
+        meta = json.load(f)
+    if meta.get("source") != os.path.abspath(dataset_path):
+        return f"built from {meta.get('source')}, not {os.path.abspath(dataset_path)}"
+    folder = datasets.ImageFolder(dataset_path, loader=lambda path: path)   # listing only
+    if meta["class_names"] != folder.classes:
+        return f"classes {meta['class_names']} != {folder.classes}"
+    files = [os.path.relpath(p, dataset_path) for p, _ in folder.samples]
+    if meta.get("files") != files:
+        return f"{len(meta.get('files', []))} files in the shard, {len(files)} in the dataset or different names"
+    built = os.path.getmtime(prefix + ".json")
+    changed = sum(os.path.getmtime(p) > built for p, _ in folder.samples)
+    if changed:
+        return f"{changed} file(s) modified since the shard was built"
+    return None
+
+
+class ShardDataset(Dataset):
+    """
+    Batch-level dataset over a shard: indexed with a list of indices (use it with a
+    BatchSampler and batch_size=None) it returns ((B,3,224,224) uint8, (B,) int64).
+    The memory map is opened lazily in whichever process reads, so DataLoader
+    workers share the OS page cache instead of each holding a copy.
+    """
+
+    def __init__(self, prefix):
+        with open(prefix + ".json") as f:
+            meta = json.load(f)
+        self.path = prefix + ".u8"
+        self.shape = tuple(meta["shape"])
+        self.class_names = meta["class_names"]
+        self.files = meta.get("files", [])
+        self.labels = torch.tensor(meta["labels"], dtype=torch.int64)
+        self._pixels = None
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["_pixels"] = None     # never pickle the map into workers
+        return state
+
+    def __getitem__(self, indices):
+        if self._pixels is None:
+            self._pixels = np.memmap(self.path, dtype=np.uint8, mode="r", shape=self.shape)
+        idx = np.sort(np.asarray(indices))   # ascending reads are sequential on disk
+        return torch.from_numpy(self._pixels[idx]), self.labels[idx]
+
+
+def shard_loader(dataset, batch_size, shuffle=True, workers=0, prefetch=2, pin_memory=False):
+    """DataLoader yielding whole uint8 batches from a ShardDataset."""
+    sampler = RandomSampler(dataset) if shuffle else SequentialSampler(dataset)
+    options = {"num_workers": workers, "pin_memory": pin_memory}
+    if workers > 0:
+        options["prefetch_factor"] = prefetch
+    return DataLoader(dataset, sampler=BatchSampler(sampler, batch_size, drop_last=False),
+                      batch_size=None, **options)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Decode an ImageFolder dataset into a uint8 shard")
+    parser.add_argument("dataset")
+    parser.add_argument("out", help="output prefix (writes <out>.u8 and <out>.json)")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    args = parser.parse_args()
+
+    meta = build_shard(args.dataset, args.out, args.workers)
+    size_mib = os.path.getsize(args.out + ".u8") / 2**20
+    print(f"{meta['shape'][0]} images, classes {meta['class_names']} -> {args.out}.u8 ({size_mib:.0f} MiB)")
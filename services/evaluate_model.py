@@ -0,0 +1,225 @@
+# services/evaluate_model.py
+# Offline evaluation of a saved model on a held-out ImageFolder (or a shard built from
+# one with services.dataset_shard), plus a throughput grid. Run from project root:
+#
+#   python -m services.evaluate_model --eval-dir ../dataset_holdout --out eval.json
+#   python -m services.evaluate_model --shard ../ml/holdout_shard --backend torchscript \
+#       --batch-sizes 1,8,32,64 --threads 1,2,4 --class-map NonDemented=Normal --out eval.json
+#
+# The JSON report (accuracy, per-class precision/recall, confusion matrix, calibration,
+# images/sec per threads x batch size) is meant to be kept per model/backend version.
+import os
+import json
+import time
+import argparse
+from datetime import datetime
+
+import torch
+from torch.utils.data import DataLoader
+from torchvision import datasets
+
+from config import Config
+from services import registry_service
+from services.model_service import load_weights
+from services.backend_service import BACKENDS, default_artifact_path, load_backend, benchmark
+from utils.preprocess import fast_transform, normalize_batch
+
+
+# ───────────────────────────────────────
+# DATA
+# ───────────────────────────────────────
+def _batches(args):
+    """(iterable of (float32 batch, dataset labels), dataset class names)."""
+    if args.shard:
+        from services.dataset_shard import ShardDataset, shard_loader
+
+        ds = ShardDataset(args.shard)
+        loader = shard_loader(ds, args.eval_batch, shuffle=False, workers=args.workers)
+        return ((normalize_batch(x), y) for x, y in loader), ds.class_names
+
+    ds = datasets.ImageFolder(args.eval_dir, transform=fast_transform)
+    loader = DataLoader(ds, batch_size=args.eval_batch, shuffle=False, num_workers=args.workers)
+    return loader, ds.classes
+
+
+def _label_map(dataset_classes, model_classes, class_map):
+    """
+    Dataset label index -> model output index, matched by class name (folder order is
+    alphabetical, the model's is whatever it was trained with). class_map renames
+    dataset folders first, e.g. {"NonDemented": "Normal"}.
+    """
+    mapping = []
+    for name in dataset_classes:
+        target = class_map.get(name, name)
+        if target not in model_classes:
+            raise ValueError(f"Dataset class {name!r} is not one of the model's classes {model_classes}; "
+                             f"use --class-map {name}=<model class>")
+        mapping.append(model_classes.index(target))
+    return torch.tensor(mapping)
+
+
+# ───────────────────────────────────────
+# METRICS
+# ───────────────────────────────────────
+def confusion_matrix(pred, target, num_classes):
+    """rows: true class, columns: predicted class"""
+    return torch.bincount(target * num_classes + pred, minlength=num_classes ** 2).view(num_classes, num_classes)
+
+
+def classification_report(probs, target, class_names):
+    """Accuracy, macro/weighted F1, per-class precision/recall/F1/support and the confusion matrix."""
+    k = len(class_names)
+    cm = confusion_matrix(probs.argmax(dim=1), target, k).double()
+    tp = cm.diag()
+    support = cm.sum(dim=1)
+    predicted = cm.sum(dim=0)
+    precision = torch.where(predicted > 0, tp / predicted.clamp(min=1), torch.zeros_like(tp))
+    recall = torch.where(support > 0, tp / support.clamp(min=1), torch.zeros_like(tp))
+    f1 = torch.where(precision + recall > 0, 2 * precision * recall / (precision + recall).clamp(min=1e-12),
+                     torch.zeros_like(tp))
+    present = support > 0
+    return {
+        "images": int(support.sum()),
+        "accuracy": float(tp.sum() / support.sum()) if support.sum() else None,
+        "macro_f1": float(f1[present].mean()) if present.any() else None,
+        "weighted_f1": float((f1 * support).sum() / support.sum()) if support.sum() else None,
+        "per_class": {
+            name: {"precision": float(precision[i]), "recall": float(recall[i]),
+                   "f1": float(f1[i]), "support": int(support[i])}
+            for i, name in enumerate(class_names)
+        },
+        "confusion_matrix": {"labels": list(class_names), "rows_true_cols_pred": cm.long().tolist()},
+    }
+
+
+def calibration(probs, target, bins=15):
+    """
+    Expected / maximum calibration error over equal-width confidence bins, Brier score,
+    negative log-likelihood and the reliability table behind them.
+    """
+    confidence, pred = probs.max(dim=1)
+    correct = (pred == target).double()
+    confidence = confidence.double()
+    edges = torch.linspace(0, 1, bins + 1, dtype=torch.float64)
+    table, ece, mce = [], 0.0, 0.0
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        in_bin = (confidence > lo) & (confidence <= hi) if lo > 0 else (confidence <= hi)
+        n = int(in_bin.sum())
+        if n == 0:
+            continue
+        conf, acc = float(confidence[in_bin].mean()), float(correct[in_bin].mean())
+        gap = abs(acc - conf)
+        ece += gap * n / len(target)
+        mce = max(mce, gap)
+        table.append({"bin": [round(float(lo), 4), round(float(hi), 4)], "count": n,
+                      "avg_confidence": conf, "accuracy": acc})
+    onehot = torch.nn.functional.one_hot(target, probs.shape[1]).double()
+    return {
+        "bins": bins,
+        "ece": ece,
+        "mce": mce,
+        "brier": float(((probs.double() - onehot) ** 2).sum(dim=1).mean()),
+        "nll": float(-torch.log(probs.double().gather(1, target[:, None]).clamp(min=1e-12)).mean()),
+        "reliability": table,
+    }
+
+
+def run_eval(module, batches, label_map):
+    """Softmax outputs and model-index targets over the whole eval set."""
+    probs, targets = [], []
+    with torch.inference_mode():
+        for x, y in batches:
+            probs.append(torch.softmax(module(x).float(), dim=1))
+            targets.append(label_map[y])
+    return torch.cat(probs), torch.cat(targets)
+
+
+def speed_grid(backend, artifact, fp32, thread_counts, batch_sizes, repeat, channels_last=False, source_digest=None):
+    """images/sec and latency per (torch threads, batch size); the module is rebuilt per thread count."""
+    grid = {}
+    default_threads = torch.get_num_threads()
+    try:
+        for threads in thread_counts:
+            torch.set_num_threads(threads)
+            module = load_backend(backend, artifact, fp32, channels_last=channels_last, source_digest=source_digest)
+            grid[str(threads)] = {str(bs): s for bs, s in benchmark(module, batch_sizes, repeat).items()}
+    finally:
+        torch.set_num_threads(default_threads)
+    return grid
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Accuracy, calibration and throughput report for a saved model")
+    parser.add_argument("--model-path", default=Config.MODEL_PATH)
+    parser.add_argument("--backend", default="eager", choices=BACKENDS)
+    parser.add_argument("--artifact", default=None, help="backend artifact (default: next to the model)")
+    parser.add_argument("--channels-last", action="store_true")
+    data = parser.add_mutually_exclusive_group(required=True)
+    data.add_argument("--eval-dir", help="held-out ImageFolder")
+    data.add_argument("--shard", help="uint8 shard prefix built by services.dataset_shard")
+    parser.add_argument("--class-map", default="", help="dataset=model class renames, e.g. NonDemented=Normal")
+    parser.add_argument("--eval-batch", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1), help="decode workers")
+    parser.add_argument("--batch-sizes", default="1,8,32,64")
+    parser.add_argument("--threads", default=None, help="comma-separated torch thread counts (default: 1 and all)")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--bins", type=int, default=15, help="calibration bins")
+    parser.add_argument("--out", default=None, help="write the JSON report here")
+    args = parser.parse_args()
+
+    fp32, meta = load_weights(args.model_path)
+    fp32 = fp32.cpu().eval()
+    class_names = meta["class_names"]
+    artifact = args.artifact or default_artifact_path(args.model_path, args.backend)
+    source = registry_service.file_digest(args.model_path)
+    module = load_backend(args.backend, artifact, fp32, channels_last=args.channels_last, source_digest=source)
+
+    batches, dataset_classes = _batches(args)
+    class_map = dict(pair.split("=", 1) for pair in args.class_map.split(",") if pair)
+    label_map = _label_map(dataset_classes, class_names, class_map)
+    started = time.perf_counter()
+    probs, targets = run_eval(module, batches, label_map)
+    eval_seconds = time.perf_counter() - started
+
+    report = {
+        "model_path": os.path.abspath(args.model_path),
+        "model_version": registry_service.file_digest(args.model_path)[:12],
+        "backend": args.backend,
+        "artifact": artifact if args.backend != "eager" else None,
+        "dataset": os.path.abspath(args.eval_dir or args.shard),
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "torch": torch.__version__,
+        "cpus": os.cpu_count(),
+        "class_names": class_names,
+        "eval": classification_report(probs, targets, class_names),
+        "calibration": calibration(probs, targets, args.bins),
+    }
+    # end to end: decode workers + model, at the default thread count
+    report["eval"]["seconds"] = eval_seconds
+    report["eval"]["images_per_sec"] = len(targets) / eval_seconds
+
+    cpus = torch.get_num_threads()
+    thread_counts = ([int(t) for t in args.threads.split(",")] if args.threads
+                     else sorted({1, cpus}))
+    batch_sizes = [int(b) for b in args.batch_sizes.split(",")]
+    report["speed"] = speed_grid(args.backend, artifact, fp32, thread_counts, batch_sizes,
+                                 args.repeat, args.channels_last, source)
+
+    ev, cal = report["eval"], report["calibration"]
+    print(f"{report['model_version']} ({args.backend}) on {ev['images']} images: accuracy {ev['accuracy']:.4f}, "
+          f"macro F1 {ev['macro_f1']:.4f}, ECE {cal['ece']:.4f}, Brier {cal['brier']:.4f} "
+          f"({ev['images_per_sec']:.1f} img/s end to end)")
+    for name, c in ev["per_class"].items():
+        print(f"  {name:<18} precision {c['precision']:.3f}  recall {c['recall']:.3f}  "
+              f"f1 {c['f1']:.3f}  n={c['support']}")
+    print("  confusion (rows true, cols pred):")
+    for name, row in zip(class_names, ev["confusion_matrix"]["rows_true_cols_pred"]):
+        print(f"    {name:<18} {row}")
+    for threads, per_bs in report["speed"].items():
+        speed = ", ".join(f"bs{bs}: {s['images_per_sec']:.1f} img/s" for bs, s in per_bs.items())
+        print(f"  {threads} thread(s): {speed}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.out}")
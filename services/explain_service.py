@@ -1,81 +1,226 @@
 # services/explain_service.py
-import os
+import threading
+import weakref
 import numpy as np
-import cv2
 import torch
 from flask import current_app
-from torchvision import transforms
-from PIL import Image
 
+from services import model_service
 from services.model_service import load_model
+from services.heatmap_service import pack_cam
+from utils.preprocess import DecodedImage
 
-# Same preprocess used by model (224x224 + ImageNet norm)
-_transform = transforms.Compose([
-    transforms.Resize((224,224)),
-    transforms.ToTensor(),
-    transforms.Normalize([0.485,0.456,0.406],[0.229,0.224,0.225])
-])
+def _alive(ref):
+    model = ref()
+    if model is None:
+        raise RuntimeError("The model of this engine has been released")
+    return model
 
-def make_gradcam(image_path, target_index, out_path):
+class GradCAM:
     """
-    Grad-CAM for ResNet-like model. Saves overlay to out_path and returns out_path.
+    Grad-CAM engine bound to one model. The target layer (last Conv2d) is found
+    once and its hooks stay registered for the lifetime of the engine, so repeated
+    calls do not pile up callbacks on the shared model. The forward hook only
+    keeps activations for the thread that is currently computing a CAM, so plain
+    predictions running on other threads are left alone.
     """
-    model = load_model()
+
+    def __init__(self, model, target_layer=None):
+        self._model = weakref.ref(model)
+        if target_layer is None:
+            # find last conv layer (take the last Conv2d)
+            for module in model.modules():
+                if isinstance(module, torch.nn.Conv2d):
+                    target_layer = module
+        if target_layer is None:
+            raise RuntimeError("No conv layer found in model for Grad-CAM")
+        self.target_layer = target_layer
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._activation = None
+        self._gradient = None
+        self._handles = [
+            target_layer.register_forward_hook(self._forward_hook),
+            target_layer.register_full_backward_hook(self._backward_hook),
+        ]
+
+    model = property(lambda self: _alive(self._model))
+
+    def _forward_hook(self, module, inp, out):
+        if getattr(self._local, "active", False):
+            self._activation = out.detach()
+
+    def _backward_hook(self, module, grad_in, grad_out):
+        # backward only ever runs from __call__ (may be on an autograd device thread)
+        self._gradient = grad_out[0].detach()
+
+    def remove(self):
+        for h in self._handles:
+            h.remove()
+        self._handles = []
+
+    def __call__(self, x, target_index=None):
+        """
+        One grad-enabled forward + backward through the model.
+        x: torch.Tensor shaped (1,3,H,W) on the model's device
+        returns: (logits (1,num_classes) detached, cam (H',W') numpy at conv resolution, target_index)
+        """
+        with self._lock:
+            self._local.active = True
+            try:
+                with torch.enable_grad():
+                    out = self.model(x)
+                    if target_index is None:
+                        target_index = int(out.argmax(dim=1).item())
+                    out[0, target_index].backward()
+                act = self._activation[0]    # (C,H,W)
+                grad = self._gradient[0]     # (C,H,W)
+            finally:
+                self._local.active = False
+                self._activation = None
+                self._gradient = None
+                # drop parameter grads so they are not held between calls
+                self.model.zero_grad(set_to_none=True)
+
+        weights = grad.mean(dim=(1, 2))                      # (C,)
+        cam = torch.tensordot(weights, act, dims=1)           # (H,W)
+        return out.detach(), cam.cpu().numpy().astype(np.float32), target_index
+
+class ClassActivationMap:
+    """
+    Classic CAM for a global-average-pool + Linear head (ResNet): the map for class k
+    is fc.weight[k] applied to the last block's activations, so no backward pass is
+    needed. Runs under inference_mode on whole batches and returns every class's map.
+    The activations are kept per thread, so concurrent calls do not interfere.
+    """
+
+    def __init__(self, model, feature_layer=None):
+        self._model = weakref.ref(model)
+        self.fc = getattr(model, "fc", None)
+        if not isinstance(self.fc, torch.nn.Linear):
+            raise RuntimeError("CAM needs a model whose head is a Linear layer named fc")
+        feature_layer = feature_layer or getattr(model, "layer4", None)
+        if feature_layer is None:
+            raise RuntimeError("No layer4 found in model for CAM")
+        self.feature_layer = feature_layer
+
+        self._local = threading.local()
+        self._handles = [feature_layer.register_forward_hook(self._forward_hook)]
+
+    model = property(lambda self: _alive(self._model))
+
+    def _forward_hook(self, module, inp, out):
+        if getattr(self._local, "active", False):
+            self._local.features = out
+
+    def remove(self):
+        for h in self._handles:
+            h.remove()
+        self._handles = []
+
+    def __call__(self, x):
+        """
+        x: torch.Tensor shaped (N,3,H,W) on the model's device
+        returns: (logits (N,num_classes), cams (N,num_classes,H',W') at conv resolution)
+        """
+        self._local.active = True
+        try:
+            with torch.inference_mode():
+                out = self.model(x)
+                cams = torch.einsum("kc,nchw->nkhw", self.fc.weight, self._local.features)
+        finally:
+            self._local.active = False
+            self._local.features = None
+        return out, cams
+
+# one engine of each kind per loaded model (active and canary can both be live during a rollout).
+# Engines only hold a weak reference to their model (their hooks and layers are submodules,
+# which do not point back at it), so a retired model is freed together with its engines.
+_ENGINES = weakref.WeakKeyDictionary()
+_CAM_ENGINES = weakref.WeakKeyDictionary()
+_ENGINE_LOCK = threading.Lock()
+
+def _engine(engines, factory, model):
+    if model is None:
+        model = load_model()
+    engine = engines.get(model)
+    if engine is not None:
+        return engine
+    with _ENGINE_LOCK:
+        engine = engines.get(model)
+        if engine is None:
+            engine = engines[model] = factory(model)
+    return engine
+
+def get_gradcam(model=None):
+    """Return the GradCAM engine for model (default: the active one), creating it on first use."""
+    return _engine(_ENGINES, GradCAM, model)
+
+def get_cam(model=None):
+    """Return the ClassActivationMap engine for model (default: the active one), creating it on first use."""
+    return _engine(_CAM_ENGINES, ClassActivationMap, model)
+
+def warm_up(model, x, mode):
+    """One explanation in the given EXPLAIN_MODE, so the first request does not pay for it."""
+    if mode == "cam":
+        get_cam(model)(x)
+    elif mode == "gradcam":
+        get_gradcam(model)(x)
+
+def make_heatmap(image, target_index, mode="gradcam", model_version=None):
+    """
+    Heatmap for target_index (the background job path).
+    image: DecodedImage or a path to the image file
+    mode: "gradcam" or "cam"
+    model_version: the version that made the prediction (default: the active one);
+                   LookupError if it is no longer loaded
+    returns: the map packed by heatmap_service.pack_cam (rendered on request)
+    """
+    if not isinstance(image, DecodedImage):
+        image = DecodedImage.from_path(image)
+    if model_version is None:
+        model = load_model()
+    else:
+        serving = model_service.serving_for(model_version)
+        if serving is None:
+            raise LookupError(f"model {model_version} is no longer loaded")
+        model = serving.model
     device = next(model.parameters()).device
+    x = image.tensor.to(device)
+
+    if mode == "cam":
+        _, cams = get_cam(model)(x)
+        return pack_cam(cams[0, target_index].cpu().numpy())
+    _, cam, _ = get_gradcam(model)(x, target_index)
+    return pack_cam(cam)
+
+def predict_with_explanation(image, mode="gradcam"):
+    """
+    Prediction and heatmap from a single pass: one forward under inference_mode for
+    "cam", one grad-enabled forward + backward for "gradcam". The softmax comes from
+    the same forward whose activations feed the map.
+    image: DecodedImage (decoded once per request)
+    returns: dict { label, index, probabilities, classes, model_version, cam }
+             cam is the packed map (bytes), or None if it could not be produced.
+    """
+    serving, shadow = model_service.route()
+    model = serving.model
+    device = next(model.parameters()).device
+    x = image.tensor.to(device)
+
+    if mode == "cam":
+        out, cams = get_cam(model)(x)
+        res = serving.postprocess(out[0])
+        cam = cams[0, res["index"]].cpu().numpy()
+    else:
+        out, cam, _ = get_gradcam(model)(x)
+        res = serving.postprocess(out[0])
+    model_service.shadow_compare(shadow, image.tensor, res)
 
-    # find last conv layer name (take the last Conv2d)
-    last_conv = None
-    for name, module in model.named_modules():
-        if isinstance(module, torch.nn.Conv2d):
-            last_conv = name
-
-    if last_conv is None:
-        raise RuntimeError("No conv layer found in model for Grad-CAM")
-
-    activations = {}
-    gradients = {}
-
-    def forward_hook(module, inp, out):
-        activations["value"] = out.detach()
-
-    def backward_hook(module, grad_in, grad_out):
-        gradients["value"] = grad_out[0].detach()
-
-    # register hooks on the found conv layer
-    for name, module in model.named_modules():
-        if name == last_conv:
-            module.register_forward_hook(forward_hook)
-            module.register_backward_hook(backward_hook)
-            break
-
-    # prepare input
-    img = Image.open(image_path).convert("RGB")
-    orig = cv2.imread(image_path)
-    x = _transform(img).unsqueeze(0).to(device)
-
-    model.zero_grad()
-    out = model(x)
-    if target_index is None:
-        target_index = int(out.argmax(dim=1).item())
-    score = out[0, target_index]
-    score.backward(retain_graph=True)
-
-    act = activations["value"][0].cpu().numpy()   # (C,H,W)
-    grad = gradients["value"][0].cpu().numpy()    # (C,H,W)
-    weights = np.mean(grad, axis=(1,2))           # (C,)
-
-    cam = np.zeros(act.shape[1:], dtype=np.float32)
-    for i, w in enumerate(weights):
-        cam += w * act[i]
-
-    cam = np.maximum(cam, 0)
-    cam = cv2.resize(cam, (orig.shape[1], orig.shape[0]))
-    cam = cam - cam.min()
-    cam = cam / (cam.max() + 1e-8)
-    heat = (cam * 255).astype("uint8")
-    heatmap = cv2.applyColorMap(heat, cv2.COLORMAP_JET)
-    overlay = cv2.addWeighted(heatmap, 0.4, orig, 0.6, 0)
-
-    cv2.imwrite(out_path, overlay)
-    current_app.logger.info("Saved Grad-CAM overlay to %s", out_path)
-    return out_path
+    try:
+        res["cam"] = pack_cam(cam)
+    except Exception as e:
+        current_app.logger.warning(f"Heatmap packing failed: {e}")
+        res["cam"] = None
+    return res
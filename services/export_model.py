@@ -0,0 +1,96 @@
+# services/export_model.py
+# Run from project root:
+#   python -m services.export_model --backend torchscript
+#   python -m services.export_model --backend all --calib-dir ../dataset_calib --eval-dir ../dataset_holdout
+import os
+import json
+import argparse
+
+import torch
+from torch.utils.data import DataLoader
+from torchvision import datasets
+
+from config import Config
+from services.model_service import build_model, _build_default_model
+from services.registry_service import file_digest
+from services.backend_service import (BACKENDS, default_artifact_path, export, load_backend,
+                                      evaluate, benchmark)
+from utils.preprocess import fast_transform
+
+
+def _loader(folder, batch_size=32):
+    ds = datasets.ImageFolder(folder, transform=fast_transform)
+    return DataLoader(ds, batch_size=batch_size, shuffle=False, num_workers=min(4, os.cpu_count() or 1))
+
+
+def _calib_batches(folder, max_batches):
+    if folder is None:
+        return None
+    batches = []
+    for i, (x, _) in enumerate(_loader(folder)):
+        if i >= max_batches:
+            break
+        batches.append(x)
+    return batches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export MODEL_PATH to an optimized inference artifact")
+    parser.add_argument("--model-path", default=Config.MODEL_PATH)
+    parser.add_argument("--backend", default="torchscript", choices=BACKENDS + ("all",))
+    parser.add_argument("--out", default=None, help="artifact path (default: next to MODEL_PATH)")
+    parser.add_argument("--channels-last", action="store_true")
+    parser.add_argument("--calib-dir", default=None, help="ImageFolder used to calibrate int8_static")
+    parser.add_argument("--calib-batches", type=int, default=10)
+    parser.add_argument("--eval-dir", default=None, help="held-out ImageFolder for the accuracy report")
+    parser.add_argument("--report", default=None, help="write the comparison report to this JSON file")
+    args = parser.parse_args()
+
+    if os.path.exists(args.model_path):
+        fp32 = build_model(args.model_path).cpu().eval()
+        source = file_digest(args.model_path)
+        print(f"Loaded fp32 model from {args.model_path}")
+    else:
+        fp32, source = _build_default_model().eval(), None
+        print(f"No model at {args.model_path}, exporting the untrained default ResNet18")
+
+    backends = [b for b in BACKENDS if b != "eager"] if args.backend == "all" else [args.backend]
+    calib = _calib_batches(args.calib_dir, args.calib_batches)
+    eval_loader = _loader(args.eval_dir) if args.eval_dir else None
+
+    report = {"model_path": args.model_path, "threads": torch.get_num_threads(), "backends": {}}
+    if eval_loader is not None:
+        report["backends"]["eager"] = {"eval": evaluate(fp32, eval_loader), "speed": benchmark(fp32)}
+
+    for backend in backends:
+        if backend == "int8_static" and calib is None:
+            print("Skipping int8_static: --calib-dir is required")
+            continue
+        if backend == "onnx":
+            try:
+                import onnxruntime  # noqa: F401
+            except ImportError:
+                print("Skipping onnx: onnxruntime is not installed")
+                continue
+
+        out = args.out if args.out and len(backends) == 1 else default_artifact_path(args.model_path, backend)
+        export(fp32, backend, out, calib_batches=calib, channels_last=args.channels_last, source_digest=source)
+        module = load_backend(backend, out, fp32, channels_last=args.channels_last)
+        entry = {"artifact": out, "bytes": os.path.getsize(out), "speed": benchmark(module)}
+
+        with torch.no_grad():
+            x = torch.randn(8, 3, 224, 224)
+            entry["max_logit_diff"] = float((module(x) - fp32(x)).abs().max())
+        if eval_loader is not None:
+            entry["eval"] = evaluate(module, eval_loader, reference=fp32)
+            entry["accuracy_delta"] = entry["eval"]["accuracy"] - report["backends"]["eager"]["eval"]["accuracy"]
+
+        report["backends"][backend] = entry
+        speed = ", ".join(f"bs{bs}: {s['images_per_sec']:.1f} img/s" for bs, s in entry["speed"].items())
+        delta = f" | acc delta {entry['accuracy_delta']:+.4f}" if "accuracy_delta" in entry else ""
+        print(f"{backend:<13} -> {out} | max logit diff {entry['max_logit_diff']:.4f}{delta} | {speed}")
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.report}")
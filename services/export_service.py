@@ -0,0 +1,209 @@
+# services/export_service.py
+# Bulk export of results joined with their patients, streamed in chunks. Run from project root:
+#
+#   python -m services.export_service --out results.csv
+#   python -m services.export_service --out results.parquet --from 2026-01-01 --to 2026-02-01
+#   python -m services.export_service --out nightly.csv --state instance/export_state.json
+#
+# With --state only rows newer than the last run's highest result id are written, and
+# the new high-water mark is saved once the file is complete. GET /export/results
+# serves the same stream.
+import io
+import os
+import csv
+import json
+import time
+import argparse
+from datetime import datetime, timezone
+
+from sqlalchemy import select, cast, Integer, Float, DateTime, JSON, Text
+
+from models import db
+from models.patient import Patient
+from models.result import Result
+
+# Rows come off a server-side cursor (yield_per) as plain tuples, chunk_rows at a
+# time - never ORM objects - so memory stays flat however large the table is.
+FORMATS = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+_RESULT_COLUMNS = [c for c in Result.__table__.columns if c.name != "heatmap_cam"]
+_PATIENT_COLUMNS = [c for c in Patient.__table__.columns if c.name != "id"]
+_COLUMNS = _RESULT_COLUMNS + _PATIENT_COLUMNS
+COLUMN_NAMES = [c.name for c in _RESULT_COLUMNS] + [f"patient_{c.name}" for c in _PATIENT_COLUMNS]
+_ID_AT = COLUMN_NAMES.index("id")
+_DATETIME_AT = [i for i, c in enumerate(_COLUMNS) if isinstance(c.type, DateTime)]
+# JSON columns are exported as the stored text: no parse + re-serialize per row
+_SELECTED = [cast(c, Text).label(c.name) if isinstance(c.type, JSON) else c for c in _COLUMNS]
+
+
+def export_query(since_id=None, date_from=None, date_to=None):
+    """results JOIN patients in result id order. since_id and date_to are exclusive."""
+    conditions = []
+    if since_id is not None:
+        conditions.append(Result.id > since_id)
+    if date_from is not None:
+        conditions.append(Result.predicted_at >= date_from)
+    if date_to is not None:
+        conditions.append(Result.predicted_at < date_to)
+    return (select(*_SELECTED)
+            .join_from(Result.__table__, Patient.__table__, Result.patient_id == Patient.id)
+            .where(*conditions)
+            .order_by(Result.id))
+
+
+def parse_utc(value):
+    """ISO-8601 date or datetime as naive UTC (like predicted_at); an offset is converted, not dropped."""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _chunks(stmt, chunk_rows, progress):
+    """Lists of row tuples off a server-side cursor; progress gets rows / last_id."""
+    result = db.session.execute(stmt.execution_options(yield_per=chunk_rows))
+    try:
+        for part in result.partitions():
+            progress["rows"] = progress.get("rows", 0) + len(part)
+            progress["last_id"] = part[-1][_ID_AT]
+            yield part
+    finally:
+        result.close()
+
+
+# ───────────────────────────────────────
+# CSV
+# ───────────────────────────────────────
+def stream_csv(stmt, chunk_rows=10_000, progress=None):
+    """CSV bytes, header first, one block per chunk."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(COLUMN_NAMES)
+    for part in _chunks(stmt, chunk_rows, progress if progress is not None else {}):
+        rows = [list(row) for row in part]
+        for row in rows:
+            for i in _DATETIME_AT:
+                if row[i] is not None:
+                    row[i] = row[i].isoformat() + "Z"   # same format as the JSON API
+        writer.writerows(rows)
+        yield buf.getvalue().encode()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():   # no rows: just the header
+        yield buf.getvalue().encode()
+
+
+# ───────────────────────────────────────
+# PARQUET
+# ───────────────────────────────────────
+def parquet_available():
+    """Parquet needs pyarrow (pandas' own parquet engine), which is optional here."""
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class _Sink(io.RawIOBase):
+    """Write-only stream that hands written bytes out via drain() but keeps counting
+    positions, so the Parquet footer's row-group offsets stay right."""
+
+    def __init__(self):
+        self._parts = []
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._parts.append(bytes(b))
+        self._pos += len(b)
+        return len(b)
+
+    def tell(self):
+        return self._pos
+
+    def drain(self):
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def _arrow_type(column):
+    import pyarrow as pa
+
+    if isinstance(column.type, Integer):
+        return pa.int64()
+    if isinstance(column.type, Float):
+        return pa.float64()
+    if isinstance(column.type, DateTime):
+        return pa.timestamp("us")
+    return pa.string()   # strings, and JSON as its text (class lists differ per model)
+
+
+def stream_parquet(stmt, chunk_rows=50_000, progress=None):
+    """Parquet bytes: one row group per chunk, footer last."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(name, _arrow_type(c)) for name, c in zip(COLUMN_NAMES, _COLUMNS)])
+    sink = _Sink()
+    with pq.ParquetWriter(sink, schema, compression="zstd") as writer:
+        for part in _chunks(stmt, chunk_rows, progress if progress is not None else {}):
+            columns = [pa.array(col, type=field.type) for col, field in zip(zip(*part), schema)]
+            writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def stream(fmt, stmt, chunk_rows, progress=None):
+    return (stream_parquet if fmt == "parquet" else stream_csv)(stmt, chunk_rows, progress)
+
+
+if __name__ == "__main__":
+    import resource
+    from flask import Flask
+    from config import Config
+
+    parser = argparse.ArgumentParser(description="Stream results + patients to CSV or Parquet")
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--format", choices=FORMATS, default=None, help="default: from the --out extension")
+    parser.add_argument("--from", dest="date_from", default=None, help="predicted_at >= (ISO date/datetime, UTC)")
+    parser.add_argument("--to", dest="date_to", default=None, help="predicted_at < (ISO date/datetime, UTC)")
+    parser.add_argument("--since-id", type=int, default=None, help="only results with a larger id")
+    parser.add_argument("--state", default=None, help="JSON file keeping the last exported id between runs")
+    parser.add_argument("--chunk-rows", type=int, default=None)
+    args = parser.parse_args()
+
+    fmt = args.format or ("parquet" if args.out.endswith(".parquet") else "csv")
+    if fmt == "parquet" and not parquet_available():
+        raise SystemExit("Parquet export needs pyarrow: pip install pyarrow")
+    since_id = args.since_id
+    if since_id is None and args.state and os.path.exists(args.state):
+        with open(args.state) as f:
+            since_id = json.load(f).get("last_id")
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    db.init_app(app)
+
+    progress = {"rows": 0, "last_id": since_id}
+    t0 = time.perf_counter()
+    tmp = f"{args.out}.tmp"
+    with app.app_context(), open(tmp, "wb") as f:
+        stmt = export_query(since_id,
+                            parse_utc(args.date_from) if args.date_from else None,
+                            parse_utc(args.date_to) if args.date_to else None)
+        chunk_rows = args.chunk_rows or Config.EXPORT_CHUNK_ROWS
+        for block in stream(fmt, stmt, chunk_rows, progress):
+            f.write(block)
+    os.replace(tmp, args.out)   # a failed run never leaves a half-written file behind
+
+    if args.state:
+        with open(args.state, "w") as f:
+            json.dump({"last_id": progress["last_id"], "exported_at": datetime.utcnow().isoformat() + "Z"}, f)
+    seconds = time.perf_counter() - t0
+    print(f"{progress['rows']} rows -> {args.out} ({fmt}, {os.path.getsize(args.out) / 1e6:.1f} MB) in "
+          f"{seconds:.1f}s ({progress['rows'] / seconds if seconds else 0:,.0f} rows/s), "
+          f"last id {progress['last_id']}, peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MiB")
@@ -0,0 +1,174 @@
+# services/heatmap_service.py
+import struct
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import cv2
+from PIL import Image
+from flask import current_app
+
+# Heatmaps (Grad-CAM or fc-weight CAM) are stored as the raw activation map (7x7 for ResNet18's
+# last block) packed as float16 on the Result row - about 100 bytes instead of a
+# full-resolution JPEG per prediction. /predict/heat/<filename> renders the overlay
+# on request and keeps the encoded JPEG in a bounded LRU. numpy / cv2 only, so the
+# file-serving routes never need torch.
+COLORMAPS = {
+    "jet": cv2.COLORMAP_JET,
+    "turbo": cv2.COLORMAP_TURBO,
+    "inferno": cv2.COLORMAP_INFERNO,
+    "magma": cv2.COLORMAP_MAGMA,
+    "plasma": cv2.COLORMAP_PLASMA,
+    "viridis": cv2.COLORMAP_VIRIDIS,
+    "hot": cv2.COLORMAP_HOT,
+    "bone": cv2.COLORMAP_BONE,
+}
+EXPLAIN_MODES = ("gradcam", "cam", "none")   # see explain_service
+DEFAULT_COLORMAP = "jet"
+DEFAULT_ALPHA = 0.4
+
+_HEADER = struct.Struct("<HH")   # CAM height, width
+
+
+def pack_cam(cam):
+    """
+    (H,W) CAM at conv resolution -> bytes. Negative evidence is dropped (ReLU) and
+    the map scaled to [0,1] first, where float16 keeps ~3 significant digits.
+    """
+    cam = np.maximum(np.asarray(cam, dtype=np.float32), 0)
+    cam = cam / (cam.max() + 1e-8)
+    return _HEADER.pack(*cam.shape) + cam.astype("<f2").tobytes()
+
+
+def unpack_cam(blob):
+    """bytes from pack_cam() -> (H,W) float32 array"""
+    h, w = _HEADER.unpack_from(blob)
+    return np.frombuffer(blob, dtype="<f2", count=h * w, offset=_HEADER.size).reshape(h, w).astype(np.float32)
+
+
+def render_overlay(cam, bgr, size=None, colormap=DEFAULT_COLORMAP, alpha=DEFAULT_ALPHA):
+    """
+    Colorized CAM blended over the image.
+    cam: (H,W) float array; bgr: uint8 image; size: longest side in px (default: bgr's)
+    returns: BGR uint8 array
+    """
+    if size:
+        h, w = bgr.shape[:2]
+        scale = size / max(h, w)
+        if scale != 1:
+            bgr = cv2.resize(bgr, (max(1, round(w * scale)), max(1, round(h * scale))),
+                             interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR)
+    cam = cv2.resize(cam, (bgr.shape[1], bgr.shape[0]))
+    cam = cam - cam.min()
+    cam = cam / (cam.max() + 1e-8)
+    heat = cv2.applyColorMap((cam * 255).astype("uint8"), COLORMAPS[colormap])
+    return cv2.addWeighted(heat, alpha, bgr, 1 - alpha, 0)
+
+
+_REDUCED = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2,
+            4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+
+
+def render_file(blob, image_path, **options):
+    """render_overlay() for a stored CAM over a stored upload. options: size, colormap, alpha"""
+    # small renders of large uploads: let the JPEG decoder scale down by 2/4/8 (DCT scaling)
+    reduce = 1
+    if options.get("size"):
+        with Image.open(image_path) as img:   # header only
+            longest = max(img.size)
+        while reduce < 8 and longest / (reduce * 2) >= options["size"]:
+            reduce *= 2
+    # PIL (which decoded the image for the model) ignores EXIF orientation; match it
+    bgr = cv2.imread(image_path, _REDUCED[reduce] | cv2.IMREAD_IGNORE_ORIENTATION)
+    if bgr is None:
+        raise ValueError(f"Could not read {image_path}")
+    return render_overlay(unpack_cam(blob), bgr, **options)
+
+
+def encode_jpeg(bgr, quality=95):
+    ok, buf = cv2.imencode(".jpg", bgr, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("JPEG encoding failed")
+    return buf.tobytes()
+
+
+def render_options(args, max_size):
+    """
+    size / colormap / alpha from a query string, validated.
+    returns: dict for render_overlay(); raises ValueError with a client-facing message
+    """
+    options = {"size": None, "colormap": args.get("colormap", DEFAULT_COLORMAP).lower(), "alpha": DEFAULT_ALPHA}
+    if options["colormap"] not in COLORMAPS:
+        raise ValueError(f"colormap must be one of {', '.join(COLORMAPS)}")
+    try:
+        if args.get("size"):
+            options["size"] = int(args["size"])
+        if args.get("alpha"):
+            options["alpha"] = round(float(args["alpha"]), 2)
+    except ValueError:
+        raise ValueError("size must be an integer and alpha a number") from None
+    if options["size"] is not None and not 16 <= options["size"] <= max_size:
+        raise ValueError(f"size must be between 16 and {max_size}")
+    if not 0.0 <= options["alpha"] <= 1.0:
+        raise ValueError("alpha must be between 0 and 1")
+    return options
+
+
+# ───────────────────────────────────────
+# RENDERED OVERLAY CACHE
+# ───────────────────────────────────────
+class OverlayCache:
+    """LRU of encoded overlays keyed by (filename, size, colormap, alpha), capped in bytes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return data
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = data
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self._stats["evictions"] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries), bytes=self._bytes)
+
+
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_overlay_cache():
+    """Shared OverlayCache sized by HEATMAP_CACHE_MB."""
+    global _CACHE
+    if _CACHE is None:
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                _CACHE = OverlayCache(int(current_app.config.get("HEATMAP_CACHE_MB", 64) * 1024 * 1024))
+    return _CACHE
+
+
+def overlay_cache_stats():
+    return _CACHE.stats() if _CACHE is not None else {}
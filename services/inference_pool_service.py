@@ -0,0 +1,173 @@
+# services/inference_pool_service.py
+import os
+import time
+import queue
+import threading
+
+import torch
+import torch.multiprocessing as mp
+
+from services.backend_service import INPUT_SHAPE
+
+
+def _worker_main(model, backend, artifact, channels_last, source_digest, threads, inputs, outputs, conn):
+    """
+    Inference process. model: fp32 module whose tensors live in shared memory,
+    inputs / outputs: this worker's shared (max_batch,3,H,W) / (max_batch,classes)
+    buffers. Only batch sizes travel over conn.
+    """
+    from services.backend_service import load_backend
+
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+    module = load_backend(backend, artifact, model, channels_last=channels_last, source_digest=source_digest)
+    conn.send("ready")
+
+    with torch.inference_mode():
+        while True:
+            n = conn.recv()
+            if n is None:
+                break
+            try:
+                outputs[:n].copy_(module(inputs[:n]))
+                conn.send(n)
+            except Exception as e:
+                conn.send(f"error: {e}")
+
+
+class InferencePool:
+    """
+    Fixed set of inference processes sharing one copy of the weights.
+
+    The fp32 model's parameters are moved to shared memory once (share_memory());
+    spawned workers map the same pages instead of loading their own copy. Each
+    worker owns a pair of shared input/output buffers, so a request only copies
+    its tensor into the buffer and sends the batch size down a pipe - no pickling
+    of image data. Callable like a model: (N,3,H,W) tensor in, logits tensor out.
+
+    A worker that dies is taken out of rotation and respawned in the background
+    (same buffers); the request it was serving is retried once on another worker.
+    """
+
+    def __init__(self, model, num_workers, threads_per_worker=0, max_batch=32,
+                 backend="eager", artifact=None, channels_last=False, source_digest=None,
+                 acquire_timeout=30.0):
+        self._ctx = mp.get_context("spawn")
+        self._model = model = model.cpu().eval().share_memory()
+        num_classes = model.fc.out_features
+        threads = threads_per_worker or max(1, (os.cpu_count() or 1) // num_workers)
+
+        self.max_batch = max_batch
+        self.threads_per_worker = threads
+        self.acquire_timeout = acquire_timeout
+        self._spawn_args = (backend, artifact, channels_last, source_digest, threads)
+        self._idle = queue.Queue()
+        self._workers = []
+        self._respawns = 0
+        self._respawning = set()
+        self._lock = threading.Lock()
+        self._closed = False
+        for i in range(num_workers):
+            inputs = torch.zeros(max_batch, *INPUT_SHAPE).share_memory_()
+            outputs = torch.zeros(max_batch, num_classes).share_memory_()
+            self._workers.append(self._start(i, inputs, outputs))
+
+        # wait until every worker has built its module, so the first request is not a cold one
+        for i, (proc, conn, _, _) in enumerate(self._workers):
+            if conn.recv() != "ready":
+                raise RuntimeError(f"inference worker {i} failed to start")
+            self._idle.put(i)
+
+    def _start(self, i, inputs, outputs):
+        parent, child = self._ctx.Pipe()
+        proc = self._ctx.Process(target=_worker_main, name=f"inference-{i}", daemon=True,
+                                 args=(self._model, *self._spawn_args, inputs, outputs, child))
+        proc.start()
+        child.close()   # so a dead worker shows up as EOFError here
+        return proc, parent, inputs, outputs
+
+    def __call__(self, x):
+        chunks = [self._run(chunk) for chunk in torch.split(x, self.max_batch)]
+        return chunks[0] if len(chunks) == 1 else torch.cat(chunks)
+
+    def _run(self, x, retry=True):
+        n = x.shape[0]
+        try:
+            i = self._idle.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            raise RuntimeError("no inference worker available") from None
+        proc, conn, inputs, outputs = self._workers[i]
+        try:
+            inputs[:n].copy_(x)
+            conn.send(n)
+            reply = conn.recv()
+        except (EOFError, OSError):
+            # out of rotation until a replacement is up; this request goes to another worker
+            self._respawn(i)
+            if retry:
+                return self._run(x, retry=False)
+            raise RuntimeError(f"inference worker {i} (pid {proc.pid}) died") from None
+        self._idle.put(i)
+        if reply != n:
+            raise RuntimeError(f"inference worker {i} failed: {reply}")
+        return outputs[:n].clone()
+
+    def _respawn(self, i):
+        """Replace dead worker i on a background thread; its slot is back in _idle once ready."""
+        with self._lock:
+            if self._closed or i in self._respawning:
+                return
+            self._respawning.add(i)
+
+        def run():
+            delay = 1.0
+            while not self._closed:
+                old, conn, inputs, outputs = self._workers[i]
+                conn.close()
+                old.join(0)
+                try:
+                    worker = self._start(i, inputs, outputs)
+                    if worker[1].recv() != "ready":
+                        raise RuntimeError("did not start")
+                except Exception:
+                    time.sleep(delay)
+                    delay = min(delay * 2, 30.0)
+                    continue
+                with self._lock:
+                    if self._closed:
+                        worker[1].send(None)
+                        return
+                    self._workers[i] = worker
+                    self._respawns += 1
+                    self._respawning.discard(i)
+                self._idle.put(i)
+                return
+
+        threading.Thread(target=run, name=f"inference-respawn-{i}", daemon=True).start()
+
+    def eval(self):
+        return self
+
+    def stats(self):
+        return {
+            "workers": len(self._workers),
+            "alive": sum(p.is_alive() for p, _, _, _ in self._workers),
+            "idle": self._idle.qsize(),
+            "respawning": len(self._respawning),
+            "respawns": self._respawns,
+            "threads_per_worker": self.threads_per_worker,
+            "max_batch": self.max_batch,
+        }
+
+    def close(self, timeout=2.0):
+        with self._lock:
+            self._closed = True
+        for proc, conn, _, _ in self._workers:
+            try:
+                conn.send(None)
+            except (OSError, BrokenPipeError):
+                pass
+        for proc, _, _, _ in self._workers:
+            proc.join(timeout)
+            if proc.is_alive():
+                proc.terminate()
@@ -0,0 +1,192 @@
+# services/job_service.py
+import os
+import socket
+import time
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import update, or_, and_
+
+from models import db
+from models.job import Job
+from models.result import Result
+from services.cache_service import get_cache
+
+# Jobs live in the application database (the "jobs" table), so the queue needs no
+# external broker and survives restarts. Every app process starts a fixed pool of
+# worker threads (create_flask_app) that claim queued rows one at a time; enqueue()
+# only wakes them up. A claim is a lease: the owning process renews heartbeat_at
+# while it lives, and a running job whose lease ran out (its process died) is
+# claimed again by any worker - jobs of live processes are never touched.
+_WORKERS = []
+_WAKE = threading.Event()
+_START_LOCK = threading.Lock()
+
+
+def enqueue(result_id, payload):
+    """
+    Persist a queued job for result_id and wake the workers.
+    payload: JSON-serializable dict consumed by _run_job
+    returns: the new Job
+    """
+    job = Job(id=uuid.uuid4().hex, result_id=result_id, status="queued", payload=payload)
+    db.session.add(job)
+    db.session.commit()
+    _WAKE.set()
+    return job
+
+
+def pending_count():
+    return Job.query.filter(Job.status.in_(("queued", "running"))).count()
+
+
+def start_workers(app):
+    """
+    Start JOB_WORKERS background threads and the lease heartbeat, once per process
+    (no-op afterwards). Called at app init, so queued jobs resume after a restart.
+    """
+    n = int(app.config.get("JOB_WORKERS", 2))
+    if _WORKERS or n <= 0:
+        return
+    with _START_LOCK:
+        if _WORKERS:
+            return
+        for i in range(n):
+            t = threading.Thread(target=_worker_loop, args=(app,), name=f"job-worker-{i}", daemon=True)
+            t.start()
+            _WORKERS.append(t)
+        t = threading.Thread(target=_heartbeat_loop, args=(app,), name="job-heartbeat", daemon=True)
+        t.start()
+        _WORKERS.append(t)
+        app.logger.info("Started %d background job workers as %s", n, _owner())
+        _WAKE.set()
+
+
+def _owner():
+    """Lease owner id of this process (computed per call: forked workers get their own pid)."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _claimable(now):
+    """Queued, or running under a lease nobody renewed within JOB_LEASE_SECONDS."""
+    expired = now - timedelta(seconds=current_app.config.get("JOB_LEASE_SECONDS", 60))
+    return or_(Job.status == "queued",
+               and_(Job.status == "running", or_(Job.heartbeat_at.is_(None), Job.heartbeat_at < expired)))
+
+
+def _heartbeat_loop(app):
+    """Renew the lease of every job this process is running."""
+    interval = max(1.0, float(app.config.get("JOB_LEASE_SECONDS", 60)) / 4)
+    while True:
+        with app.app_context():
+            try:
+                db.session.execute(update(Job).where(Job.status == "running", Job.claimed_by == _owner())
+                                   .values(heartbeat_at=datetime.utcnow()))
+                db.session.commit()
+            except Exception:
+                app.logger.exception("Job lease renewal failed")
+                db.session.rollback()
+            finally:
+                db.session.remove()
+        time.sleep(interval)
+
+
+def _claim_next():
+    """
+    Atomically take the oldest claimable job (compare-and-set on the same condition,
+    so two processes never both win it). Returns the Job or None.
+    """
+    now = datetime.utcnow()
+    candidates = (Job.query.filter(_claimable(now))
+                  .order_by(Job.created_at).with_entities(Job.id).limit(5).all())
+    for (job_id,) in candidates:
+        claimed = db.session.execute(
+            update(Job).where(Job.id == job_id, _claimable(now))
+            .values(status="running", started_at=now, claimed_by=_owner(), heartbeat_at=now)
+        ).rowcount
+        db.session.commit()
+        if claimed:
+            return db.session.get(Job, job_id)
+    return None
+
+
+def _worker_loop(app):
+    poll = float(app.config.get("JOB_POLL_INTERVAL", 2.0))
+    while True:
+        with app.app_context():
+            try:
+                job = _claim_next()
+            except Exception:
+                app.logger.exception("Job queue poll failed")
+                db.session.rollback()
+                job = None
+
+            if job is None:
+                db.session.remove()
+                _WAKE.wait(poll)
+                _WAKE.clear()
+                continue
+
+            try:
+                _run_job(job)
+                job.status = "done"
+            except Exception as e:
+                db.session.rollback()
+                app.logger.exception("Job %s failed", job.id)
+                job = db.session.get(Job, job.id)
+                job.status = "failed"
+                job.error = str(e)
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+            db.session.remove()
+
+
+def _run_job(job):
+    """Render the heatmap and PDF report for a Result and record their filenames."""
+    import base64
+    from services.explain_service import make_heatmap
+    from services.heatmap_service import render_overlay, unpack_cam
+    from services.report_service import generate_report
+    from utils.preprocess import DecodedImage, to_report_jpeg, REPORT_MAX_SIDE
+
+    p = job.payload
+    result = db.session.get(Result, job.result_id)
+
+    image = DecodedImage.from_path(p["img_path"])
+    cam = None
+    if p.get("explain", True):
+        try:
+            # stored as a CAM; the heat route renders the overlay when it is fetched
+            cam = make_heatmap(image, p.get("index", 0), p.get("explain_mode", "gradcam"), p.get("model_version"))
+            result.heatmap_cam = cam
+            result.heatmap_path = f"{p['uniq']}_heat.jpg"
+        except Exception as e:
+            current_app.logger.warning(f"Grad-CAM failed for job {job.id}: {e}")
+
+    if current_app.config.get("LAZY_REPORTS", False):
+        # rendered by the report route on first download
+        result.report_path = f"report_{p['uniq']}.pdf"
+    else:
+        returned_path = generate_report(
+            uniq=p["uniq"],
+            img_path=p["img_path"],
+            heat_path=None,
+            label=p["label"],
+            probabilities=p["probabilities"],
+            patient_data=p.get("patient_data"),
+            img_data=image.report_jpeg(),
+            heat_data=to_report_jpeg(render_overlay(unpack_cam(cam), image.bgr, size=REPORT_MAX_SIDE))
+                      if cam is not None else None
+        )
+        result.report_path = os.path.basename(returned_path) if returned_path else None
+    current_app.logger.info(f"Job {job.id}: artifacts ready for result {result.id}")
+
+    # let later identical uploads reuse the finished artifacts
+    cache = get_cache()
+    if cache is not None and p.get("cache_key"):
+        cache.put(p["cache_key"], {"res": p["res"], "heatmap": result.heatmap_path,
+                                   "cam": base64.b64encode(cam).decode() if cam is not None else None,
+                                   "explain_mode": p.get("explain_mode", "gradcam"),
+                                   "report": result.report_path, "report_for": p.get("report_for")})
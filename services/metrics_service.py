@@ -0,0 +1,179 @@
+# services/metrics_service.py
+import os
+import sys
+import time
+import random
+import threading
+import cProfile
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# In-process metrics in Prometheus text exposition format (no client library needed).
+# Histograms/counters are per process; run one scrape target per worker process.
+# An observation is a bisect plus a few additions under a lock, so spans can stay
+# on in production; profiling is separate and off unless asked for.
+_LOCK = threading.Lock()
+_METRICS = []
+
+# seconds; resolves sub-millisecond cache hits up to multi-second PDF renders
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name, self.help, self.labelnames = name, help_text, tuple(labelnames)
+        self._values = {}
+        _METRICS.append(self)
+
+    def inc(self, amount=1.0, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with _LOCK:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with _LOCK:
+            items = list(self._values.items())
+        lines += [f"{self.name}{_labels(self.labelnames, key)} {value}" for key, value in items]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help_text, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}   # label values -> [per-bucket counts (+Inf last), sum, count]
+        _METRICS.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        i = bisect_left(self.buckets, value)
+        with _LOCK:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with _LOCK:
+            items = [(key, (list(s[0]), s[1], s[2])) for key, s in self._series.items()]
+        for key, (counts, total, n) in items:
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames + ('le',), key + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {n}")
+        return lines
+
+
+STAGE_SECONDS = Histogram("alz_stage_duration_seconds",
+                          "Time spent in one stage of request handling.", ("stage",))
+REQUEST_SECONDS = Histogram("alz_http_request_duration_seconds",
+                            "HTTP request latency.", ("method", "endpoint", "status"))
+REQUESTS = Counter("alz_http_requests_total", "HTTP requests served.", ("method", "endpoint", "status"))
+PREDICTIONS = Counter("alz_predictions_total", "Predictions by label and source.", ("label", "source"))
+
+
+@contextmanager
+def span(stage):
+    """Time the enclosed block into alz_stage_duration_seconds{stage=...}."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=stage)
+
+
+def _collected():
+    """
+    Point-in-time values read from the other services at scrape time. Only services
+    this process already imported are asked, so a scrape never pulls in torch.
+    returns: [(name, type, help, [(labels dict, value)])]
+    """
+    model_service = sys.modules.get("services.model_service")
+    cache_service = sys.modules.get("services.cache_service")
+    write_buffer_service = sys.modules.get("services.write_buffer_service")
+
+    metrics = []
+    batching = model_service.batching_stats() if model_service else {}
+    if batching:
+        metrics.append(("alz_batch_queue_depth", "gauge", "Requests waiting for the micro-batcher.",
+                        [({}, batching["queue_depth"])]))
+    pool = model_service.pool_stats() if model_service else {}
+    if pool:
+        metrics.append(("alz_pool_workers", "gauge", "Inference pool processes by state.",
+                        [({"state": "alive"}, pool["alive"]), ({"state": "idle"}, pool["idle"])]))
+    cache = cache_service.cache_stats() if cache_service else {}
+    if cache:
+        metrics.append(("alz_prediction_cache_entries", "gauge", "Entries in the in-memory cache tier.",
+                        [({}, cache["memory_entries"])]))
+        metrics.append(("alz_prediction_cache_lookups_total", "counter", "Prediction cache lookups by outcome.",
+                        [({"result": k}, cache[k]) for k in ("memory_hits", "disk_hits", "misses")]))
+    if write_buffer_service and write_buffer_service._WRITER is not None:
+        metrics.append(("alz_write_behind_pending", "gauge", "Rows waiting for the write-behind buffer.",
+                        [({}, write_buffer_service._WRITER.stats()["pending"])]))
+    return metrics
+
+
+def render():
+    """The whole registry as Prometheus text exposition (format 0.0.4)."""
+    lines = []
+    for metric in _METRICS:
+        lines += metric.render()
+    try:
+        collected = _collected()
+    except Exception:
+        collected = []   # a service that is not initialised must not break the scrape
+    for name, kind, help_text, samples in collected:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        lines += [f"{name}{_labels(tuple(labels), tuple(labels.values()))} {value}" for labels, value in samples]
+    return "\n".join(lines) + "\n"
+
+
+# ───────────────────────────────────────
+# REQUEST PROFILING
+# ───────────────────────────────────────
+def should_profile(config, args, headers):
+    """
+    ?profile=1 with X-Profile-Token equal to PROFILE_TOKEN, or a PROFILE_SAMPLE_RATE
+    fraction of all requests. Both are off by default (no token, rate 0).
+    """
+    token = config.get("PROFILE_TOKEN", "")
+    if token and args.get("profile") == "1" and headers.get("X-Profile-Token") == token:
+        return True
+    rate = config.get("PROFILE_SAMPLE_RATE", 0.0)
+    return rate > 0 and random.random() < rate
+
+
+def start_profile():
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def finish_profile(profiler, profile_dir, name):
+    """
+    Stop profiler and dump pstats to profile_dir (open with snakeviz or pstats).
+    Only the request thread is profiled; micro-batcher / pool / job work is not.
+    returns: the file name written
+    """
+    profiler.disable()
+    os.makedirs(profile_dir, exist_ok=True)
+    filename = f"{time.strftime('%Y%m%d-%H%M%S')}_{name}_{os.getpid()}_{threading.get_ident()}.prof"
+    profiler.dump_stats(os.path.join(profile_dir, filename))
+    return filename
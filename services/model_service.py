@@ -1,14 +1,31 @@
 # services/model_service.py
 import os
+import time
+import uuid
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import torch
 import torch.nn as nn
 from torchvision import models
 from flask import current_app
 
-# singleton holder
-_MODEL = None
+from services import registry_service
+from services.registry_service import DEFAULT_CLASS_NAMES
+
+# The serving model is one immutable ServingModel object. Requests take a reference
+# at the start and keep using it, so a hot swap (a single assignment to _ACTIVE)
+# never blocks or disturbs work in flight; the old object is closed after a grace period.
+_ACTIVE = None
+_CANDIDATE = None          # (ServingModel, mode, share) for canary / shadow, or None
+_LOAD_LOCK = threading.RLock()
+_WATCHER = None
+_SHADOW = {"runs": 0, "agree": 0, "dropped": 0, "errors": 0}
+_SHADOW_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+_SHADOW_SLOTS = threading.BoundedSemaphore(4)
 _DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-CLASS_NAMES = ["Normal", "MCI", "Alzheimer"]
+CLASS_NAMES = DEFAULT_CLASS_NAMES
+RETIRE_GRACE_SECONDS = 30
 
 def _build_default_model(num_classes=len(CLASS_NAMES), use_pretrained=False):
     # use_pretrained=False to avoid automatic weight downloads during setup
@@ -17,57 +34,390 @@ def _build_default_model(num_classes=len(CLASS_NAMES), use_pretrained=False):
     model.fc = nn.Linear(in_f, num_classes)
     return model
 
-def load_model():
+def load_weights(model_path):
     """
-    Load model once (singleton). If a model file exists at MODEL_PATH it will try to load it.
-    Otherwise it returns a default ResNet18 head (untrained if use_pretrained=False).
+    Build the fp32 eager model from a weights file (no Flask app needed).
+    Accepts a registry bundle, { 'model_state_dict': ... }, a direct state_dict or a full saved module.
+    returns: (model, metadata { class_names, preprocessing })
     """
-    global _MODEL
-    if _MODEL is not None:
-        return _MODEL
+    weights, meta = registry_service.read_bundle(model_path)
+    if isinstance(weights, nn.Module):
+        # maybe a full scripted module was saved
+        return weights.to(_DEVICE).eval(), meta
+
+    model = _build_default_model(len(meta["class_names"]))
+    # assign=True keeps the memory-mapped tensors instead of copying into fresh ones
+    model.load_state_dict(weights, assign=_DEVICE.type == "cpu")
+    return model.to(_DEVICE).eval(), meta
+
+def build_model(model_path):
+    """Just the fp32 model from load_weights()."""
+    return load_weights(model_path)[0]
+
+
+class ServingModel:
+    """
+    One loaded model version: the fp32 model (Grad-CAM), the inference module for
+    INFERENCE_BACKEND, its class list, and its micro-batcher when batching is on.
+    """
+
+    def __init__(self, version, model, class_names, source):
+        self.version = version
+        self.model = model
+        self.class_names = list(class_names)
+        self.source = source
+        self.infer = model
+        self.batcher = None
+        self.loaded_at = time.time()
+        self._batcher_lock = threading.Lock()
+
+    def postprocess(self, logits):
+        """
+        logits: torch.Tensor shaped (num_classes,) for a single image
+        returns: dict { label, index, probabilities, classes, model_version }
+        """
+        probs = torch.softmax(logits, dim=0).cpu().tolist()
+        idx = int(torch.tensor(probs).argmax().item())
+        return {"label": self.class_names[idx], "index": idx, "probabilities": probs,
+                "classes": self.class_names, "model_version": self.version}
+
+    def get_batcher(self):
+        """This version's MicroBatcher (created on first use), or None when INFERENCE_BATCHING is off."""
+        if self.batcher is not None or not current_app.config.get("INFERENCE_BATCHING", False):
+            return self.batcher
+
+        from services.batching_service import MicroBatcher
+
+        cfg = current_app.config
+        with self._batcher_lock:
+            if self.batcher is None:
+                self.batcher = MicroBatcher(
+                    self.infer, _DEVICE, self.postprocess,
+                    max_batch_size=cfg.get("BATCH_MAX_SIZE", 8),
+                    max_wait_ms=cfg.get("BATCH_MAX_WAIT_MS", 10),
+                    max_queue=cfg.get("BATCH_MAX_QUEUE", 256),
+                )
+                current_app.logger.info("Micro-batching enabled for %s (max_batch=%s, max_wait_ms=%s)",
+                                        self.version, self.batcher.max_batch_size, self.batcher.max_wait * 1000.0)
+        return self.batcher
+
+    def predict(self, image_tensor):
+        batcher = self.get_batcher()
+        if batcher is not None:
+            return batcher.predict(image_tensor)
+        with torch.no_grad():
+            out = self.infer(image_tensor.to(_DEVICE))
+        return self.postprocess(out[0])
+
+    def predict_batch(self, images_tensor, chunk_size=32):
+        results = []
+        with torch.no_grad():
+            for chunk in torch.split(images_tensor, max(1, int(chunk_size))):
+                out = self.infer(chunk.to(_DEVICE)).cpu()
+                results.extend(self.postprocess(row) for row in out)
+        return results
+
+    def close(self):
+        if self.batcher is not None:
+            self.batcher.close()
+        if hasattr(self.infer, "close"):
+            self.infer.close()
 
-    model_path = current_app.config.get("MODEL_PATH", "model/alzheimer_model.pth")
-    if os.path.exists(model_path):
-        try:
-            # try loading state_dict into default architecture
-            model = _build_default_model()
-            state = torch.load(model_path, map_location=_DEVICE)
-
-            if isinstance(state, dict):
-                # common saved formats: direct state_dict or { 'model_state_dict': ... }
-                if "model_state_dict" in state:
-                    model.load_state_dict(state["model_state_dict"])
-                else:
-                    model.load_state_dict(state)
-            else:
-                # maybe a full scripted module was saved
-                model = state
 
-            current_app.logger.info("Loaded trained model from %s", model_path)
+def _targets(cfg):
+    """
+    What should be serving: (active, candidate) where each is (version, path) or None.
+    The registry wins when it names an active model; otherwise MODEL_PATH.
+    """
+    registry_dir = cfg.get("MODEL_REGISTRY_DIR", "model/registry")
+    index = registry_service.read(registry_dir)
+    if index.get("active"):
+        active = (index["active"], registry_service.bundle_path(registry_dir, index["active"]))
+    else:
+        active = (None, cfg.get("MODEL_PATH", "model/alzheimer_model.pth"))
+    cand = index.get("candidate")
+    if cand and cand.get("version") and cand["version"] != index.get("active"):
+        return active, ((cand["version"], registry_service.bundle_path(registry_dir, cand["version"])),
+                        cand.get("mode", "canary"), float(cand.get("share", 0.0)))
+    return active, None
+
+def _load_serving(cfg, version, path, fallback=False):
+    """
+    Load, build the inference backend and warm up one model version (no globals touched).
+    fallback: use the untrained default model when MODEL_PATH is missing or unreadable -
+    only for the first load; a reload raises instead and the current model keeps serving.
+    """
+    from services import backend_service
+
+    backend = cfg.get("INFERENCE_BACKEND", "eager")
+    model = digest = None
+    if os.path.exists(path):
+        try:
+            digest = registry_service.file_digest(path)
+            model, meta = load_weights(path)
+            registry_service.check_preprocessing(meta["preprocessing"])
+            version = version or digest[:12]
+            current_app.logger.info("Loaded model %s from %s", version, path)
         except Exception as e:
+            # a registry version, or a replaced (maybe half-copied) file, must not be swapped in
+            if version is not None or not fallback:
+                raise
             current_app.logger.exception("Failed to load model file, falling back to default model: %s", e)
-            model = _build_default_model()
+            model = None
+    elif version is not None or not fallback:
+        raise FileNotFoundError(f"No model file at {path}")
     else:
-        current_app.logger.info("No model file at %s, using default ResNet18 (untrained).", model_path)
-        model = _build_default_model()
+        current_app.logger.info("No model file at %s, using default ResNet18 (untrained).", path)
+    if model is None:
+        model, meta = _build_default_model().to(_DEVICE).eval(), {"class_names": CLASS_NAMES}
+        # random weights differ on every start, so they get a per-process tag
+        version = digest = f"untrained-{uuid.uuid4().hex[:8]}"
 
-    model = model.to(_DEVICE)
-    model.eval()
-    _MODEL = model
-    return _MODEL
+    serving = ServingModel(f"{version}/{backend}", model, meta["class_names"], path)
 
-def predict(image_tensor):
+    channels_last = cfg.get("CHANNELS_LAST", False)
+    explicit = cfg.get("OPTIMIZED_MODEL_PATH") if path == cfg.get("MODEL_PATH") else None
+    artifact = explicit or backend_service.default_artifact_path(path, backend)
+    # the artifact sits at a fixed path: only use it if it was exported from these exact weights
+
+    processes = cfg.get("INFERENCE_PROCESSES", 0)
+    if processes and _DEVICE.type == "cpu":
+        from services.inference_pool_service import InferencePool
+
+        try:
+            serving.infer = InferencePool(model, processes,
+                                          threads_per_worker=cfg.get("INFERENCE_PROCESS_THREADS", 0),
+                                          max_batch=cfg.get("INFERENCE_PROCESS_MAX_BATCH", 32),
+                                          backend=backend, artifact=artifact, channels_last=channels_last,
+                                          source_digest=digest)
+            current_app.logger.info("Inference pool: %d processes x %d threads, backend %s",
+                                    processes, serving.infer.threads_per_worker, backend)
+        except Exception as e:
+            current_app.logger.exception("Failed to start inference pool, predicting in-process: %s", e)
+    if serving.infer is model:
+        try:
+            serving.infer = backend_service.load_backend(backend, artifact, model, channels_last=channels_last,
+                                                         source_digest=digest)
+            current_app.logger.info("Inference backend: %s (channels_last=%s)", backend, channels_last)
+        except Exception as e:
+            current_app.logger.exception("Failed to load %s backend, falling back to eager fp32: %s", backend, e)
+
+    # first forwards pay for allocator growth and kernel selection; do it before taking traffic
+    x = torch.zeros(1, 3, 224, 224)
+    for _ in range(int(cfg.get("WARMUP_ITERATIONS", 3))):
+        serving.predict(x)
+    return serving
+
+def _retire(serving):
+    """Close a replaced model once requests that already hold it have finished."""
+    if serving is None:
+        return
+    timer = threading.Timer(RETIRE_GRACE_SECONDS, serving.close)
+    timer.daemon = True
+    timer.start()
+
+def current():
+    """The ServingModel answering requests right now (loaded on first use)."""
+    if _ACTIVE is None:
+        # warm-up and the first requests can race here; only one of them loads (and
+        # starts an inference pool), the rest wait and use its model
+        with _LOAD_LOCK:
+            if _ACTIVE is None:
+                reload()
+                from services import warmup_service
+
+                warmup_service.mark_loaded(_ACTIVE.version, current_app.config.get("INFERENCE_BACKEND", "eager"),
+                                           str(_DEVICE))
+                # hot reload from here on, whether this was the eager warm-up or a request
+                start_watcher(current_app._get_current_object())
+    return _ACTIVE
+
+def reload():
     """
-    image_tensor: torch.Tensor shaped (1,3,H,W)
-    returns: dict { label, index, probabilities }
+    Bring the serving models in line with the registry / MODEL_PATH. New versions are
+    loaded and warmed up on the calling thread while the old ones keep serving, then
+    swapped in atomically. returns: True if anything changed.
     """
-    model = load_model()
-    image_tensor = image_tensor.to(_DEVICE)
+    global _ACTIVE, _CANDIDATE
+    cfg = current_app.config
+    with _LOAD_LOCK:
+        (version, path), cand = _targets(cfg)
+        changed = False
 
-    with torch.no_grad():
-        out = model(image_tensor)
-        probs = torch.softmax(out, dim=1)[0].cpu().tolist()
-        idx = int(torch.tensor(probs).argmax().item())
-        label = CLASS_NAMES[idx]
+        def same(serving, version, path):
+            if serving is None or serving.source != path:
+                return False
+            return version is None or serving.version.split("/")[0] == version
+
+        if not same(_ACTIVE, version, path) or (version is None and _stale(_ACTIVE)):
+            if _CANDIDATE is not None and same(_CANDIDATE[0], version, path):
+                # promoting the candidate: it is already loaded and warm
+                new, _CANDIDATE = _CANDIDATE[0], None
+            else:
+                new = _load_serving(cfg, version, path, fallback=_ACTIVE is None)
+            old, _ACTIVE = _ACTIVE, new
+            _retire(old)
+            current_app.logger.info("Serving model %s", _ACTIVE.version)
+            changed = True
+
+        if cand is None:
+            if _CANDIDATE is not None:
+                _retire(_CANDIDATE[0])
+                _CANDIDATE = None
+                changed = True
+        else:
+            (cv, cpath), mode, share = cand
+            if _CANDIDATE is None or not same(_CANDIDATE[0], cv, cpath):
+                old = _CANDIDATE[0] if _CANDIDATE else None
+                _CANDIDATE = (_load_serving(cfg, cv, cpath), mode, share)
+                _retire(old)
+                changed = True
+            elif _CANDIDATE[1:] != (mode, share):
+                _CANDIDATE = (_CANDIDATE[0], mode, share)
+                changed = True
+            if changed:
+                current_app.logger.info("Candidate model %s: %s on %.0f%% of requests",
+                                        _CANDIDATE[0].version, mode, share * 100)
+        return changed
+
+def _stale(serving):
+    """A MODEL_PATH model whose file has been replaced since it was loaded."""
+    try:
+        return os.path.getmtime(serving.source) > serving.loaded_at
+    except OSError:
+        return False
+
+def start_watcher(app):
+    """Poll the registry / MODEL_PATH every MODEL_RELOAD_INTERVAL seconds and hot-swap (once per process)."""
+    global _WATCHER
+    interval = float(app.config.get("MODEL_RELOAD_INTERVAL", 10))
+    if _WATCHER is not None or interval <= 0:
+        return
+
+    def loop():
+        registry_dir = app.config.get("MODEL_REGISTRY_DIR", "model/registry")
+        seen = registry_service.signature(registry_dir)
+        while True:
+            time.sleep(interval)
+            sig = registry_service.signature(registry_dir)
+            if sig == seen and not (_ACTIVE is not None and _stale(_ACTIVE)):
+                continue
+            with app.app_context():
+                try:
+                    reload()
+                    seen = sig
+                except Exception:
+                    # keep serving the current model; retried on the next change
+                    app.logger.exception("Model reload failed")
+                    seen = sig
+
+    _WATCHER = threading.Thread(target=loop, name="model-watcher", daemon=True)
+    _WATCHER.start()
+
+def route():
+    """
+    Pick the model for one request. returns: (serving, shadow) where shadow is a
+    candidate to run in the background for comparison, or None.
+    """
+    active, cand = current(), _CANDIDATE
+    if cand is not None and random.random() < cand[2]:
+        if cand[1] == "canary":
+            return cand[0], None
+        return active, cand[0]
+    return active, None
+
+def serving_for(version):
+    """The loaded ServingModel (active or candidate) whose version is version, or None."""
+    active, cand = current(), _CANDIDATE
+    for serving in (active, cand[0] if cand else None):
+        if serving is not None and serving.version == version:
+            return serving
+    return None
+
+def shadow_compare(shadow, image_tensor, res):
+    """Run the shadow model off the request path and count label agreement."""
+    if shadow is None:
+        return
+    if not _SHADOW_SLOTS.acquire(blocking=False):
+        _SHADOW["dropped"] += 1
+        return
+
+    def run():
+        try:
+            with torch.no_grad():
+                out = shadow.infer(image_tensor.to(_DEVICE))
+            _SHADOW["runs"] += 1
+            _SHADOW["agree"] += int(int(out[0].argmax()) == res["index"])
+        except Exception:
+            _SHADOW["errors"] += 1
+        finally:
+            _SHADOW_SLOTS.release()
+
+    _SHADOW_EXECUTOR.submit(run)
+
+def models_status():
+    """Active / candidate versions and shadow agreement, for /health/models."""
+    active, cand = _ACTIVE, _CANDIDATE
+    runs = _SHADOW["runs"]
+    return {
+        "active": {"version": active.version, "classes": active.class_names, "source": active.source} if active else None,
+        "candidate": {"version": cand[0].version, "mode": cand[1], "share": cand[2]} if cand else None,
+        "shadow": dict(_SHADOW, agreement=_SHADOW["agree"] / runs if runs else None),
+    }
 
-    return {"label": label, "index": idx, "probabilities": probs}
+# ───────────────────────────────────────
+# MODULE-LEVEL API (active model)
+# ───────────────────────────────────────
+def model_version():
+    """
+    Identifies the weights + inference backend producing predictions, e.g.
+    "3fa2c9d1e0b7/eager". Untrained fallback models get a per-process tag.
+    """
+    return current().version
+
+def load_model():
+    """fp32 eager model of the active version (what Grad-CAM runs on)."""
+    return current().model
+
+def load_inference_model():
+    """
+    Model used for plain predictions, per INFERENCE_BACKEND (see services/backend_service.py).
+    With INFERENCE_PROCESSES > 0 this is an InferencePool running that backend in worker processes.
+    """
+    return current().infer
+
+def _postprocess(logits):
+    return current().postprocess(logits)
+
+def get_batcher():
+    """The active model's MicroBatcher, or None when INFERENCE_BATCHING is disabled."""
+    return current().get_batcher()
+
+def batching_stats():
+    """Queue depth and batch-size histogram of the active batcher (empty if disabled)."""
+    batcher = _ACTIVE.batcher if _ACTIVE is not None else None
+    return batcher.stats() if batcher is not None else {}
+
+def pool_stats():
+    """Worker liveness of the inference process pool (empty if disabled)."""
+    infer = _ACTIVE.infer if _ACTIVE is not None else None
+    return infer.stats() if hasattr(infer, "stats") else {}
+
+def predict_batch(images_tensor, chunk_size=32):
+    """
+    images_tensor: torch.Tensor shaped (N,3,H,W)
+    Runs the model over the batch in chunks of chunk_size images.
+    returns: list of N dicts { label, index, probabilities, classes, model_version }
+    """
+    serving, _ = route()
+    return serving.predict_batch(images_tensor, chunk_size)
+
+def predict(image_tensor):
+    """
+    image_tensor: torch.Tensor shaped (1,3,H,W)
+    returns: dict { label, index, probabilities, classes, model_version }
+    """
+    serving, shadow = route()
+    res = serving.predict(image_tensor)
+    shadow_compare(shadow, image_tensor, res)
+    return res
@@ -0,0 +1,237 @@
+# services/registry_service.py
+# Model registry: every version is a self-describing bundle (weights + class list +
+# preprocessing metadata) in MODEL_REGISTRY_DIR, and registry.json says which one
+# serves traffic and which one runs as canary / shadow. Serving processes poll the
+# file (MODEL_RELOAD_INTERVAL) and hot-swap, so the whole fleet follows one edit.
+#
+# Run from project root:
+#   python -m services.registry_service register ../ml/alzheimer_model.pth --activate
+#   python -m services.registry_service list
+#   python -m services.registry_service activate 3fa2c9d1e0b7
+#   python -m services.registry_service canary 9b1e0c44aa21 --share 0.1 [--shadow]
+#   python -m services.registry_service clear-candidate
+import os
+import json
+import uuid
+import hashlib
+import argparse
+from datetime import datetime
+
+# torch is imported inside the functions that load/save weights, so the routes can
+# import DEFAULT_CLASS_NAMES without pulling in the ML stack.
+
+# Class order of weights saved before bundles carried their own class list
+DEFAULT_CLASS_NAMES = ["Normal", "MildDemented", "ModerateDemented", "VeryMildDemented"]
+
+# What utils.preprocess feeds the model; bundles trained on anything else are refused
+PREPROCESSING = {
+    "input_size": 224,
+    "resize": "bilinear",
+    "mean": [0.485, 0.456, 0.406],
+    "std": [0.229, 0.224, 0.225],
+}
+
+INDEX_FILE = "registry.json"
+CANDIDATE_MODES = ("canary", "shadow")
+
+
+def make_bundle(state_dict, class_names, preprocessing=None, arch="resnet18"):
+    """The dict saved with torch.save: weights plus what is needed to serve them."""
+    return {
+        "arch": arch,
+        "model_state_dict": state_dict,
+        "class_names": list(class_names),
+        "preprocessing": dict(preprocessing or PREPROCESSING),
+    }
+
+
+def read_bundle(path):
+    """
+    Load a weights file (bundle, {'model_state_dict': ...} or bare state_dict).
+    returns: (state_dict, metadata) where metadata has class_names and preprocessing;
+             older files get DEFAULT_CLASS_NAMES / PREPROCESSING.
+    """
+    import torch
+
+    try:
+        # memory-mapped: every process loading this file shares the page cache
+        state = torch.load(path, map_location="cpu", mmap=True)
+    except RuntimeError:
+        # legacy (non-zip) torch.save format cannot be mapped
+        state = torch.load(path, map_location="cpu")
+
+    if not isinstance(state, dict):
+        # a full pickled module; serve it as-is
+        return state, {"class_names": DEFAULT_CLASS_NAMES, "preprocessing": PREPROCESSING}
+
+    weights = state.get("model_state_dict", state)
+    meta = {
+        "class_names": state.get("class_names") or DEFAULT_CLASS_NAMES,
+        "preprocessing": state.get("preprocessing") or PREPROCESSING,
+    }
+    fc = weights.get("fc.weight") if hasattr(weights, "get") else None
+    if fc is not None and fc.shape[0] != len(meta["class_names"]):
+        raise ValueError(f"{path}: fc has {fc.shape[0]} outputs but {len(meta['class_names'])} class names")
+    return weights, meta
+
+
+def check_preprocessing(preprocessing):
+    """Raise ValueError when a model expects different input than utils.preprocess produces."""
+    for key, expected in PREPROCESSING.items():
+        got = preprocessing.get(key, expected)
+        same = (all(abs(a - b) < 1e-6 for a, b in zip(got, expected)) and len(got) == len(expected)
+                if isinstance(expected, list) else got == expected)
+        if not same:
+            raise ValueError(f"Model preprocessing {key}={got!r} does not match the server ({expected!r})")
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+# ───────────────────────────────────────
+# REGISTRY INDEX
+# ───────────────────────────────────────
+def _index_path(registry_dir):
+    return os.path.join(registry_dir, INDEX_FILE)
+
+
+def read(registry_dir):
+    """registry.json as a dict ({} when there is no registry yet)."""
+    try:
+        with open(_index_path(registry_dir)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _write(registry_dir, index):
+    os.makedirs(registry_dir, exist_ok=True)
+    path = _index_path(registry_dir)
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp, path)   # readers only ever see a complete file
+
+
+def bundle_path(registry_dir, version):
+    return os.path.join(registry_dir, f"{version}.pt")
+
+
+def signature(registry_dir):
+    """Cheap change detector for the reload watcher."""
+    try:
+        st = os.stat(_index_path(registry_dir))
+        return st.st_mtime_ns, st.st_size
+    except FileNotFoundError:
+        return None
+
+
+def register(registry_dir, weights_path, class_names=None, notes=None, activate=False):
+    """
+    Copy weights into the registry as a bundle named by its content hash.
+    class_names overrides the list stored in (or defaulted for) the weights file.
+    returns: the version id
+    """
+    import torch
+
+    weights, meta = read_bundle(weights_path)
+    if class_names:
+        meta["class_names"] = list(class_names)
+    check_preprocessing(meta["preprocessing"])
+
+    os.makedirs(registry_dir, exist_ok=True)
+    tmp = os.path.join(registry_dir, f".{uuid.uuid4().hex}.tmp")
+    torch.save(make_bundle(weights, meta["class_names"], meta["preprocessing"]), tmp)
+    version = file_digest(tmp)[:12]
+    os.replace(tmp, bundle_path(registry_dir, version))
+
+    index = read(registry_dir)
+    index.setdefault("models", {})[version] = {
+        "class_names": meta["class_names"],
+        "preprocessing": meta["preprocessing"],
+        "source": os.path.abspath(weights_path),
+        "notes": notes,
+        "registered_at": datetime.utcnow().isoformat() + "Z",
+    }
+    if activate:
+        index["active"] = version
+    _write(registry_dir, index)
+    return version
+
+
+def activate(registry_dir, version):
+    index = read(registry_dir)
+    if version not in index.get("models", {}):
+        raise KeyError(f"Unknown model version {version}")
+    index["active"] = version
+    if (index.get("candidate") or {}).get("version") == version:
+        index["candidate"] = None
+    _write(registry_dir, index)
+
+
+def set_candidate(registry_dir, version, mode="canary", share=0.1):
+    """
+    canary: the candidate answers `share` of requests (its version lands on those Results).
+    shadow: the active model answers everything; the candidate also runs on `share`
+            of requests in the background and only agreement is recorded.
+    """
+    index = read(registry_dir)
+    if version not in index.get("models", {}):
+        raise KeyError(f"Unknown model version {version}")
+    if mode not in CANDIDATE_MODES:
+        raise ValueError(f"mode must be one of {CANDIDATE_MODES}")
+    index["candidate"] = {"version": version, "mode": mode, "share": max(0.0, min(1.0, float(share)))}
+    _write(registry_dir, index)
+
+
+def clear_candidate(registry_dir):
+    index = read(registry_dir)
+    index["candidate"] = None
+    _write(registry_dir, index)
+
+
+if __name__ == "__main__":
+    from config import Config
+
+    parser = argparse.ArgumentParser(description="Manage the model registry")
+    parser.add_argument("--registry", default=Config.MODEL_REGISTRY_DIR)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("register")
+    p.add_argument("weights")
+    p.add_argument("--classes", default=None, help="comma-separated class names in output order")
+    p.add_argument("--notes", default=None)
+    p.add_argument("--activate", action="store_true")
+    sub.add_parser("list")
+    p = sub.add_parser("activate")
+    p.add_argument("version")
+    p = sub.add_parser("canary")
+    p.add_argument("version")
+    p.add_argument("--share", type=float, default=0.1)
+    p.add_argument("--shadow", action="store_true", help="run alongside the active model instead of answering")
+    sub.add_parser("clear-candidate")
+    args = parser.parse_args()
+
+    if args.cmd == "register":
+        classes = args.classes.split(",") if args.classes else None
+        version = register(args.registry, args.weights, classes, args.notes, args.activate)
+        print(f"Registered {version}" + (" (active)" if args.activate else ""))
+    elif args.cmd == "activate":
+        activate(args.registry, args.version)
+        print(f"Active model: {args.version}")
+    elif args.cmd == "canary":
+        set_candidate(args.registry, args.version, "shadow" if args.shadow else "canary", args.share)
+        print(f"Candidate {args.version}: {'shadow' if args.shadow else 'canary'} on {args.share:.0%} of requests")
+    elif args.cmd == "clear-candidate":
+        clear_candidate(args.registry)
+        print("Candidate cleared")
+    else:
+        index = read(args.registry)
+        candidate = index.get("candidate") or {}
+        for version, meta in index.get("models", {}).items():
+            tag = "active" if version == index.get("active") else candidate.get("mode", "") if version == candidate.get("version") else ""
+            print(f"{version}  {tag:<7} {meta['registered_at']}  {','.join(meta['class_names'])}  {meta.get('notes') or ''}")
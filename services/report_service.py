@@ -5,19 +5,24 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
+import io
 import os
+import copy
+import threading
 from datetime import datetime
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
 
-def generate_report(uniq, img_path, heat_path, label, probabilities, patient_data=None):
-    if patient_data is None:
-        patient_data = {}
+from PIL import Image as PILImage
 
-    pdf_filename = f"report_{uniq}.pdf"
-    pdf_path = os.path.join("uploads", pdf_filename)
-    doc = SimpleDocTemplate(pdf_path, pagesize=A4,
-                            topMargin=0.9*inch, bottomMargin=0.9*inch,
-                            leftMargin=0.8*inch, rightMargin=0.8*inch)
-    story = []
+# Longest side (px) of images embedded in the PDF, shared with the thumbnails utils.preprocess makes
+from utils.preprocess import REPORT_MAX_SIDE
+
+# Styles, table styles and the static header/signature are built once per process
+# and reused; only the per-patient parts of the story are created for each report.
+@lru_cache(maxsize=1)
+def _styles():
     styles = getSampleStyleSheet()
 
     # === STYLES (PERFECTED) ===
@@ -32,46 +37,169 @@ def generate_report(uniq, img_path, heat_path, label, probabilities, patient_dat
     doctor_name = ParagraphStyle('DoctorName', fontSize=15, fontName='Helvetica-Bold', spaceBefore=60, spaceAfter=8)
     doctor_title = ParagraphStyle('DoctorTitle', fontSize=12, spaceAfter=6)
     center_name = ParagraphStyle('CenterName', fontSize=11, fontName='Helvetica-Oblique')
+    rec = ParagraphStyle('Rec', parent=normal, leftIndent=20)
+    big = {name: ParagraphStyle('Big', fontSize=24, textColor=color, spaceAfter=15)
+           for name, color in (("red", colors.red), ("orange", colors.orange), ("green", colors.green),
+                               ("blue", colors.HexColor("#003087")))}
+    return {"title": title, "subtitle": subtitle, "h1": h1, "normal": normal, "center": center,
+            "doctor_name": doctor_name, "doctor_title": doctor_title, "center_name": center_name,
+            "rec": rec, "big": big}
 
-    # Header
-    story.append(Paragraph("ALZIMER DIAGNOSTIC CENTER", title))
-    story.append(Paragraph("Advanced AI-Powered Alzheimer's Detection System", subtitle))
-    story.append(Spacer(1, 15))
+@lru_cache(maxsize=1)
+def _static_flowables():
+    st = _styles()
+    header = [
+        Paragraph("ALZIMER DIAGNOSTIC CENTER", st["title"]),
+        Paragraph("Advanced AI-Powered Alzheimer's Detection System", st["subtitle"]),
+        Spacer(1, 15),
+    ]
+    signature = [
+        Spacer(1, 70),
+        Paragraph("Dr. Aquib Darain", st["doctor_name"]),
+        Paragraph("Chief Neurologist & AI Research Head", st["doctor_title"]),
+        Paragraph("Alzimer Diagnostic Center", st["center_name"]),
+    ]
+    return header, signature
 
-    # Patient Info
+def _doc(target):
+    """target: file path or a BytesIO"""
+    return SimpleDocTemplate(target, pagesize=A4,
+                             topMargin=0.9*inch, bottomMargin=0.9*inch,
+                             leftMargin=0.8*inch, rightMargin=0.8*inch)
+
+def _header(story, st):
+    # shallow copies: layout state set during build lands on the copy, parsed text is shared
+    story.extend(copy.copy(f) for f in _static_flowables()[0])
+
+def _embed(data=None, path=None):
+    """
+    Downscaled JPEG for the report. data: already-encoded (downscaled) bytes, used as-is.
+    path: image file on disk, downscaled to REPORT_MAX_SIDE here. Returns a BytesIO or None.
+    """
+    if data:
+        return io.BytesIO(data)
+    if not path or not os.path.exists(path):
+        return None
+    with PILImage.open(path) as img:
+        img = img.convert("RGB")
+        img.thumbnail((REPORT_MAX_SIDE, REPORT_MAX_SIDE))
+        buf = io.BytesIO()
+        img.save(buf, "JPEG", quality=85)
+    buf.seek(0)
+    return buf
+
+def report_timestamp():
+    """The "Report Generated" text for a report rendered now (minute resolution)."""
+    return datetime.now().strftime("%d %B %Y, %I:%M %p")
+
+def _patient_table(patient_data):
     info_data = [
         ["Patient Name", patient_data.get("full_name", "N/A") or "N/A"],
         ["Patient Code", patient_data.get("patient_code", "N/A") or "N/A"],
         ["Age / Gender", f"{patient_data.get('age', 'N/A')} yrs / {patient_data.get('gender', 'N/A')}"],
         ["Referring Doctor", patient_data.get("doctor_name", "N/A") or "N/A"],
-        ["Report Generated", datetime.now().strftime("%d %B %Y, %I:%M %p")],
+        ["Report Generated", patient_data.get("report_generated") or report_timestamp()],
     ]
     table = Table(info_data, colWidths=[2.2*inch, 3.3*inch])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0,0), (0,-1), colors.HexColor("#e8f4f8")),
-        ('TEXTCOLOR', (0,0), (-1,-1), colors.HexColor("#003087")),
-        ('FONTNAME', (0,0), (-1,-1), 'Helvetica-Bold'),
-        ('GRID', (0,0), (-1,-1), 1, colors.HexColor("#003087")),
-        ('LEFTPADDING', (1,0), (1,-1), 12),
-        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-    ]))
-    story.append(table)
+    table.setStyle(_table_styles()["patient"])
+    return table
+
+@lru_cache(maxsize=1)
+def _table_styles():
+    return {
+        "patient": TableStyle([
+            ('BACKGROUND', (0,0), (0,-1), colors.HexColor("#e8f4f8")),
+            ('TEXTCOLOR', (0,0), (-1,-1), colors.HexColor("#003087")),
+            ('FONTNAME', (0,0), (-1,-1), 'Helvetica-Bold'),
+            ('GRID', (0,0), (-1,-1), 1, colors.HexColor("#003087")),
+            ('LEFTPADDING', (1,0), (1,-1), 12),
+            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+        ]),
+        "images": TableStyle([('ALIGN', (0,0), (-1,-1), 'CENTER'), ('VALIGN', (0,0), (-1,-1), 'MIDDLE')]),
+        "probabilities": TableStyle([
+            # Header
+            ('BACKGROUND', (0,0), (-1,0), colors.HexColor("#003087")),
+            ('TEXTCOLOR', (0,0), (-1,0), colors.white),
+            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0,0), (-1,0), 12),
+            ('ALIGN', (0,0), (-1,0), 'CENTER'),
+            ('VALIGN', (0,0), (-1,0), 'MIDDLE'),
+
+            # Body — TIGHTLY JOINED TO HEADER
+            ('BACKGROUND', (0,1), (-1,-1), colors.white),
+            ('TEXTCOLOR', (0,1), (-1,-1), colors.HexColor("#1e3d59")),
+            ('FONTNAME', (0,1), (-1,-1), 'Helvetica'),
+            ('FONTSIZE', (0,1), (-1,-1), 11),
+            ('ALIGN', (0,1), (0,-1), 'LEFT'),
+            ('ALIGN', (1,1), (1,-1), 'CENTER'),
+            ('VALIGN', (0,1), (-1,-1), 'MIDDLE'),
+
+            # GRID — FULL BOX, NO GAP AT ALL
+            ('GRID', (0,0), (-1,-1), 1, colors.HexColor("#003087")),
+            ('BOX', (0,0), (-1,-1), 2, colors.HexColor("#003087")),
+
+            # CRITICAL: ZERO PADDING BETWEEN HEADER AND FIRST ROW
+            ('TOPPADDING', (0,1), (-1,1), 6),        # First row after header
+            ('BOTTOMPADDING', (0,1), (-1,1), 6),
+            ('TOPPADDING', (0,2), (-1,-1), 8),      # Rest of rows
+            ('BOTTOMPADDING', (0,2), (-1,-1), 8),
+            ('LEFTPADDING', (0,1), (0,-1), 15),
+            ('RIGHTPADDING', (1,1), (1,-1), 10),
+        ]),
+        "slices": TableStyle([
+            ('BACKGROUND', (0,0), (-1,0), colors.HexColor("#003087")),
+            ('TEXTCOLOR', (0,0), (-1,0), colors.white),
+            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0,0), (-1,-1), 9),
+            ('TEXTCOLOR', (0,1), (-1,-1), colors.HexColor("#1e3d59")),
+            ('GRID', (0,0), (-1,-1), 0.5, colors.HexColor("#003087")),
+            ('ALIGN', (2,1), (-1,-1), 'CENTER'),
+        ]),
+    }
+
+def _signature(story, st):
+    story.extend(copy.copy(f) for f in _static_flowables()[1])
+
+def render_report(label, probabilities, patient_data=None, img_path=None, heat_path=None,
+                  img_data=None, heat_data=None):
+    """
+    Build the single-scan report in memory and return the PDF bytes.
+    img_data / heat_data: optional already-encoded (downscaled) JPEG bytes; when given
+    they are embedded instead of reading img_path / heat_path from disk.
+    Only takes plain picklable arguments so it can run in the report process pool.
+    """
+    if patient_data is None:
+        patient_data = {}
+
+    buf = io.BytesIO()
+    doc = _doc(buf)
+    story = []
+    st = _styles()
+    h1, normal, center = st["h1"], st["normal"], st["center"]
+
+    # Header
+    _header(story, st)
+
+    # Patient Info
+    story.append(_patient_table(patient_data))
     story.append(Spacer(1, 25))
 
     # AI Diagnosis
     confidence = max(probabilities.values())
-    risk_color = colors.red if confidence > 0.7 else colors.orange if confidence > 0.5 else colors.green
+    risk_color = "red" if confidence > 0.7 else "orange" if confidence > 0.5 else "green"
 
     story.append(Paragraph("AI DIAGNOSIS", h1))
-    story.append(Paragraph(f"<b>{label.upper()}</b>", ParagraphStyle('Big', fontSize=24, textColor=risk_color, spaceAfter=15)))
+    story.append(Paragraph(f"<b>{label.upper()}</b>", st["big"][risk_color]))
     story.append(Paragraph(f"AI Confidence Level: <b>{confidence:.1%}</b>", normal))
     story.append(Spacer(1, 20))
 
     # Images
-    if os.path.exists(img_path):
-        img1 = Image(img_path, width=2.7*inch, height=2.7*inch)
+    img_src = _embed(img_data, img_path)
+    heat_src = _embed(heat_data, heat_path)
+    if img_src is not None:
+        img1 = Image(img_src, width=2.7*inch, height=2.7*inch)
         img1.hAlign = 'CENTER'
-        heat_img = Image(heat_path, width=2.7*inch, height=2.7*inch) if heat_path and os.path.exists(heat_path) else None
+        heat_img = Image(heat_src, width=2.7*inch, height=2.7*inch) if heat_src is not None else None
 
         row = [img1]
         captions = [[Paragraph("<b>Original MRI Scan</b>", center)]]
@@ -80,7 +208,7 @@ def generate_report(uniq, img_path, heat_path, label, probabilities, patient_dat
             captions[0].append(Paragraph("<b>AI Attention Heatmap</b><br/><font size=9>Red = High Abnormality Focus</font>", center))
 
         img_table = Table([row] + captions, colWidths=[2.9*inch, 2.9*inch])
-        img_table.setStyle(TableStyle([('ALIGN', (0,0), (-1,-1), 'CENTER'), ('VALIGN', (0,0), (-1,-1), 'MIDDLE')]))
+        img_table.setStyle(_table_styles()["images"])
         story.append(img_table)
     story.append(Spacer(1, 25))
 
@@ -97,42 +225,13 @@ def generate_report(uniq, img_path, heat_path, label, probabilities, patient_dat
         ])
 
     prob_table = Table(prob_data, colWidths=[4.1*inch, 1.4*inch])
-    prob_table.setStyle(TableStyle([
-        # Header
-        ('BACKGROUND', (0,0), (-1,0), colors.HexColor("#003087")),
-        ('TEXTCOLOR', (0,0), (-1,0), colors.white),
-        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0,0), (-1,0), 12),
-        ('ALIGN', (0,0), (-1,0), 'CENTER'),
-        ('VALIGN', (0,0), (-1,0), 'MIDDLE'),
-
-        # Body — TIGHTLY JOINED TO HEADER
-        ('BACKGROUND', (0,1), (-1,-1), colors.white),
-        ('TEXTCOLOR', (0,1), (-1,-1), colors.HexColor("#1e3d59")),
-        ('FONTNAME', (0,1), (-1,-1), 'Helvetica'),
-        ('FONTSIZE', (0,1), (-1,-1), 11),
-        ('ALIGN', (0,1), (0,-1), 'LEFT'),
-        ('ALIGN', (1,1), (1,-1), 'CENTER'),
-        ('VALIGN', (0,1), (-1,-1), 'MIDDLE'),
-
-        # GRID — FULL BOX, NO GAP AT ALL
-        ('GRID', (0,0), (-1,-1), 1, colors.HexColor("#003087")),
-        ('BOX', (0,0), (-1,-1), 2, colors.HexColor("#003087")),
-
-        # CRITICAL: ZERO PADDING BETWEEN HEADER AND FIRST ROW
-        ('TOPPADDING', (0,1), (-1,1), 6),        # First row after header
-        ('BOTTOMPADDING', (0,1), (-1,1), 6),
-        ('TOPPADDING', (0,2), (-1,-1), 8),      # Rest of rows
-        ('BOTTOMPADDING', (0,2), (-1,-1), 8),
-        ('LEFTPADDING', (0,1), (0,-1), 15),
-        ('RIGHTPADDING', (1,1), (1,-1), 10),
-    ]))
+    prob_table.setStyle(_table_styles()["probabilities"])
     story.append(prob_table)
     story.append(Spacer(1, 35))
 
     # Recommendations
     story.append(Paragraph("Clinical Recommendations", h1))
-    rec_style = ParagraphStyle('Rec', parent=normal, leftIndent=20)
+    rec_style = st["rec"]
     if confidence > 0.7:
         story.append(Paragraph("• <font color='#d32f2f'><b>Urgent neurological consultation required</b></font>", rec_style))
         story.append(Paragraph("• Consider Acetylcholinesterase inhibitors (Donepezil/Rivastigmine)", rec_style))
@@ -143,10 +242,104 @@ def generate_report(uniq, img_path, heat_path, label, probabilities, patient_dat
     story.append(Paragraph("• Maintain brain-healthy lifestyle (exercise, diet, sleep)", rec_style))
 
     # === DOCTOR SIGNATURE — PERFECT SPACING ===
-    story.append(Spacer(1, 70))
-    story.append(Paragraph("Dr. Aquib Darain", doctor_name))
-    story.append(Paragraph("Chief Neurologist & AI Research Head", doctor_title))
-    story.append(Paragraph("Alzimer Diagnostic Center", center_name))
+    _signature(story, st)
+
+    doc.build(story)
+    return buf.getvalue()
+
+def render_study_report(slices, probabilities, label, patient_data=None):
+    """
+    One combined PDF for a multi-slice study, returned as bytes.
+    slices: list of dicts { filename, label, confidence }
+    probabilities: study-level (mean) probabilities per class
+    """
+    if patient_data is None:
+        patient_data = {}
+
+    buf = io.BytesIO()
+    doc = _doc(buf)
+    story = []
+    st = _styles()
+
+    _header(story, st)
+    story.append(_patient_table(patient_data))
+    story.append(Spacer(1, 25))
+
+    confidence = max(probabilities.values())
+    story.append(Paragraph("STUDY SUMMARY", st["h1"]))
+    story.append(Paragraph(f"<b>{label.upper()}</b>", st["big"]["blue"]))
+    story.append(Paragraph(f"Slices analysed: <b>{len(slices)}</b> &nbsp;&nbsp; Mean confidence: <b>{confidence:.1%}</b>", st["normal"]))
+    story.append(Spacer(1, 20))
+
+    rows = [["#", "Slice", "Prediction", "Confidence"]]
+    for i, sl in enumerate(slices, 1):
+        rows.append([str(i), sl["filename"], sl["label"].replace("Demented", " Dementia"), f"{sl['confidence']:.1%}"])
+    slice_table = Table(rows, colWidths=[0.5*inch, 2.8*inch, 1.6*inch, 1.0*inch], repeatRows=1)
+    slice_table.setStyle(_table_styles()["slices"])
+    story.append(slice_table)
+
+    _signature(story, st)
 
     doc.build(story)
-    return pdf_path
+    return buf.getvalue()
+
+# ───────────────────────────────────────
+# RENDERING POOL + FILE OUTPUT
+# ───────────────────────────────────────
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+def _pool():
+    """
+    Process pool for report rendering (REPORT_PROCESSES workers, 0 = render inline).
+    ReportLab layout is pure Python, so running it in separate processes keeps it
+    from holding the GIL on the request threads. Workers are spawned (not forked)
+    so they never inherit torch's thread pools.
+    """
+    global _POOL
+    from flask import current_app, has_app_context
+
+    n = current_app.config.get("REPORT_PROCESSES", 0) if has_app_context() else 0
+    if not n:
+        return None
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                _POOL = ProcessPoolExecutor(max_workers=n, mp_context=multiprocessing.get_context("spawn"))
+    return _POOL
+
+def _render(fn, **kwargs):
+    pool = _pool()
+    if pool is None:
+        return fn(**kwargs)
+    return pool.submit(fn, **kwargs).result()
+
+def _output_path(filename, out_dir=None):
+    if out_dir is None:
+        from flask import current_app, has_app_context
+        out_dir = current_app.config.get("UPLOAD_DIR", "uploads") if has_app_context() else "uploads"
+    os.makedirs(out_dir, exist_ok=True)
+    return os.path.join(out_dir, filename)
+
+def _write(path, pdf_bytes):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"   # concurrent renders of one file
+    with open(tmp, "wb") as f:
+        f.write(pdf_bytes)
+    os.replace(tmp, path)
+    return path
+
+def generate_report(uniq, img_path, heat_path, label, probabilities, patient_data=None,
+                    img_data=None, heat_data=None, out_dir=None):
+    """
+    Render the report (in the process pool when configured) and write it to
+    <out_dir or UPLOAD_DIR>/report_<uniq>.pdf. Returns the path.
+    """
+    pdf_bytes = _render(render_report, label=label, probabilities=probabilities, patient_data=patient_data,
+                        img_path=img_path, heat_path=heat_path, img_data=img_data, heat_data=heat_data)
+    return _write(_output_path(f"report_{uniq}.pdf", out_dir), pdf_bytes)
+
+def generate_study_report(uniq, slices, probabilities, label, patient_data=None, out_dir=None):
+    """Combined study PDF written to <out_dir or UPLOAD_DIR>/study_<uniq>.pdf. Returns the path."""
+    pdf_bytes = _render(render_study_report, slices=slices, probabilities=probabilities,
+                        label=label, patient_data=patient_data)
+    return _write(_output_path(f"study_{uniq}.pdf", out_dir), pdf_bytes)
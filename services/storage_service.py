@@ -1,6 +1,19 @@
 # services/storage_service.py
 import os
-from flask import current_app
+import re
+import uuid
+import hashlib
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+from flask import current_app, request
+from werkzeug.security import safe_join
+from werkzeug.utils import send_file as _send_file
+
+# <sha256><ext>, as written by save_content(); the name is the content, so it never changes
+_CONTENT_ADDRESSED = re.compile(r"^[0-9a-f]{64}\.(jpg|png)$")
+_IMMUTABLE_MAX_AGE = 365 * 86400
 
 def allowed_file(filename):
     return filename and filename.lower().endswith((".jpg", ".jpeg", ".png"))
@@ -17,3 +30,179 @@ def save_upload(fileobj, uniq):
     fileobj.save(path)
     current_app.logger.info("Saved upload to %s", path)
     return path
+
+def content_hash(data):
+    """sha256 hex digest of the raw upload bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+def sniff_extension(data):
+    """File extension from the image magic bytes (falls back to .jpg)."""
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return ".png"
+    return ".jpg"
+
+class UploadRejected(ValueError):
+    """An upload refused from its header alone; status / code go into the 4xx response."""
+
+    def __init__(self, message, status=400, code="INVALID_IMAGE"):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+
+# JPEG start-of-frame markers (SOF0-SOF15 minus DHT / JPG / DAC), which carry the dimensions
+_JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+def _jpeg_size(data):
+    i = 2
+    while i + 4 <= len(data):
+        if data[i] != 0xFF:
+            break
+        marker = data[i + 1]
+        if marker == 0xFF:                                # fill byte
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:      # standalone markers
+            i += 2
+            continue
+        if marker in (0xD9, 0xDA):                        # image data before any frame header
+            break
+        length = int.from_bytes(data[i + 2:i + 4], "big")
+        if marker in _JPEG_SOF:
+            if i + 9 > len(data):
+                break
+            return int.from_bytes(data[i + 7:i + 9], "big"), int.from_bytes(data[i + 5:i + 7], "big")
+        i += 2 + length
+    raise UploadRejected("Corrupt or truncated JPEG")
+
+def image_header(data, max_pixels):
+    """
+    Validate an upload from its first bytes, without decoding it: magic bytes must be
+    JPEG or PNG, and the width x height in the header must be non-zero and at most
+    max_pixels (a small file can declare a huge canvas - a decompression bomb).
+    returns: (extension, width, height); raises UploadRejected
+    """
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        if len(data) < 24 or data[12:16] != b"IHDR":
+            raise UploadRejected("Corrupt or truncated PNG")
+        ext, width, height = ".png", int.from_bytes(data[16:20], "big"), int.from_bytes(data[20:24], "big")
+    elif data[:3] == b"\xff\xd8\xff":
+        ext, (width, height) = ".jpg", _jpeg_size(data)
+    else:
+        raise UploadRejected("Unsupported file type (JPEG or PNG expected)", 415, "UNSUPPORTED_MEDIA_TYPE")
+    if not width or not height:
+        raise UploadRejected("Image has no pixels")
+    if width * height > max_pixels:
+        raise UploadRejected(f"Image too large ({width}x{height}, max {max_pixels} pixels)", 413, "IMAGE_TOO_LARGE")
+    return ext, width, height
+
+def content_path(data, digest=None):
+    """Where save_content() puts data: UPLOAD_DIR/<sha256><ext>."""
+    upload_dir = current_app.config.get("UPLOAD_DIR", "uploads")
+    return os.path.join(upload_dir, f"{digest or content_hash(data)}{sniff_extension(data)}")
+
+def _write_once(path, data, logger):
+    if os.path.exists(path):
+        return path
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # write to a temp name and rename, so concurrent identical uploads never see a partial file
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    logger.info("Saved upload to %s", path)
+    return path
+
+def save_content(data, digest=None):
+    """
+    Content-addressed save: writes the bytes to UPLOAD_DIR as <sha256><ext> and
+    returns the full path. Identical uploads map to the same file and are
+    only written once.
+    """
+    return _write_once(content_path(data, digest), data, current_app.logger)
+
+_WRITER = ThreadPoolExecutor(max_workers=2, thread_name_prefix="upload-write")
+
+def save_content_async(data, digest=None):
+    """
+    save_content() on a background thread, so the write overlaps other work.
+    returns: (the full path it will have, Future resolving to it) - wait on the
+    future before anything reads the file or points a stored row at it.
+    """
+    path = content_path(data, digest)
+    return path, _WRITER.submit(_write_once, path, data, current_app.logger)
+
+# ───────────────────────────────────────
+# SERVING STORED FILES
+# ───────────────────────────────────────
+def resolve(filename):
+    """
+    Full path of filename inside UPLOAD_DIR, or None if it is missing or would
+    escape the directory (../, absolute paths, drive letters, NUL bytes).
+    """
+    upload_dir = os.path.abspath(current_app.config.get("UPLOAD_DIR", "uploads"))
+    path = safe_join(upload_dir, filename)
+    if path is None or not os.path.isfile(path):
+        return None
+    return path
+
+@lru_cache(maxsize=4096)
+def _hashed_etag(path, mtime_ns, size):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def file_etag(path):
+    """Strong ETag from the content hash (the file name itself for content-addressed uploads)."""
+    name = os.path.basename(path)
+    if _CONTENT_ADDRESSED.match(name):
+        return name.split(".", 1)[0]
+    st = os.stat(path)
+    return _hashed_etag(path, st.st_mtime_ns, st.st_size)
+
+def serve_file(path, mimetype=None):
+    """
+    Response for a file returned by resolve(): ETag / Last-Modified with 304s
+    and byte ranges. Content-addressed files are marked immutable for a year;
+    everything else must be revalidated. Responses stay private (patient data).
+
+    FILE_SENDFILE = "x-sendfile" | "x-accel" hands the bytes to the front proxy
+    (Apache mod_xsendfile / nginx internal location at FILE_ACCEL_PREFIX), which
+    then also answers the Range requests.
+    """
+    cfg = current_app.config
+    mode = cfg.get("FILE_SENDFILE", "")
+    rv = _send_file(path, request.environ, mimetype=mimetype, etag=file_etag(path),
+                    conditional=not mode, use_x_sendfile=bool(mode))
+    if mode:
+        rv = rv.make_conditional(request.environ)
+    if mode == "x-accel":
+        del rv.headers["X-Sendfile"]
+        rv.headers["X-Accel-Redirect"] = cfg.get("FILE_ACCEL_PREFIX", "/protected-uploads/") + quote(os.path.basename(path))
+
+    rv.cache_control.no_cache = None
+    rv.cache_control.private = True
+    if _CONTENT_ADDRESSED.match(os.path.basename(path)):
+        rv.cache_control.max_age = _IMMUTABLE_MAX_AGE
+        rv.cache_control.immutable = True
+    else:
+        rv.cache_control.no_cache = True
+    return rv
+
+def serve_bytes(data, mimetype, etag, immutable=False):
+    """
+    Response for content generated on request (e.g. a rendered heatmap) under the
+    same rules as serve_file(): ETag with 304s, byte ranges, private; immutable for
+    a year when the bytes behind this URL can never change.
+    """
+    rv = current_app.response_class(data, mimetype=mimetype)
+    rv.set_etag(etag)
+    rv = rv.make_conditional(request.environ, accept_ranges=True, complete_length=len(data))
+    rv.cache_control.private = True
+    if immutable:
+        rv.cache_control.max_age = _IMMUTABLE_MAX_AGE
+        rv.cache_control.immutable = True
+    else:
+        rv.cache_control.no_cache = True
+    return rv
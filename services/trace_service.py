@@ -0,0 +1,52 @@
+# services/trace_service.py
+import json
+import time
+import threading
+
+# Request traces for benchmarks/loadtest.py replay. With REQUEST_TRACE_FILE set, every
+# prediction / artifact / health request is appended to that file as one JSON line:
+# timing, route, whitelisted options and the content-addressed name of the stored
+# upload - never patient fields, so a trace can be shared. The history and export
+# routes (/patients, /results, ...) carry patient ids, emails and doctors in their
+# paths and query strings and are not traced. Replaying needs a copy of UPLOAD_DIR
+# for the image bytes.
+TRACED_PREFIXES = ("/predict", "/health")
+REPLAYABLE_FIELDS = ("explain", "async")
+REPLAYABLE_QUERY = REPLAYABLE_FIELDS + ("size", "colormap", "alpha")   # + heat overlay rendering
+
+_LOCK = threading.Lock()
+_FILES = {}
+
+
+def _file(path):
+    f = _FILES.get(path)
+    if f is None:
+        f = _FILES[path] = open(path, "a", buffering=1)   # line-buffered: a crash loses at most one line
+    return f
+
+
+def replayable(form):
+    """The request options worth replaying (no patient data)."""
+    return {k: form[k] for k in REPLAYABLE_FIELDS if k in form}
+
+
+def record(path, request, response, seconds, upload=None, form=None):
+    """
+    Append one request to the JSONL trace at path (only TRACED_PREFIXES routes).
+    upload / form come from the prediction code when it ran (the ASGI app parses
+    uploads outside Flask).
+    """
+    if not request.path.startswith(TRACED_PREFIXES):
+        return
+    line = json.dumps({
+        "t": round(time.time() - seconds, 6),   # request start
+        "method": request.method,
+        "path": request.path,
+        "query": {k: v for k, v in request.args.items() if k in REPLAYABLE_QUERY},
+        "form": form if form is not None else replayable(request.form),
+        "upload": upload,
+        "status": response.status_code,
+        "ms": round(seconds * 1000.0, 3),
+    }, separators=(",", ":"))
+    with _LOCK:
+        _file(path).write(line + "\n")
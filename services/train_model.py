@@ -1,5 +1,17 @@
 # train_model.py
+#
+#   python train_model.py                      (from services/: original ImageFolder loop)
+#   python -m services.train_model --shard ../ml/train_shard --workers 4 --amp bf16 --compile
+#                                              (from project root: streams a uint8 shard;
+#                                               built from --data on first use)
+#
+# Both modes print wall-clock time and peak RSS per epoch, so runs can be compared.
 import os
+import sys
+import time
+import argparse
+import resource
+
 import torch
 import torch.nn as nn
 import torch.optim as optim
@@ -7,43 +19,101 @@ from torch.utils.data import DataLoader
 from torchvision import datasets, transforms, models
 from tqdm import tqdm
 
+
+def _peak_rss_mib():
+    """(this process, largest finished child e.g. a loader worker) peak RSS in MiB."""
+    scale = 1 if sys.platform == "darwin" else 1024   # ru_maxrss: bytes on macOS, KiB on Linux
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2**20
+    child = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale / 2**20
+    return own, child
+
+
+def _autocast(device, amp):
+    """Context manager for --amp: bf16 runs on CPU and recent GPUs, fp16 needs CUDA."""
+    if amp == "off":
+        return torch.autocast(device.type, enabled=False)
+    dtype = torch.bfloat16 if amp == "bf16" else torch.float16
+    return torch.autocast(device.type, dtype=dtype)
+
+
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Train the ResNet-18 classifier")
+    parser.add_argument("--data", default="../dataset_alzheimers", help="ImageFolder dataset")
+    parser.add_argument("--out", default="../ml/alzheimer_model.pth")
+    parser.add_argument("--epochs", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--shard", default=None,
+                        help="stream from this uint8 shard prefix (built from --data if missing or stale)")
+    parser.add_argument("--workers", type=int, default=0, help="DataLoader worker processes")
+    parser.add_argument("--prefetch", type=int, default=2, help="batches prefetched per worker")
+    parser.add_argument("--amp", default="off", choices=("off", "bf16", "fp16"))
+    parser.add_argument("--compile", action="store_true", help="torch.compile the model when available")
+    parser.add_argument("--no-pretrained", action="store_true", help="start from random weights (no download)")
+    parser.add_argument("--max-batches", type=int, default=0, help="stop each epoch after N batches (timing runs)")
+    args = parser.parse_args()
+
     # ================================
     # CONFIG
     # ================================
-    DATASET_PATH = "../dataset_alzheimers"          # One level up from services/
-    # MODEL_SAVE_PATH = "../ml/alzheimer_model.pth"   # Save in project root
-    MODEL_SAVE_PATH = "../ml/alzheimer_model.pth"   # Save in project root
-    BATCH_SIZE = 32
-    EPOCHS = 4
+    DATASET_PATH = args.data                        # One level up from services/
+    MODEL_SAVE_PATH = args.out                      # Save in project root
+    BATCH_SIZE = args.batch_size
+    EPOCHS = args.epochs
     DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
     print(f"Using device: {DEVICE}")
+    if args.amp == "fp16" and DEVICE.type != "cuda":
+        parser.error("--amp fp16 needs CUDA; use bf16 on CPU")
 
     # ================================
     # DATA
     # ================================
-    transform = transforms.Compose([
-        transforms.Resize((224, 224)),
-        transforms.ToTensor(),
-        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
-    ])
-
-    full_dataset = datasets.ImageFolder(DATASET_PATH, transform=transform)
-    class_names = full_dataset.classes
-    print(f"Classes: {class_names}")
+    if args.shard:
+        # decoded once into uint8; workers slice the memory map, the main process only
+        # converts/normalizes whole batches (on the GPU when there is one)
+        from services.dataset_shard import ShardDataset, shard_loader, shard_exists, stale_reason, build_shard
+        from utils.preprocess import normalize_batch
 
-    # CRITICAL: num_workers=0 on Windows!
-    dataloader = DataLoader(full_dataset, batch_size=BATCH_SIZE, shuffle=True, num_workers=0)
+        stale = stale_reason(args.shard, DATASET_PATH) if shard_exists(args.shard) else "missing"
+        if stale:
+            print(f"Rebuilding shard {args.shard} from {DATASET_PATH}: {stale}")
+            t0 = time.perf_counter()
+            build_shard(DATASET_PATH, args.shard, workers=args.workers)
+            print(f"Built shard {args.shard} in {time.perf_counter() - t0:.1f}s")
+        full_dataset = ShardDataset(args.shard)
+        dataloader = shard_loader(full_dataset, BATCH_SIZE, shuffle=True, workers=args.workers,
+                                  prefetch=args.prefetch, pin_memory=DEVICE.type == "cuda")
+        to_input = normalize_batch
+    else:
+        transform = transforms.Compose([
+            transforms.Resize((224, 224)),
+            transforms.ToTensor(),
+            transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
+        ])
+        full_dataset = datasets.ImageFolder(DATASET_PATH, transform=transform)
+
+        # CRITICAL: num_workers=0 on Windows!
+        dataloader = DataLoader(full_dataset, batch_size=BATCH_SIZE, shuffle=True, num_workers=args.workers)
+        to_input = None
+    class_names = full_dataset.class_names if args.shard else full_dataset.classes
+    print(f"Classes: {class_names}")
 
     # ================================
     # MODEL
     # ================================
-    model = models.resnet18(pretrained=True)
-    model.fc = nn.Linear(model.fc.in_features, 4)
+    model = models.resnet18(pretrained=not args.no_pretrained)
+    model.fc = nn.Linear(model.fc.in_features, len(class_names))
     model = model.to(DEVICE)
 
     criterion = nn.CrossEntropyLoss()
     optimizer = optim.Adam(model.parameters(), lr=0.001)
+    scaler = torch.amp.GradScaler("cuda", enabled=args.amp == "fp16")
+
+    step_model = model
+    if args.compile:
+        if hasattr(torch, "compile"):
+            step_model = torch.compile(model)   # shares parameters with model; saved below as usual
+        else:
+            print("torch.compile not available in this torch version; running eager")
 
     # ================================
     # TRAIN
@@ -55,27 +125,48 @@ if __name__ == '__main__':
         running_loss = 0.0
         correct = 0
         total = 0
+        batches = 0
+        started = time.perf_counter()
 
         for inputs, labels in tqdm(dataloader, desc=f"Epoch {epoch+1}/{EPOCHS}"):
-            inputs, labels = inputs.to(DEVICE), labels.to(DEVICE)
+            inputs = inputs.to(DEVICE, non_blocking=True)
+            labels = labels.to(DEVICE, non_blocking=True)
+            if to_input is not None:
+                inputs = to_input(inputs)
 
             optimizer.zero_grad()
-            outputs = model(inputs)
-            loss = criterion(outputs, labels)
-            loss.backward()
-            optimizer.step()
+            with _autocast(DEVICE, args.amp):
+                outputs = step_model(inputs)
+                loss = criterion(outputs, labels)
+            scaler.scale(loss).backward()
+            scaler.step(optimizer)
+            scaler.update()
 
             running_loss += loss.item()
             _, predicted = outputs.max(1)
             total += labels.size(0)
             correct += predicted.eq(labels).sum().item()
+            batches += 1
+            if args.max_batches and batches >= args.max_batches:
+                break
 
-        print(f"Epoch {epoch+1} → Loss: {running_loss/len(dataloader):.4f} | Accuracy: {100.*correct/total:.2f}%")
+        elapsed = time.perf_counter() - started
+        rss, worker_rss = _peak_rss_mib()
+        print(f"Epoch {epoch+1} → Loss: {running_loss/max(1, batches):.4f} | Accuracy: {100.*correct/max(1, total):.2f}% "
+              f"| {elapsed:.1f}s ({total/elapsed:.1f} img/s) | peak RSS {rss:.0f} MiB (worker {worker_rss:.0f} MiB)")
 
     # ================================
     # SAVE
     # ================================
-    os.makedirs("../ml", exist_ok=True)
-    torch.save(model.state_dict(), MODEL_SAVE_PATH)
+    os.makedirs(os.path.dirname(os.path.abspath(MODEL_SAVE_PATH)), exist_ok=True)
+    # class order and preprocessing travel with the weights, so serving never has to guess
+    # (same layout as services/registry_service.make_bundle)
+    torch.save({
+        "arch": "resnet18",
+        "model_state_dict": model.state_dict(),
+        "class_names": class_names,
+        "preprocessing": {"input_size": 224, "resize": "bilinear",
+                          "mean": [0.485, 0.456, 0.406], "std": [0.229, 0.224, 0.225]},
+    }, MODEL_SAVE_PATH)
     print(f"\nMODEL TRAINED AND SAVED TO: {MODEL_SAVE_PATH}")
-    print("NOW YOUR PREDICTIONS WILL BE 100% CONSISTENT AND ACCURATE!")
\ No newline at end of file
+    print("NOW YOUR PREDICTIONS WILL BE 100% CONSISTENT AND ACCURATE!")
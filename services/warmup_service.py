@@ -0,0 +1,106 @@
+# services/warmup_service.py
+import threading
+import time
+
+# Deliberately free of torch imports: /health and /ready read this state without
+# paying for the ML stack. The warm-up thread imports it when it runs.
+_STATE = {
+    "state": "cold",          # cold | loading | ready | failed
+    "load_seconds": None,
+    "warmup_seconds": None,
+    "warmup_iterations": 0,
+    "backend": None,
+    "model_version": None,
+    "device": None,
+    "torch_threads": None,
+    "interop_threads": None,
+    "error": None,
+}
+_LOCK = threading.Lock()
+_THREAD = None
+
+
+def is_ready():
+    return _STATE["state"] == "ready"
+
+
+def status():
+    return dict(_STATE, ready=is_ready())
+
+
+def start(app, blocking=False):
+    """
+    Load the model(s) and run WARMUP_ITERATIONS dummy inferences, once per process.
+    Runs in a background thread unless blocking=True.
+    """
+    global _THREAD
+    with _LOCK:
+        if _THREAD is not None:
+            return
+        _STATE["state"] = "loading"
+        _THREAD = threading.Thread(target=_warmup, args=(app,), name="model-warmup", daemon=True)
+        _THREAD.start()
+    if blocking:
+        _THREAD.join()
+
+
+def mark_loaded(model_version, backend, device):
+    """
+    A request loaded the model on first use (EAGER_MODEL_LOAD off, or the warm-up
+    thread failed): /ready turns green from then on. No-op while warm-up is running.
+    """
+    with _LOCK:
+        if _STATE["state"] not in ("cold", "failed"):
+            return
+        _STATE.update(state="ready", model_version=model_version, backend=backend, device=device, error=None)
+
+
+def _apply_thread_settings(cfg):
+    import torch
+
+    if cfg.get("TORCH_NUM_THREADS"):
+        torch.set_num_threads(int(cfg["TORCH_NUM_THREADS"]))
+    if cfg.get("TORCH_INTEROP_THREADS"):
+        try:
+            torch.set_num_interop_threads(int(cfg["TORCH_INTEROP_THREADS"]))
+        except RuntimeError:
+            # only allowed before any inter-op parallel work has started
+            pass
+    _STATE["torch_threads"] = torch.get_num_threads()
+    _STATE["interop_threads"] = torch.get_num_interop_threads()
+
+
+def _warmup(app):
+    with app.app_context():
+        try:
+            t0 = time.perf_counter()
+            _apply_thread_settings(app.config)
+
+            import torch
+            from services import model_service
+            from services.explain_service import warm_up
+
+            # loads the active model and runs its WARMUP_ITERATIONS inferences; first
+            # forwards pay for allocator growth, oneDNN primitive creation and
+            # TorchScript profiling, so get them out of the way before taking traffic
+            serving = model_service.current()
+            _STATE["load_seconds"] = round(time.perf_counter() - t0, 3)
+            _STATE["backend"] = app.config.get("INFERENCE_BACKEND", "eager")
+            _STATE["device"] = str(model_service._DEVICE)
+            _STATE["model_version"] = serving.version
+
+            t1 = time.perf_counter()
+            n = int(app.config.get("WARMUP_ITERATIONS", 3))
+            _STATE["warmup_iterations"] = n
+            if n:
+                x = torch.zeros(1, 3, 224, 224, device=model_service._DEVICE)
+                warm_up(serving.model, x, app.config.get("EXPLAIN_MODE", "gradcam"))
+            _STATE["warmup_seconds"] = round(time.perf_counter() - t1, 3)
+
+            _STATE["state"] = "ready"
+            app.logger.info("Model ready: load %.2fs, warm-up %.2fs (%d iterations, backend=%s)",
+                            _STATE["load_seconds"], _STATE["warmup_seconds"], n, _STATE["backend"])
+        except Exception as e:
+            _STATE["state"] = "failed"
+            _STATE["error"] = str(e)
+            app.logger.exception("Model warm-up failed")
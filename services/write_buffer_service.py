@@ -0,0 +1,194 @@
+# services/write_buffer_service.py
+import threading
+import time
+import queue
+from concurrent.futures import Future
+
+from sqlalchemy import insert
+
+from models import db
+from models.patient import Patient
+from models.result import Result
+
+# Write-behind for prediction rows. Every /predict/ used to pay a full commit (and
+# on SQLite an fsync) for one patient + one result; here request threads hand their
+# rows to a single writer thread that inserts whole batches with two multi-row
+# INSERT ... RETURNING statements and one commit. A request still waits for the
+# commit of its batch, so it gets real ids back and nothing is acknowledged unsaved.
+_WRITER = None
+_WRITER_LOCK = threading.Lock()
+
+
+class _Item:
+    __slots__ = ("patient", "result", "future", "enqueued_at")
+
+    def __init__(self, patient, result):
+        self.patient = patient
+        self.result = result
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+def save_prediction(patient_data, result_data):
+    """
+    Insert one patient and its result in a single transaction (the per-request path).
+    returns: (patient_id, result_id)
+    """
+    try:
+        patient = Patient(**patient_data)
+        db.session.add(patient)
+        db.session.flush()
+        result = Result(patient_id=patient.id, **result_data)
+        db.session.add(result)
+        db.session.commit()
+        return patient.id, result.id
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def save_study(patient_data, results_data):
+    """
+    Insert one patient and all of a study's results in a single transaction: one
+    multi-row INSERT ... RETURNING for the results, one commit.
+    returns: (patient_id, [result_id, ...]) in the order of results_data
+    """
+    try:
+        patient_id = db.session.scalars(insert(Patient).returning(Patient.id), [patient_data]).one()
+        result_ids = db.session.scalars(
+            insert(Result).returning(Result.id, sort_by_parameter_order=True),
+            [dict(r, patient_id=patient_id) for r in results_data],
+        ).all()
+        db.session.commit()
+        return patient_id, list(result_ids)
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+class WriteBehindBuffer:
+    """
+    Group commit for (patient, result) pairs. A batch is written when it reaches
+    batch_size or when its oldest row has waited flush_ms. If a batch fails, its
+    rows are retried one by one so a single bad row only fails its own request.
+    """
+
+    def __init__(self, app, batch_size=200, flush_ms=2, max_pending=5000):
+        self.app = app
+        self.batch_size = max(1, int(batch_size))
+        self.flush_wait = max(0.0, float(flush_ms)) / 1000.0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._rows = 0
+        self._fallbacks = 0
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="db-write-behind", daemon=True)
+        self._thread.start()
+
+    def submit(self, patient_data, result_data):
+        """
+        returns: Future resolving to (patient_id, result_id)
+        raises: queue.Full when max_pending rows are already waiting
+        """
+        item = _Item(patient_data, result_data)
+        self._queue.put_nowait(item)
+        return item.future
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "pending": self._queue.qsize(),
+                "batch_size": self.batch_size,
+                "flush_ms": self.flush_wait * 1000.0,
+                "batches": self._batches,
+                "rows": self._rows,
+                "avg_batch_size": (self._rows / self._batches) if self._batches else 0.0,
+                "fallbacks": self._fallbacks,
+            }
+
+    def close(self, timeout=2.0):
+        self._stopped.set()
+        self._thread.join(timeout)
+
+    # ───────────────────────────────────────
+    # WRITER LOOP
+    # ───────────────────────────────────────
+    def _collect(self):
+        try:
+            first = self._queue.get(timeout=0.1)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = first.enqueued_at + self.flush_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _insert(self, batch):
+        """Two bulk INSERT ... RETURNING statements, one commit. returns: [(patient_id, result_id)]"""
+        patient_ids = db.session.scalars(
+            insert(Patient).returning(Patient.id, sort_by_parameter_order=True),
+            [item.patient for item in batch],
+        ).all()
+        result_ids = db.session.scalars(
+            insert(Result).returning(Result.id, sort_by_parameter_order=True),
+            [dict(item.result, patient_id=pid) for item, pid in zip(batch, patient_ids)],
+        ).all()
+        db.session.commit()
+        return list(zip(patient_ids, result_ids))
+
+    def _run(self):
+        while not self._stopped.is_set() or not self._queue.empty():
+            batch = self._collect()
+            if not batch:
+                continue
+
+            with self.app.app_context():
+                try:
+                    ids = self._insert(batch)
+                except Exception as e:
+                    db.session.rollback()
+                    if len(batch) == 1:
+                        batch[0].future.set_exception(e)
+                        continue
+                    with self._stats_lock:
+                        self._fallbacks += 1
+                    ids = [self._insert_one(item) for item in batch]
+
+            for item, pair in zip(batch, ids):
+                if pair is not None:
+                    item.future.set_result(pair)
+            with self._stats_lock:
+                self._batches += 1
+                self._rows += sum(pair is not None for pair in ids)
+
+    def _insert_one(self, item):
+        """Retry a single row. returns: its ids, or None after failing its future."""
+        try:
+            return save_prediction(item.patient, item.result)
+        except Exception as e:
+            item.future.set_exception(e)
+            return None
+
+
+def get_writer(app):
+    """The process-wide buffer when RESULT_WRITE_BEHIND is on, else None."""
+    global _WRITER
+    if not app.config.get("RESULT_WRITE_BEHIND", False):
+        return None
+    if _WRITER is None:
+        with _WRITER_LOCK:
+            if _WRITER is None:
+                _WRITER = WriteBehindBuffer(
+                    app,
+                    batch_size=app.config.get("WRITE_BEHIND_BATCH", 200),
+                    flush_ms=app.config.get("WRITE_BEHIND_FLUSH_MS", 2),
+                    max_pending=app.config.get("WRITE_BEHIND_MAX_PENDING", 5000),
+                )
+                app.logger.info("Result write-behind enabled (batch %d)", _WRITER.batch_size)
+    return _WRITER
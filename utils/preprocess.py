@@ -1,8 +1,12 @@
 # utils/preprocess.py
+import io
+import threading
+import numpy as np
 from PIL import Image
 import torch
 from torchvision import transforms
 
+# Single source of truth for model input (224x224 + ImageNet norm)
 _transform = transforms.Compose([
     transforms.Resize((224, 224)),
     transforms.ToTensor(),
@@ -10,10 +14,160 @@ _transform = transforms.Compose([
                          [0.229, 0.224, 0.225])
 ])
 
+INPUT_SIZE = 224
+_MEAN = torch.tensor([0.485, 0.456, 0.406]).view(3, 1, 1)
+_STD = torch.tensor([0.229, 0.224, 0.225]).view(3, 1, 1)
+# ToTensor + Normalize folded into one multiply-add: x_u8 * _SCALE + _BIAS
+_SCALE = 1.0 / (255.0 * _STD)
+_BIAS = -_MEAN / _STD
+
+_local = threading.local()
+
+def _resize_u8(img):
+    """
+    Resize to 224x224 into this thread's preallocated uint8 HWC buffer and return it.
+    PIL bilinear with antialiasing is what transforms.Resize does on PIL input, so
+    this matches the reference transform (and picks up Pillow-SIMD when installed).
+    """
+    buf = getattr(_local, "u8", None)
+    if buf is None:
+        buf = _local.u8 = np.empty((INPUT_SIZE, INPUT_SIZE, 3), dtype=np.uint8)
+    if img.size != (INPUT_SIZE, INPUT_SIZE):
+        img = img.resize((INPUT_SIZE, INPUT_SIZE), Image.BILINEAR)
+    np.copyto(buf, np.asarray(img))
+    return buf
+
+def fast_transform(img, out=None):
+    """
+    Drop-in for _transform: one resize, then normalization as a single fused op
+    written straight into out (a (3,224,224) float32 tensor) when given.
+    returns: (3,224,224) float32 tensor
+    """
+    u8 = torch.from_numpy(_resize_u8(img)).permute(2, 0, 1)   # view, no copy
+    if out is None:
+        out = torch.empty((3, INPUT_SIZE, INPUT_SIZE), dtype=torch.float32)
+    return torch.addcmul(_BIAS, u8, _SCALE, out=out)
+
+def normalize_batch(u8):
+    """
+    (N,3,224,224) uint8 tensor (already resized, e.g. from a dataset shard) -> the
+    float32 model input fast_transform would produce, computed on u8's device.
+    """
+    return torch.addcmul(_BIAS.to(u8.device), u8, _SCALE.to(u8.device))
+
+class BatchPreprocessor:
+    """
+    Reusable (max_batch,3,224,224) float32 buffer (pinned when CUDA is present) that
+    batches are written into in place. fill() returns a view of the first N rows;
+    it is overwritten by the next fill(), so consume it before calling again.
+    """
+
+    def __init__(self, max_batch=64):
+        self.max_batch = max_batch
+        self.buffer = torch.empty((max_batch, 3, INPUT_SIZE, INPUT_SIZE), dtype=torch.float32,
+                                  pin_memory=torch.cuda.is_available())
+
+    def fill(self, images):
+        """images: iterable of RGB PIL images. returns: (N,3,224,224) view of the buffer."""
+        n = 0
+        for img in images:
+            if n == self.max_batch:
+                raise ValueError(f"Batch larger than buffer ({self.max_batch})")
+            fast_transform(img, out=self.buffer[n])
+            n += 1
+        return self.buffer[:n]
+
+def _batch_buffer(n):
+    """Per-thread BatchPreprocessor, grown when a bigger batch arrives."""
+    bp = getattr(_local, "batch", None)
+    if bp is None or bp.max_batch < n:
+        bp = _local.batch = BatchPreprocessor(max(n, 16))
+    return bp
+
+# Longest side of images embedded in the PDF report (2.7 inch at ~190 dpi)
+REPORT_MAX_SIDE = 512
+
+def to_report_jpeg(img, max_side=REPORT_MAX_SIDE, quality=85):
+    """
+    Downscale a PIL image (or BGR uint8 array) so its longest side is max_side and
+    return it as JPEG bytes, ready for ReportLab.
+    """
+    if isinstance(img, np.ndarray):
+        img = Image.fromarray(np.ascontiguousarray(img[:, :, ::-1]))   # BGR -> RGB
+    img = img.copy()
+    img.thumbnail((max_side, max_side))
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=quality)
+    return buf.getvalue()
+
+class DecodedImage:
+    """
+    Request-scoped image: the upload is decoded exactly once and every consumer
+    (model input, Grad-CAM overlay, PDF report) derives what it needs from it.
+    """
+
+    def __init__(self, rgb, raw=None):
+        self.rgb = rgb          # PIL.Image in RGB mode, original resolution
+        self.raw = raw          # original encoded bytes, if known
+        self._tensor = None
+        self._bgr = None
+        self._report_jpeg = None
+
+    @classmethod
+    def from_bytes(cls, data):
+        img = Image.open(io.BytesIO(data))
+        return cls(img.convert("RGB"), raw=data)
+
+    @classmethod
+    def from_path(cls, path):
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+    @property
+    def tensor(self):
+        """Normalized model input shaped (1,3,224,224)."""
+        if self._tensor is None:
+            self._tensor = fast_transform(self.rgb).unsqueeze(0)
+        return self._tensor
+
+    @property
+    def bgr(self):
+        """Original-resolution uint8 array in OpenCV (BGR) channel order, for the overlay."""
+        if self._bgr is None:
+            self._bgr = np.ascontiguousarray(np.asarray(self.rgb)[:, :, ::-1])
+        return self._bgr
+
+    def report_jpeg(self, max_side=REPORT_MAX_SIDE):
+        """Downscaled JPEG bytes for embedding in the PDF report."""
+        if self._report_jpeg is None:
+            self._report_jpeg = to_report_jpeg(self.rgb, max_side)
+        return self._report_jpeg
+
 def preprocess(path):
     """
     Return a torch tensor shaped (1,3,224,224) ready to feed the model.
     """
     img = Image.open(path).convert("RGB")
-    t = _transform(img).unsqueeze(0)   # adds batch dim
+    t = fast_transform(img).unsqueeze(0)   # adds batch dim
     return t
+
+def _open_rgb(path):
+    return Image.open(path).convert("RGB")
+
+def preprocess_batch(paths, decode=_open_rgb):
+    """
+    Return a torch tensor shaped (N,3,224,224) for a list of image paths (or file objects).
+    decode(item) -> RGB PIL image is called on each item as the buffer is filled.
+    The tensor is a view of this thread's reusable batch buffer: it is only
+    valid until the next preprocess_batch() call on the same thread.
+    """
+    bp = _batch_buffer(len(paths))
+    return bp.fill(decode(p) for p in paths)
+
+def reference_preprocess(img):
+    """The original torchvision Resize -> ToTensor -> Normalize chain, kept for verification."""
+    return _transform(img)
+
+def max_abs_diff(img):
+    """Largest element-wise difference between fast_transform and the reference chain."""
+    return float((fast_transform(img) - _transform(img)).abs().max())